@@ -2,8 +2,8 @@
 from fastapi import FastAPI, UploadFile, File, Form, Request, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse, JSONResponse
-import shutil, os, time, re, cv2, numpy as np, traceback, base64, subprocess, io, requests
+from fastapi.responses import JSONResponse, Response
+import asyncio, json, shutil, os, time, re, uuid, cv2, numpy as np, traceback, base64, subprocess, io
 from PIL import Image
 
 # --- Import project modules ---
@@ -11,14 +11,18 @@ from models import skin_tone_analysis, makeup_models, template_makeup
 from models.skin_tone_analysis import analyze_with_gemini
 from models.chat_stylist import router as chat_router
 from models import jewellary_recommendation
-from models.mediapipe_makeup import apply_makeup_bgr
+from models.mediapipe_makeup import apply_makeup_bgr, apply_look_bgr, parse_layers
 from models import CapGlassesTryOn as cap_glasses_tryon
 from models import wrist_module
 from models import realtime_cap_glasses
 from models import clothesTryOn
+from models import asset_store, detector_pool, tracking_sessions, video_broadcast
 from models.MoustacheTryOn import router as moustache_router
 from models.HairTryOn import router as HairTryOnRouter
 from models.realtime_wristTryOn import router as realtime_wristTryOn 
+from models.realtime_ws import router as realtime_ws_router
+from models.realtime_makeup import router as realtime_makeup_router
+from services import frame_slot, http_client, model_registry, worker_pool
 
 
 # ---------------- App ----------------
@@ -33,6 +37,43 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# ---------------- Startup ----------------
+def preload_assets():
+    # Decode accessory PNGs once so try-on requests skip cv2.imread
+    asset_store.preload("data/hair_style", trim=True)
+    for sub in ("moustache", "caps_hats/caps", "caps_hats/glasses", "caps_hats/hats"):
+        asset_store.preload(os.path.join("data", sub))
+    if os.path.isdir(JEWELLERY_DIR):
+        for folder in os.listdir(JEWELLERY_DIR):
+            asset_store.preload(os.path.join(JEWELLERY_DIR, folder))
+
+# Built in the background after startup (or by the first request that needs them), see /ready
+model_registry.register("detectors", detector_pool.warm_up)
+model_registry.register("assets", preload_assets)
+model_registry.register("templates", template_makeup.preload_templates, lane="template")
+
+@app.on_event("startup")
+async def warm_models():
+    # Serve requests right away; BeautyGAN, MediaPipe pools, assets and API clients warm up meanwhile
+    asyncio.create_task(model_registry.warm_up())
+
+@app.on_event("startup")
+async def start_tracking_reaper():
+    # Close streaming detectors of clients that went away without disconnecting
+    async def reap():
+        while True:
+            await asyncio.sleep(tracking_sessions.IDLE_SECONDS / 2)
+            await worker_pool.offload("realtime", tracking_sessions.evict_idle)
+    asyncio.create_task(reap())
+
+@app.on_event("shutdown")
+def stop_workers():
+    worker_pool.shutdown()
+
+@app.on_event("shutdown")
+async def close_http_client():
+    await http_client.aclose()
+
 # ---------------- Include Routers ----------------
 app.include_router(chat_router)
 app.include_router(jewellary_recommendation.router)
@@ -40,6 +81,8 @@ app.include_router(clothesTryOn.router)
 app.include_router(moustache_router)
 app.include_router(HairTryOnRouter)
 app.include_router(realtime_wristTryOn)
+app.include_router(realtime_ws_router)
+app.include_router(realtime_makeup_router)
 # ---------------- Directories ----------------
 UPLOAD_FOLDER  = "uploads"
 TEMPLATES_DIR  = "data/templates"
@@ -72,6 +115,33 @@ def secure_filename(filename: str) -> str:
 def root():
     return {"status": "ok", "service": "beauty-jewellery-capglasses-tryon 🚀"}
 
+@app.get("/ready")
+def ready():
+    # Per-model warm status; 503 until every warmed model has been attempted
+    body = {"ready": model_registry.ready(), "models": model_registry.stats()}
+    return JSONResponse(status_code=200 if body["ready"] else 503, content=body)
+
+@app.get("/metrics/workers")
+def worker_metrics():
+    # Per-lane running / waiting / rejected counts of the worker pool
+    return worker_pool.stats()
+
+@app.get("/metrics/template")
+def template_metrics():
+    # BeautyGAN template cache and achieved inference batch sizes
+    return template_makeup.stats()
+
+@app.get("/metrics/http")
+def http_metrics():
+    # Requests / errors / in-flight calls per remote API host
+    return http_client.stats()
+
+@app.get("/metrics/realtime")
+def realtime_metrics():
+    # Frames received / processed / dropped, live trackers and shared video producers
+    return {"frames": frame_slot.stats(), "tracking": tracking_sessions.stats(),
+            "video": video_broadcast.stats()}
+
 # ---------------- Upload ----------------
 @app.post("/upload/")
 async def upload_file(file: UploadFile = File(...), user_id: str = Form(...)):
@@ -90,15 +160,16 @@ async def upload_file(file: UploadFile = File(...), user_id: str = Form(...)):
 
 # ---------------- Skin Analysis ----------------
 @app.post("/analyze-skin/{method}/")
+@worker_pool.limited("skin")
 async def analyze_skin(method: str, file: UploadFile = File(...)):
     try:
         method = method.lower()
         if method == "mediapipe":
-            return skin_tone_analysis.analyze_with_mediapipe(file.file)
+            return await worker_pool.offload("skin", skin_tone_analysis.analyze_with_mediapipe, file.file)
         elif method == "groq":
-            return skin_tone_analysis.analyze_with_groq(file.file)
+            return await worker_pool.offload("skin", skin_tone_analysis.analyze_with_groq, file.file)
         elif method == "gemini":
-            return analyze_with_gemini(file.file)
+            return await analyze_with_gemini(file.file)   # network-bound: awaited, not offloaded
         else:
             return {"error": "Invalid method. Use 'mediapipe', 'groq', or 'gemini'."}
     except Exception as e:
@@ -107,6 +178,7 @@ async def analyze_skin(method: str, file: UploadFile = File(...)):
 
 # ---------------- Wrist Try-On ----------------
 @app.post("/wrist-tryon/")
+@worker_pool.limited("wrist")
 async def wrist_tryon(
     request: Request,
     wrist_image: UploadFile | None = File(None),
@@ -123,7 +195,7 @@ async def wrist_tryon(
         if not os.path.exists(watch_path):
             return JSONResponse(status_code=400, content={"error": f"Invalid watch choice: {watch_filename}."})
 
-        watch_image = cv2.imread(watch_path, cv2.IMREAD_UNCHANGED)
+        watch_image = asset_store.get(watch_path)
         if watch_image is None:
             return JSONResponse(status_code=500, content={"error": "Failed to load watch image."})
 
@@ -135,18 +207,18 @@ async def wrist_tryon(
         with open(wrist_path, "wb") as f:
             f.write(contents)
 
-        wrist_image_cv = cv2.imread(wrist_path)
+        wrist_image_cv = cv2.imdecode(np.frombuffer(contents, np.uint8), cv2.IMREAD_COLOR)
         if wrist_image_cv is None:
             return JSONResponse(status_code=400, content={"error": "Failed to decode wrist image."})
 
         virtual_tryon = wrist_module.VirtualWatchTryOn(wrist_image_cv, watch_image)
-        result_img = virtual_tryon.process_image()
+        result_img = await worker_pool.offload("wrist", virtual_tryon.process_image)
         if result_img is None:
             return JSONResponse(status_code=500, content={"error": "Try-on processing failed."})
 
         result_filename = f"result_{int(time.time())}.png"
         result_path = os.path.join(UPLOAD_FOLDER, result_filename)
-        cv2.imwrite(result_path, result_img)
+        await worker_pool.offload("wrist", cv2.imwrite, result_path, result_img)
 
         base = str(request.base_url).rstrip("/")
         result_url = f"{base}/uploads/{result_filename}"
@@ -160,17 +232,19 @@ async def wrist_tryon(
 
 # ---------------- Makeup ----------------
 @app.post("/apply-makeup/")
+@worker_pool.limited("makeup")
 async def apply_makeup(file: UploadFile = File(...), style: str = Form(...)):
     try:
-        result_path = makeup_models.apply_style(file.file, style)
+        result_path = await worker_pool.offload("makeup", makeup_models.apply_style, file.file, style)
         return {"makeup_image": result_path}
     except Exception as e:
         return {"error": str(e)}
 
 @app.post("/makeup-tryon/")
+@worker_pool.limited("makeup")
 async def makeup_tryon(file: UploadFile = File(...)):
     try:
-        return makeup_models.get_makeup_suggestions_from_image(file.file)
+        return await worker_pool.offload("makeup", makeup_models.get_makeup_suggestions_from_image, file.file)
     except Exception as e:
         return {"error": str(e)}
 
@@ -179,48 +253,50 @@ async def makeup_tryon(file: UploadFile = File(...)):
 async def available_templates(request: Request):
     base_url = str(request.base_url).rstrip("/")
     out = {}
-    for occasion in os.listdir(TEMPLATES_DIR):
-        dirpath = os.path.join(TEMPLATES_DIR, occasion)
-        if os.path.isdir(dirpath):
-            files = [
-                f"{base_url}/templates/{occasion}/{f}"
-                for f in os.listdir(dirpath)
-                if f.lower().endswith((".png", ".jpg", ".jpeg"))
-            ]
-            if files:
-                out[occasion] = files
+    for tid in template_makeup.list_templates():
+        occasion = tid.split("/")[0]
+        out.setdefault(occasion, []).append(f"{base_url}/templates/{tid}")
     return out
 
 @app.post("/apply-template/")
-async def apply_template(file: UploadFile = File(...), occasion: str = Form(...), sample: str = Form("sample1.png")):
+@worker_pool.limited("template")
+async def apply_template(
+    file: UploadFile = File(...),
+    template_id: str = Form(None),
+    occasion: str = Form(None),
+    sample: str = Form("sample1.png")
+):
+    """template_id = "<occasion>/<file>" (see /available-templates/); occasion + sample still work."""
     try:
+        if not template_id:
+            if not occasion:
+                return JSONResponse(status_code=400, content={"error": "template_id or occasion is required"})
+            template_id = template_makeup.template_id(occasion, sample)
+        if template_makeup.get_template(template_id) is None:
+            return JSONResponse(status_code=404, content={"error": "Template not found"})
+
         contents = await file.read()
         nparr = np.frombuffer(contents, np.uint8)
-        user_img = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+        user_img = await worker_pool.offload("template", cv2.imdecode, nparr, cv2.IMREAD_COLOR)
         if user_img is None:
             raise ValueError("Failed to decode uploaded image.")
 
-        template_path = template_makeup.get_template_path(occasion, sample)
-        if not template_path:
-            return JSONResponse(status_code=404, content={"error": "Template not found"})
-
-        template_img = cv2.imread(template_path)
-        if template_img is None:
-            raise ValueError(f"Failed to load template image: {template_path}")
-
-        output = template_makeup.makeupTransfer(user_img, template_img)
+        output = await worker_pool.offload("template", template_makeup.transfer_template, user_img, template_id)
         if output is None:
             raise RuntimeError("makeupTransfer returned None.")
 
-        out_path = os.path.join(OUTPUT_DIR, f"result_{occasion}.png")
-        cv2.imwrite(out_path, cv2.cvtColor(output, cv2.COLOR_RGB2BGR))
-        return FileResponse(out_path, media_type="image/png")
+        # encoded per request: a shared file on disk would hand one user's result to another
+        ok, png = await worker_pool.offload("template", cv2.imencode, ".png", cv2.cvtColor(output, cv2.COLOR_RGB2BGR))
+        if not ok:
+            raise RuntimeError("Failed to encode the result image.")
+        return Response(content=png.tobytes(), media_type="image/png")
     except Exception as e:
         tb = traceback.format_exc()
         return JSONResponse(status_code=500, content={"error": str(e), "trace": tb})
 
 # ---------------- Manual Makeup ----------------
 @app.post("/manual-makeup/")
+@worker_pool.limited("makeup")
 async def manual_makeup(
     file: UploadFile = File(...),
     category: str = Form(...),
@@ -234,14 +310,16 @@ async def manual_makeup(
             return JSONResponse(status_code=400, content={"error": "No file content received."})
 
         nparr = np.frombuffer(contents, np.uint8)
-        img_bgr = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+        img_bgr = await worker_pool.offload("makeup", cv2.imdecode, nparr, cv2.IMREAD_COLOR)
         if img_bgr is None:
             return JSONResponse(status_code=400, content={"error": "Invalid or corrupted image file."})
 
-        out_bgr = apply_makeup_bgr(img_bgr, feature=category, color_hex=color, intensity=float(intensity))
+        out_bgr = await worker_pool.offload(
+            "makeup", apply_makeup_bgr, img_bgr, feature=category, color_hex=color, intensity=float(intensity)
+        )
         out_name = f"{category}_mp.png"
         out_path_abs = os.path.join(OUTPUT_DIR, out_name)
-        cv2.imwrite(out_path_abs, out_bgr)
+        await worker_pool.offload("makeup", cv2.imwrite, out_path_abs, out_bgr)
 
         return {"output_path": f"/output/{out_name}"}
 
@@ -249,143 +327,114 @@ async def manual_makeup(
         tb = traceback.format_exc()
         return JSONResponse(status_code=500, content={"error": str(e), "trace": tb})
 
-# ---------------- Jewellery ----------------
-@app.post("/recommend-jewelry/")
-async def recommend_jewelry(file: UploadFile = File(...)):
-    try:
-        return jewellary_recommendation.recommend_jewelry_from_image(file.file)
-    except Exception as e:
-        tb = traceback.format_exc()
-        return JSONResponse(status_code=500, content={"error": str(e), "trace": tb})
-
-# ---------------- Prompt-Based Jewelry Try-On ----------------
-from fastapi.responses import JSONResponse
-import os, io, base64, time, traceback, requests
-from fastapi import UploadFile, File, Form
-from PIL import Image
-
-@app.post("/prompt-jewelry-tryon/")
-async def prompt_jewelry_tryon(file: UploadFile = File(...), prompt: str = Form(...)):
+@app.post("/manual-makeup/look")
+@worker_pool.limited("makeup")
+async def manual_makeup_look(
+    file: UploadFile = File(...),
+    layers: str = Form(...)
+):
     """
-    AI-powered Jewellery visualization using Gemini 2.0 Vision API.
-    Returns an image overlay result.
+    Full look in one request: FaceMesh runs once and the layers are composited in order.
+    layers = JSON list, e.g. [{"feature": "foundation", "color": "#D9B99B", "intensity": 1.0},
+                              {"feature": "lipstick", "color": "#CF2F3A", "intensity": 0.85}]
     """
     try:
-        # ✅ Load GEMINI API key from environment
-        GEMINI_API_KEY = os.environ.get("GEMINI_API_KEY")
-        if not GEMINI_API_KEY:
-            return JSONResponse(
-                status_code=400,
-                content={"error": "Gemini API key not set. Please set GEMINI_API_KEY in environment."}
-            )
-
-        GEMINI_URL = (
-            f"https://generativelanguage.googleapis.com/v1beta/models/"
-            f"gemini-2.0-flash:generateContent?key={GEMINI_API_KEY}"
-        )
+        try:
+            layer_list = json.loads(layers)
+            parse_layers(layer_list)
+        except ValueError as e:
+            return JSONResponse(status_code=400, content={"error": f"Invalid layers: {e}"})
 
-        # ✅ Validate uploaded image
-        image_bytes = await file.read()
-        Image.open(io.BytesIO(image_bytes))  # Raise exception if invalid
-
-        # ✅ Convert image to base64
-        image_base64 = base64.b64encode(image_bytes).decode("utf-8")
-
-        # ✅ Prepare Gemini payload
-        payload = {
-            "contents": [
-                {
-                    "parts": [
-                        {"text": prompt},
-                        {
-                            "inline_data": {
-                                "mime_type": file.content_type,
-                                "data": image_base64
-                            }
-                        },
-                    ]
-                }
-            ]
-        }
+        contents = await file.read()
+        if not contents:
+            return JSONResponse(status_code=400, content={"error": "No file content received."})
 
-        # ✅ Call Gemini API
-        response = requests.post(GEMINI_URL, json=payload)
-        result = response.json()
-
-        print("🔹 Gemini API Response:", result)
-
-        # ✅ Handle API key / request errors
-        if "error" in result:
-            err_msg = result["error"].get("message", "Unknown Gemini error")
-            return JSONResponse(
-                status_code=400,
-                content={"error": f"Gemini API error: {err_msg}", "details": result}
-            )
-
-        # ✅ Check for candidates
-        if "candidates" not in result or not result["candidates"]:
-            return JSONResponse(
-                status_code=500,
-                content={"error": "Gemini did not return any candidates", "details": result}
-            )
-
-        # ✅ Extract base64 image from Gemini response
-        image_data_b64 = result["candidates"][0].get("content", [{}])[0].get("image", None)
-        if not image_data_b64:
-            return JSONResponse(
-                status_code=500,
-                content={"error": "No image returned by Gemini", "details": result}
-            )
-
-        # ✅ Save image to output folder
-        tmp_path = os.path.join(OUTPUT_DIR, f"tryon_{int(time.time())}.png")
-        img_data = base64.b64decode(image_data_b64)
-        with open(tmp_path, "wb") as f:
-            f.write(img_data)
-
-        base_url = "http://127.0.0.1:8000"  # adjust if deployed elsewhere
-        result_url = f"{base_url}/output/{os.path.basename(tmp_path)}"
+        nparr = np.frombuffer(contents, np.uint8)
+        img_bgr = await worker_pool.offload("makeup", cv2.imdecode, nparr, cv2.IMREAD_COLOR)
+        if img_bgr is None:
+            return JSONResponse(status_code=400, content={"error": "Invalid or corrupted image file."})
 
-        return {
-            "message": "✅ Jewelry prompt processed successfully!",
-            "result_image_url": result_url
-        }
+        out_bgr = await worker_pool.offload("makeup", apply_look_bgr, img_bgr, layer_list)
+        out_name = f"look_{uuid.uuid4().hex}.png"   # per request: concurrent looks must not overwrite each other
+        out_path_abs = os.path.join(OUTPUT_DIR, out_name)
+        await worker_pool.offload("makeup", cv2.imwrite, out_path_abs, out_bgr)
+
+        return {"output_path": f"/output/{out_name}"}
 
     except Exception as e:
         tb = traceback.format_exc()
-        print("❌ Error in /prompt-jewelry-tryon/:\n", tb)
+        return JSONResponse(status_code=500, content={"error": str(e), "trace": tb})
+
+# ---------------- Jewellery ----------------
+@app.post("/recommend-jewelry/")
+async def recommend_jewelry(file: UploadFile = File(...)):
+    try:
+        return jewellary_recommendation.recommend_jewelry_from_image(file.file)
+    except Exception as e:
+        tb = traceback.format_exc()
         return JSONResponse(status_code=500, content={"error": str(e), "trace": tb})
 
 # ---------------- Cap/Glasses Try-On ----------------
 @app.post("/capglasses-tryon/")
+@worker_pool.limited("capglasses")
 async def capglasses_tryon_api(file: UploadFile = File(...), accessory: str = Form(None), filename: str = Form(None)):
     try:
         contents = await file.read()
-        result = cap_glasses_tryon.tryon_and_recommend(contents, accessory, filename)
+        result = await worker_pool.offload("capglasses", cap_glasses_tryon.tryon_and_recommend, contents, accessory, filename)
         return JSONResponse(content=result if isinstance(result, dict) else {"error": "Unexpected return type"})
     except Exception as e:
         tb = traceback.format_exc()
         return JSONResponse(status_code=500, content={"error": str(e), "trace": tb})
 
 # ---------------- Real-Time Skin Analysis ----------------
+def _analyze_skin_frame(data: str, session: str):
+    frame_bytes = base64.b64decode(data.split(",")[1])
+    nparr = np.frombuffer(frame_bytes, np.uint8)
+    frame = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+    if frame is None:
+        return {"error": "Invalid frame"}
+    # track the face across frames (optical flow between detections)
+    pts = tracking_sessions.track(session, "face_mesh_stream", cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+    if pts is None:
+        return {"error": "No face detected"}
+    return skin_tone_analysis.analyze_frame(frame, pts)
+
 @app.websocket("/ws/realtime-skin")
 async def realtime_skin(websocket: WebSocket):
     await websocket.accept()
+    fps = websocket.query_params.get("fps")
+    slot_key = f"ws/realtime-skin/{id(websocket)}"
+    session = websocket.query_params.get("session") or slot_key
+    slot = frame_slot.get_slot(slot_key, float(fps) if fps else None)
+
+    async def receive_frames():
+        # latest frame wins: a slow link drops stale frames instead of queueing them
+        try:
+            while True:
+                slot.put(await websocket.receive_text())
+        except WebSocketDisconnect:
+            print("Client disconnected from realtime-skin")
+        finally:
+            slot.close()
+
+    receiver = asyncio.create_task(receive_frames())
     try:
         while True:
-            data = await websocket.receive_text()
-            frame_bytes = base64.b64decode(data.split(",")[1])
-            nparr = np.frombuffer(frame_bytes, np.uint8)
-            frame = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
-            if frame is None:
-                await websocket.send_json({"error": "Invalid frame"})
-                continue
-            result = skin_tone_analysis.analyze_frame(frame)
-            await websocket.send_json(result)
+            data = await slot.get()
+            if data is None:
+                break
+            result = await worker_pool.offload("realtime", _analyze_skin_frame, data, session)
+            slot.done()
+            await websocket.send_json({**result, "stats": slot.stats()})
     except WebSocketDisconnect:
         print("Client disconnected from realtime-skin")
     except Exception:
         await websocket.close()
+    finally:
+        receiver.cancel()
+        frame_slot.release(slot_key)
+        if session == slot_key:
+            tracking_sessions.drop(session)
 
 # ---------------- Launch Realtime ----------------
 @app.post("/launch-realtime/")
@@ -398,10 +447,27 @@ async def launch_realtime():
 
 # ---------------- Cap/Glasses Real-Time ----------------
 @app.post("/process-capglasses/")
-async def process_capglasses(file: UploadFile = File(...), accessory: str = Form(None), filename: str = Form(None)):
+@worker_pool.limited("realtime")
+async def process_capglasses(
+    file: UploadFile = File(...),
+    accessory: str = Form(None),
+    filename: str = Form(None),
+    session: str = Form(None)
+):
     try:
         contents = await file.read()
-        result = realtime_cap_glasses.process_frame(contents, accessory, filename)
+        if not session:
+            # no per-client id (clients behind one NAT share an address): static detection, no slot
+            result = await worker_pool.offload("realtime", realtime_cap_glasses.process_frame, contents, accessory, filename)
+            return result if result else JSONResponse(status_code=500, content={"error": "Processing failed"})
+        slot = frame_slot.get_slot(f"process-capglasses/{session}")
+        async with slot.claim() as fresh:
+            if not fresh:
+                # a newer frame from this client is already waiting
+                return {"dropped": True, "stats": slot.stats()}
+            result = await worker_pool.offload("realtime", realtime_cap_glasses.process_frame, contents, accessory, filename, session)
+        if result:
+            result["stats"] = slot.stats()
         return result if result else JSONResponse(status_code=500, content={"error": "Processing failed"})
     except Exception as e:
         tb = traceback.format_exc()
@@ -0,0 +1,70 @@
+# benchmarks/bench_beautygan_backends.py
+# ---------------------------------------------------
+# BeautyGAN parity and latency: TF session vs ONNX Runtime
+# Run from backend/:  python -m benchmarks.bench_beautygan_backends
+# ---------------------------------------------------
+# Needs dmt.pb and its export dmt.onnx (see models/beautygan_backends.py).
+# Both runtimes get the same inputs: catalog templates as references and
+# the other templates as "users", plus a batch. The exit status is 1 when
+# the outputs differ by more than TOLERANCE (in the model's [-1, 1] range;
+# 0.02 ≈ 2.5 grey levels) so this can gate a new export.
+import sys
+import time
+
+import numpy as np
+
+from models import beautygan_backends, template_makeup as tm
+
+TOLERANCE = 0.02
+REPEATS = 10
+THREADS = [(0, 0), (1, 1), (4, 1)]   # (intra-op, inter-op)
+
+
+def _inputs(n=4):
+    tensors = [tm.get_template(tid).tensor for tid in tm.list_templates()[:n]]
+    users = np.concatenate(tensors)
+    refs = np.concatenate(tensors[1:] + tensors[:1])
+    return users, refs
+
+
+def _time(backend, feeds):
+    backend.run(feeds)   # warm-up
+    best = float("inf")
+    for _ in range(REPEATS):
+        t0 = time.perf_counter()
+        backend.run(feeds)
+        best = min(best, time.perf_counter() - t0)
+    return best * 1000.0
+
+
+def main():
+    users, refs = _inputs()
+    single = {"X": users[:1], "Y": refs[:1]}
+
+    reference = beautygan_backends.load("tf")
+    expected = np.concatenate([reference.run({"X": users[i:i + 1], "Y": refs[i:i + 1]})
+                               for i in range(len(users))])
+    onnx = beautygan_backends.load("onnx")
+    got = np.concatenate([onnx.run({"X": users[i:i + 1], "Y": refs[i:i + 1]}) for i in range(len(users))])
+    diff = np.abs(expected - got)
+    print(f"parity over {len(users)} pairs: max |Δ| {diff.max():.5f}, mean |Δ| {diff.mean():.5f}"
+          f" (tolerance {TOLERANCE})")
+
+    print(f"\nbest of {REPEATS}, one 256×256 transfer / batch of {len(users)}")
+    print(f"{'backend':>8} {'intra':>6} {'inter':>6} {'single':>10} {'batch':>10}")
+    for kind in ("tf", "onnx"):
+        for intra, inter in THREADS:
+            backend = beautygan_backends.load(kind, intra_op=intra, inter_op=inter)
+            try:
+                batch = f"{_time(backend, {'X': users, 'Y': refs}):8.1f}ms"
+            except Exception:
+                batch = "   fixed-N"   # export without a dynamic batch dimension
+            print(f"{kind:>8} {intra:>6} {inter:>6} {_time(backend, single):8.1f}ms {batch}")
+
+    if diff.max() > TOLERANCE:
+        print("outputs differ beyond tolerance")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
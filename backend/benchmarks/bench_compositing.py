@@ -0,0 +1,77 @@
+# benchmarks/bench_compositing.py
+# ---------------------------------------------------
+# Compare models.compositing with the old float overlay path on 1080p frames
+# Run from backend/:  python -m benchmarks.bench_compositing
+# ---------------------------------------------------
+import time
+
+import cv2
+import numpy as np
+
+from models import compositing
+
+FRAME_HW = (1080, 1920)
+REPEATS = 20
+
+
+def legacy_overlay(bg, ov, x, y):
+    """The float blend previously copied across the try-on modules."""
+    ov_h, ov_w = ov.shape[:2]
+    bg_h, bg_w = bg.shape[:2]
+    x1, y1 = max(x, 0), max(y, 0)
+    x2, y2 = min(x + ov_w, bg_w), min(y + ov_h, bg_h)
+    ov_crop = ov[y1 - y:y2 - y, x1 - x:x2 - x]
+    b, g, r, a = cv2.split(ov_crop)
+    alpha = a.astype(np.float32) / 255.0
+    rgb = cv2.merge((b, g, r)).astype(np.float32)
+    roi = bg[y1:y2, x1:x2].astype(np.float32)
+    alpha_3 = np.expand_dims(alpha, axis=2)
+    blended = (alpha_3 * rgb + (1.0 - alpha_3) * roi)
+    bg[y1:y2, x1:x2] = np.clip(blended, 0, 255).astype(np.uint8)
+    return bg
+
+
+def legacy_channel_loop(bg, ov, x, y):
+    """Per-channel float64 loop (moustache / watch modules)."""
+    h, w = ov.shape[:2]
+    alpha = ov[:, :, 3] / 255.0
+    for c in range(3):
+        bg[y:y + h, x:x + w, c] = alpha * ov[:, :, c] + (1 - alpha) * bg[y:y + h, x:x + w, c]
+    return bg
+
+
+def _time(fn, frame, *args):
+    fn(frame.copy(), *args)   # warm-up
+    best = float("inf")
+    for _ in range(REPEATS):
+        dst = frame.copy()
+        t0 = time.perf_counter()
+        fn(dst, *args)
+        best = min(best, time.perf_counter() - t0)
+    return best * 1000.0
+
+
+def main():
+    rng = np.random.default_rng(0)
+    frame = rng.integers(0, 256, (*FRAME_HW, 3), dtype=np.uint8)
+
+    print(f"frame {FRAME_HW[1]}x{FRAME_HW[0]}, best of {REPEATS}")
+    print(f"{'overlay':>12} {'float':>9} {'loop64':>9} {'engine':>9} {'speedup':>8} {'max err':>8}")
+    for ov_w, ov_h in [(256, 256), (640, 480), (1200, 800)]:
+        ov = rng.integers(0, 256, (ov_h, ov_w, 4), dtype=np.uint8)
+        x, y = 300, 100
+        t_float = _time(legacy_overlay, frame, ov, x, y)
+        t_loop = _time(legacy_channel_loop, frame, ov, x, y)
+        t_new = _time(compositing.overlay, frame, ov, x, y)
+        err = np.abs(legacy_overlay(frame.copy(), ov, x, y).astype(int)
+                     - compositing.overlay(frame.copy(), ov, x, y)).max()
+        print(f"{ov_w:>5}x{ov_h:<6} {t_float:8.2f}ms {t_loop:8.2f}ms {t_new:8.2f}ms "
+              f"{min(t_float, t_loop) / t_new:7.1f}x {err:>8}")
+
+    ov = rng.integers(0, 256, (400, 400, 4), dtype=np.uint8)
+    t_place = _time(compositing.place, frame, ov, (960, 540), 0.8, 15.0)
+    print(f"place() scale 0.8 + 15° rotation, 400x400 overlay: {t_place:.2f}ms")
+
+
+if __name__ == "__main__":
+    main()
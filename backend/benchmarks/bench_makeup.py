@@ -0,0 +1,84 @@
+# benchmarks/bench_makeup.py
+# ---------------------------------------------------
+# Per-feature makeup latency vs frame size and face size
+# Run from backend/:  python -m benchmarks.bench_makeup
+# ---------------------------------------------------
+# FaceMesh is not run: a synthetic face (landmark groups laid out on
+# ellipses) stands in for detection so only mask building and blending are
+# timed. With ROI-bounded blending the cost should follow the face size and
+# stay flat as the frame grows.
+import time
+
+import numpy as np
+
+from models import mediapipe_makeup as mm
+
+FEATURES = ["lipstick", "lips", "blush", "eyeshadow", "kohl", "mascara", "foundation"]
+REPEATS = 10
+
+
+def _ring(center, axes, n, start=0.0, stop=2 * np.pi):
+    t = np.linspace(start, stop, n, endpoint=False)
+    return [(int(center[0] + axes[0] * np.cos(a)), int(center[1] + axes[1] * np.sin(a))) for a in t]
+
+
+def synthetic_face(frame_hw, face_w):
+    """Landmark dict for a frontal face ``face_w`` px wide, centred in the frame."""
+    cy, cx = frame_hw[0] // 2, frame_hw[1] // 2
+    s = face_w / 2.0
+    lmd = {}
+
+    def put(ids, pts):
+        for i, p in zip(ids, pts):
+            lmd.setdefault(i, p)
+
+    put(mm.FACE_OVAL[:-1], _ring((cx, cy), (s, 1.3 * s), len(mm.FACE_OVAL) - 1, -np.pi / 2))
+    put(mm.LIPS_OUTER, _ring((cx, cy + 0.7 * s), (0.4 * s, 0.14 * s), len(mm.LIPS_OUTER)))
+    put(mm.LIPS_INNER[:-1], _ring((cx, cy + 0.7 * s), (0.3 * s, 0.04 * s), len(mm.LIPS_INNER) - 1))
+    for side, shadow, kohl in [(-1, mm.EYESHADOW_LEFT, mm.KOHL_LEFT), (1, mm.EYESHADOW_RIGHT, mm.KOHL_RIGHT)]:
+        eye = (cx + side * 0.4 * s, cy - 0.25 * s)
+        put(shadow[:-1], _ring(eye, (0.25 * s, 0.12 * s), len(shadow) - 1, np.pi, 2 * np.pi))
+        put(kohl, _ring(eye, (0.22 * s, 0.06 * s), len(kohl), 0, np.pi))
+    put(mm.CHEEKS, [(int(cx + 0.5 * s), int(cy + 0.25 * s)), (int(cx - 0.5 * s), int(cy + 0.25 * s))])
+    return lmd
+
+
+def _time(fn, *args):
+    fn(*args)   # warm-up
+    best = float("inf")
+    for _ in range(REPEATS):
+        t0 = time.perf_counter()
+        fn(*args)
+        best = min(best, time.perf_counter() - t0)
+    return best * 1000.0
+
+
+def _table(title, cases):
+    rng = np.random.default_rng(0)
+    print(title)
+    print(f"{'frame':>11} {'face':>6} " + " ".join(f"{f:>10}" for f in FEATURES) + f" {'blend full→roi':>16}")
+    for frame_hw, face_w in cases:
+        frame = rng.integers(40, 220, (*frame_hw, 3), dtype=np.uint8)
+        lmd = synthetic_face(frame_hw, face_w)
+        # in place on a scratch frame: the caller's copy is not part of the feature cost
+        canvas = frame.copy()
+        times = [_time(mm.apply_makeup_landmarks, canvas, lmd, f, "#c2185b", 1.0, True) for f in FEATURES]
+        # one blend on the lips mask: frame-sized mask vs its ROI crop
+        mask = mm.lips_mask(frame.shape, lmd)
+        full = _time(mm.blend_softlight, canvas, (91, 24, 194), mask.full(frame.shape), 0.5)
+        roi = _time(mm.blend_into, canvas, mm.blend_softlight, (91, 24, 194), mask, 0.5)
+        print(f"{frame_hw[1]:>5}x{frame_hw[0]:<5} {face_w:>5}px " + " ".join(f"{t:8.2f}ms" for t in times)
+              + f" {full:6.2f}→{roi:5.2f}ms")
+    print()
+
+
+def main():
+    print(f"best of {REPEATS}, masks + blending (no FaceMesh)\n")
+    _table("Fixed 300px face, growing frame:",
+           [((480, 640), 300), ((1080, 1920), 300), ((2160, 3840), 300)])
+    _table("Fixed 1080p frame, growing face:",
+           [((1080, 1920), 150), ((1080, 1920), 300), ((1080, 1920), 600)])
+
+
+if __name__ == "__main__":
+    main()
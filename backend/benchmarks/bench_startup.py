@@ -0,0 +1,141 @@
+# benchmarks/bench_startup.py
+# ---------------------------------------------------
+# Import cost per module and time to the first served request
+# Run from backend/:  python -m benchmarks.bench_startup [--json out.json] [--budget 10]
+# ---------------------------------------------------
+# Every module is imported in a fresh interpreter with ``-X importtime``, so
+# each row is a cold import including everything it drags in; the heavy
+# third-party packages found in that trace are listed with their share.
+# The server run starts uvicorn on a free port and polls ``/`` (first
+# response) and ``/ready`` (background warm-up done). With --budget the exit
+# status is 1 when the first response takes longer, so CI can track it.
+import argparse
+import json
+import os
+import re
+import socket
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEAVY = ["tensorflow", "mediapipe", "google.genai", "groq", "gradio", "cv2", "torch", "PIL", "fastapi", "numpy"]
+SKIP = {"realtime_skin_analysis"}   # Tk desktop app: opens the camera and a window on import
+SERVER_TIMEOUT = 180.0
+
+_LINE = re.compile(r"import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s+)(\S+)")
+
+
+def model_modules():
+    names = sorted(f[:-3] for f in os.listdir(os.path.join(BACKEND_DIR, "models"))
+                   if f.endswith(".py") and f != "__init__.py")
+    return [f"models.{n}" for n in names if n not in SKIP]
+
+
+def import_profile(module: str) -> dict:
+    """Cold-import ``module`` in a subprocess; wall time, cumulative µs and heavy packages."""
+    started = time.perf_counter()
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                          cwd=BACKEND_DIR, capture_output=True, text=True)
+    wall = time.perf_counter() - started
+    cumulative = {}
+    for m in _LINE.finditer(proc.stderr):
+        cumulative.setdefault(m.group(4), int(m.group(2)))   # first line of a package = its own import
+    error = None
+    if proc.returncode:
+        error = (proc.stderr.strip().splitlines() or ["?"])[-1]
+    return {
+        "module": module,
+        "ok": proc.returncode == 0,
+        "error": error,
+        "wall_s": round(wall, 3),
+        "import_s": round(cumulative.get(module, 0) / 1e6, 3),
+        # failed optional probes (e.g. mediapipe trying tensorflow) show up as ~0 µs
+        "heavy_s": {p: round(cumulative[p] / 1e6, 3) for p in HEAVY if cumulative.get(p, 0) >= 5000},
+    }
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _wait_for(url: str, proc, deadline: float, status: int = 200):
+    while time.monotonic() < deadline and proc.poll() is None:
+        try:
+            with urllib.request.urlopen(url, timeout=2) as resp:
+                if resp.status == status:
+                    return True
+        except (urllib.error.URLError, ConnectionError, OSError):
+            pass
+        time.sleep(0.05)
+    return False
+
+
+def server_profile() -> dict:
+    """Seconds from spawning uvicorn to the first 200 on ``/`` and on ``/ready``."""
+    port = _free_port()
+    base = f"http://127.0.0.1:{port}"
+    started = time.monotonic()
+    proc = subprocess.Popen([sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port),
+                             "--log-level", "warning"],
+                            cwd=BACKEND_DIR, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    out = {"first_response_s": None, "ready_s": None, "error": None}
+    try:
+        deadline = started + SERVER_TIMEOUT
+        if _wait_for(base + "/", proc, deadline):
+            out["first_response_s"] = round(time.monotonic() - started, 3)
+            if _wait_for(base + "/ready", proc, deadline):
+                out["ready_s"] = round(time.monotonic() - started, 3)
+        if proc.poll() is not None:
+            out["error"] = (proc.stderr.read().strip().splitlines() or ["server exited"])[-1]
+    finally:
+        proc.terminate()
+        try:
+            proc.wait(10)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+    return out
+
+
+def _seconds(value) -> str:
+    return "n/a" if value is None else f"{value:.2f}s"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import-time and startup benchmark")
+    parser.add_argument("--json", help="also write the results to this file")
+    parser.add_argument("--budget", type=float, help="fail if the first response takes longer (seconds)")
+    parser.add_argument("--no-server", action="store_true", help="only profile imports")
+    args = parser.parse_args()
+
+    results = {"python": sys.version.split()[0], "imports": []}
+    print(f"{'module':<36} {'import':>8} {'wall':>8}  heavy packages")
+    for module in ["app.main"] + model_modules():
+        r = import_profile(module)
+        results["imports"].append(r)
+        heavy = ", ".join(f"{p} {s:.2f}s" for p, s in sorted(r["heavy_s"].items(), key=lambda kv: -kv[1]))
+        status = heavy if r["ok"] else f"FAILED: {r['error']}"
+        print(f"{module:<36} {r['import_s']:7.2f}s {r['wall_s']:7.2f}s  {status}")
+
+    if not args.no_server:
+        server = results["server"] = server_profile()
+        print(f"\nfirst response on /: {_seconds(server['first_response_s'])}   /ready: {_seconds(server['ready_s'])}"
+              + (f"   ({server['error']})" if server["error"] else ""))
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+    if args.budget is not None and not args.no_server:
+        first = results["server"]["first_response_s"]
+        if first is None or first > args.budget:
+            print(f"over budget: first response {_seconds(first)} > {args.budget:.2f}s")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,10 @@
-import os, uuid, traceback, cv2, numpy as np, mediapipe as mp
+import os, uuid, traceback, cv2, numpy as np
 from fastapi import FastAPI, UploadFile, Form
 from fastapi.responses import JSONResponse
 from fastapi.staticfiles import StaticFiles
 
+from models import asset_store, compositing, landmark_cache
+
 # ----------------- Configuration -----------------
 OUTPUT_DIR = "data/output"
 CAPS_DIR = "data/caps_hats/caps"
@@ -35,56 +37,24 @@ def _save_image_bgr(img_bgr, prefix="capglasses"):
     return f"output/{fname}"
 
 def overlay_image(bg, ov, x, y, scale=1.0):
+    """Paste a cached ``asset_store.Asset`` scaled by ``scale`` at (x, y)."""
     if ov is None:
         return bg
-    if scale != 1.0:
-        h, w = ov.shape[:2]
-        new_w = max(1, int(w * scale))
-        new_h = max(1, int(h * scale))
-        ov = cv2.resize(ov, (new_w, new_h), interpolation=cv2.INTER_AREA)
-
-    ov_h, ov_w = ov.shape[:2]
-    bg_h, bg_w = bg.shape[:2]
-
-    x1, y1 = max(x, 0), max(y, 0)
-    x2, y2 = min(x + ov_w, bg_w), min(y + ov_h, bg_h)
-    if x1 >= x2 or y1 >= y2:
-        return bg
-
-    ov_x1, ov_y1 = max(0, -x), max(0, -y)
-    ov_x2, ov_y2 = ov_x1 + (x2 - x1), ov_y1 + (y2 - y1)
-    ov_crop = ov[ov_y1:ov_y2, ov_x1:ov_x2]
-
-    if ov_crop.shape[2] == 4:
-        b, g, r, a = cv2.split(ov_crop)
-        alpha = a.astype(np.float32) / 255.0
-        rgb = cv2.merge((b, g, r)).astype(np.float32)
-    else:
-        rgb = ov_crop.astype(np.float32)
-        alpha = np.ones((ov_crop.shape[0], ov_crop.shape[1]), dtype=np.float32)
-
-    roi = bg[y1:y2, x1:x2].astype(np.float32)
-    alpha_3 = np.expand_dims(alpha, axis=2)
-    blended = (alpha_3 * rgb + (1.0 - alpha_3) * roi)
-    blended = np.clip(blended, 0, 255).astype(np.uint8)
-
-    bg[y1:y2, x1:x2] = blended
-    return bg
+    return compositing.overlay(bg, ov.scaled(scale), x, y, premultiplied=True)
 
 # ----------------- Face Shape Detection -----------------
-def detect_face_shape(img_bgr):
-    mpf = mp.solutions.face_mesh.FaceMesh(
-        static_image_mode=True, max_num_faces=1,
-        refine_landmarks=True, min_detection_confidence=0.5
-    )
-    rgb = cv2.cvtColor(img_bgr, cv2.COLOR_BGR2RGB)
-    res = mpf.process(rgb)
-    if not res.multi_face_landmarks:
+def detect_face(img_bgr):
+    return landmark_cache.get_face_landmarks(img_bgr)
+
+def detect_face_shape(img_bgr, face_landmarks=None):
+    if face_landmarks is None:
+        face_landmarks = detect_face(img_bgr)
+    if face_landmarks is None:
         return "Unknown", {"face_detected": False}
-    lm = res.multi_face_landmarks[0].landmark
+    lm = face_landmarks
     h, w = img_bgr.shape[:2]
 
-    def pt(i): return (lm[i].x * w, lm[i].y * h)
+    def pt(i): return (float(lm[i, 0]) * w, float(lm[i, 1]) * h)
     jaw_left, jaw_right = pt(234), pt(454)
     cheek_left, cheek_right = pt(50), pt(280)
     forehead, chin = pt(10), pt(152)
@@ -115,76 +85,73 @@ def tryon_and_recommend(input_file, accessory=None, filename=None):
         if img is None:
             return {"face_shape": "Unknown", "recommendations": ["Invalid image"], "outputs": {}, "debug": {"face_detected": False}}
 
-        face_shape, dbg = detect_face_shape(img)
+        face = detect_face(img)
+        face_shape, dbg = detect_face_shape(img, face)
         out_path = None
         acc = (accessory or "").lower()
         overlay_path = None
 
-        mp_face = mp.solutions.face_mesh.FaceMesh(static_image_mode=True, max_num_faces=1, refine_landmarks=True)
-        rgb = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
-        res = mp_face.process(rgb)
-
-        if acc == "glasses" and res.multi_face_landmarks:
-            lm = res.multi_face_landmarks[0].landmark
+        if acc == "glasses" and face is not None:
+            lm = face
             h, w = img.shape[:2]
-            left_eye = (int(lm[33].x * w), int(lm[33].y * h))
-            right_eye = (int(lm[263].x * w), int(lm[263].y * h))
+            left_eye = (int(lm[33, 0] * w), int(lm[33, 1] * h))
+            right_eye = (int(lm[263, 0] * w), int(lm[263, 1] * h))
             mid_y = (left_eye[1] + right_eye[1]) // 2
             eye_width = abs(right_eye[0] - left_eye[0])
             x_center = (left_eye[0] + right_eye[0]) // 2
             overlay_path = os.path.join(GLASSES_DIR, filename or "glasses_1.png")
-            if os.path.exists(overlay_path):
-                ov = cv2.imread(overlay_path, cv2.IMREAD_UNCHANGED)
+            ov = asset_store.get(overlay_path)
+            if ov is not None:
                 scale_factor = 1.4
                 new_w = int(eye_width * scale_factor)
                 x = x_center - new_w // 2
                 y_off = mid_y - int(eye_width * 0.26)
-                scale = new_w / (ov.shape[1] if ov.shape[1] else 1)
+                scale = new_w / (ov.width if ov.width else 1)
                 img = overlay_image(img, ov, x, y_off, scale=scale)
                 out_path = _save_image_bgr(img)
 
-        elif acc == "cap" and res.multi_face_landmarks:
-            lm = res.multi_face_landmarks[0].landmark
+        elif acc == "cap" and face is not None:
+            lm = face
             h, w = img.shape[:2]
-            forehead_y = int(lm[10].y * h)
-            face_left = int(lm[234].x * w)
-            face_right = int(lm[454].x * w)
+            forehead_y = int(lm[10, 1] * h)
+            face_left = int(lm[234, 0] * w)
+            face_right = int(lm[454, 0] * w)
             face_width = max(10, face_right - face_left)
 
             overlay_path = os.path.join(CAPS_DIR, filename or "cap_1.png")
-            if os.path.exists(overlay_path):
-                ov = cv2.imread(overlay_path, cv2.IMREAD_UNCHANGED)
+            ov = asset_store.get(overlay_path)
+            if ov is not None:
                 desired_w = int(face_width * 1.3)
-                scale = desired_w / ov.shape[1] if ov.shape[1] else 1.0
-                new_h = int(ov.shape[0] * scale)
-                ov_resized = cv2.resize(ov, (desired_w, new_h), interpolation=cv2.INTER_AREA)
+                scale = desired_w / ov.width if ov.width else 1.0
+                new_h = int(ov.height * scale)
+                ov_resized = ov.resized(desired_w, new_h)
 
                 face_center_x = (face_left + face_right) // 2
                 x = face_center_x - desired_w // 2
                 y = forehead_y - int(new_h * 0.60)
-                img = overlay_image(img, ov_resized, x, y, scale=1.0)
+                img = compositing.overlay(img, ov_resized, x, y, premultiplied=True)
                 out_path = _save_image_bgr(img)
 
-        elif acc == "hat" and res.multi_face_landmarks:   # ✅ new hats support
-            lm = res.multi_face_landmarks[0].landmark
+        elif acc == "hat" and face is not None:   # ✅ new hats support
+            lm = face
             h, w = img.shape[:2]
-            forehead_y = int(lm[10].y * h)
-            face_left = int(lm[234].x * w)
-            face_right = int(lm[454].x * w)
+            forehead_y = int(lm[10, 1] * h)
+            face_left = int(lm[234, 0] * w)
+            face_right = int(lm[454, 0] * w)
             face_width = max(10, face_right - face_left)
 
             overlay_path = os.path.join(HATS_DIR, filename or "hat_2.png")
-            if os.path.exists(overlay_path):
-                ov = cv2.imread(overlay_path, cv2.IMREAD_UNCHANGED)
+            ov = asset_store.get(overlay_path)
+            if ov is not None:
                 desired_w = int(face_width * 2.3)   # hats usually wider
-                scale = desired_w / ov.shape[1] if ov.shape[1] else 1.0
-                new_h = int(ov.shape[0] * scale)
-                ov_resized = cv2.resize(ov, (desired_w, new_h), interpolation=cv2.INTER_AREA)
+                scale = desired_w / ov.width if ov.width else 1.0
+                new_h = int(ov.height * scale)
+                ov_resized = ov.resized(desired_w, new_h)
 
                 face_center_x = (face_left + face_right) // 2
                 x = face_center_x - desired_w // 2
                 y = forehead_y - int(new_h * 0.75)   # hats sit higher
-                img = overlay_image(img, ov_resized, x, y, scale=1.0)
+                img = compositing.overlay(img, ov_resized, x, y, premultiplied=True)
                 out_path = _save_image_bgr(img)
 
         rec_map = {
@@ -200,7 +167,7 @@ def tryon_and_recommend(input_file, accessory=None, filename=None):
             "face_shape": face_shape,
             "recommendations": rec_map.get(face_shape, []),
             "outputs": {"tryon": out_path} if out_path else {},
-            "debug": {**dbg, "overlay_used": overlay_path, "detections": bool(res.multi_face_landmarks)}
+            "debug": {**dbg, "overlay_used": overlay_path, "detections": face is not None}
         }
 
     except Exception as e:
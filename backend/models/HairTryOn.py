@@ -12,9 +12,8 @@ from PIL import Image
 from typing import Optional
 from dotenv import load_dotenv
 
-# Gemini imports
-from google import genai
-from google.genai import types
+from models import asset_store, compositing
+from services import api_clients, worker_pool
 
 # ======================================================
 # ⚙️ Router Setup
@@ -37,27 +36,12 @@ logging.basicConfig(
 )
 
 # ---------------------- Gemini Setup ---------------------- #
+# The client is created on first use by services.api_clients
 load_dotenv()
-GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
-if not GEMINI_API_KEY:
-    raise ValueError("❌ Missing GEMINI_API_KEY in .env file")
-
-client = genai.Client(api_key=GEMINI_API_KEY)
 
 # ======================================================
 # 🔧 Helper Functions
 # ======================================================
-def trim_transparent_borders(img: np.ndarray) -> np.ndarray:
-    if img.shape[2] < 4:
-        return img
-    alpha = img[:, :, 3]
-    coords = cv2.findNonZero(alpha)
-    if coords is None:
-        return img
-    x, y, w, h = cv2.boundingRect(coords)
-    return img[y:y+h, x:x+w]
-
-
 def estimate_head_tilt(gray: np.ndarray, face_box: tuple) -> float:
     (x, y, w, h) = face_box
     roi_gray = gray[y:y+h, x:x+w]
@@ -78,16 +62,10 @@ def rotate_image(image: np.ndarray, angle: float) -> np.ndarray:
     return cv2.warpAffine(image, M, (w, h), flags=cv2.INTER_LINEAR, borderMode=cv2.BORDER_TRANSPARENT)
 
 
-def smooth_alpha_blend(base: np.ndarray, overlay: np.ndarray, x: int, y: int) -> np.ndarray:
+def smooth_alpha_blend(base: np.ndarray, overlay: np.ndarray, x: int, y: int,
+                       premultiplied: bool = False) -> np.ndarray:
     try:
-        y1, y2 = max(y, 0), min(y + overlay.shape[0], base.shape[0])
-        x1, x2 = max(x, 0), min(x + overlay.shape[1], base.shape[1])
-        overlay_cropped = overlay[0:(y2 - y1), 0:(x2 - x1)]
-        alpha = overlay_cropped[:, :, 3].astype(np.float32) / 255.0
-        alpha = cv2.GaussianBlur(alpha, (7, 7), 0)
-        for c in range(3):
-            base[y1:y2, x1:x2, c] = alpha * overlay_cropped[:, :, c] + (1 - alpha) * base[y1:y2, x1:x2, c]
-        return base
+        return compositing.overlay(base, overlay, x, y, feather=7, premultiplied=premultiplied)
     except Exception as e:
         raise RuntimeError("Overlay blending failed.") from e
 
@@ -116,6 +94,7 @@ def save_base64_to_file(base64_str: str, prefix: str = "output") -> str:
 # 🧠 Gemini Image Generation + Analysis
 # ======================================================
 def generate_hair_with_gemini(image_bytes: bytes, prompt: str):
+    from google.genai import types   # deferred with the client (see services/api_clients.py)
     try:
         original_image = Image.open(BytesIO(image_bytes))
         transform_prompt = f"""
@@ -124,7 +103,7 @@ def generate_hair_with_gemini(image_bytes: bytes, prompt: str):
         Maintain realistic texture, lighting, and natural color.
         """
 
-        transform_response = client.models.generate_content(
+        transform_response = api_clients.gemini().models.generate_content(
             model="gemini-2.0-flash-exp-image-generation",
             contents=[transform_prompt, original_image],
             config=types.GenerateContentConfig(
@@ -153,7 +132,7 @@ def generate_hair_with_gemini(image_bytes: bytes, prompt: str):
         - Realism (1–10)
         """
 
-        analysis_response = client.models.generate_content(
+        analysis_response = api_clients.gemini().models.generate_content(
             model="gemini-2.0-flash",
             contents=[analysis_prompt, original_image, transformed_image],
             config=types.GenerateContentConfig(response_modalities=["TEXT"], temperature=0.4)
@@ -171,40 +150,47 @@ def generate_hair_with_gemini(image_bytes: bytes, prompt: str):
         logging.error(f"❌ Gemini generation error: {e}")
         return {"error": str(e)}
 
+def render_hair_png(user_img: np.ndarray, style: asset_store.Asset, x_nudge: int = 0) -> bytes:
+    """Detect the face, fit the hairstyle over it and return the PNG bytes."""
+    gray = cv2.cvtColor(user_img, cv2.COLOR_BGR2GRAY)
+    faces = face_cascade.detectMultiScale(gray, 1.05, 4, minSize=(60, 60))
+    if not len(faces):
+        (h, w) = user_img.shape[:2]
+        x, y = int(w * 0.25), int(h * 0.15)
+        w, h = int(w * 0.5), int(h * 0.5)
+    else:
+        (x, y, w, h) = sorted(faces, key=lambda f: f[2] * f[3], reverse=True)[0]
+
+    hair_width = int(w * 1.9)
+    hair_height = int(hair_width * style.height / style.width)
+    overlay = rotate_image(style.resized(hair_width, hair_height), estimate_head_tilt(gray, (x, y, w, h)))
+    y_offset = y - int(h * 1.35)
+    x_offset = x - int((hair_width - w) / 2) + x_nudge
+    blended_img = smooth_alpha_blend(user_img.copy(), overlay, max(x_offset, 0), max(y_offset, 0),
+                                     premultiplied=True)
+    _, img_encoded = cv2.imencode(".png", blended_img)
+    return img_encoded.tobytes()
+
 # ======================================================
 # 🎨 1. Local Hair-based Try-On
 # ======================================================
 @router.post("/hair")
+@worker_pool.limited("hair")
 async def tryon_hair(image: UploadFile, style_name: str = Form(...)):
     """Local PNG hairstyle overlay using Haar Cascade."""
     try:
         contents = await image.read()
         np_img = np.frombuffer(contents, np.uint8)
-        user_img = cv2.imdecode(np_img, cv2.IMREAD_UNCHANGED)
+        user_img = await worker_pool.offload("hair", cv2.imdecode, np_img, cv2.IMREAD_UNCHANGED)
         if user_img is None:
             return JSONResponse({"error": "Invalid image file."}, status_code=400)
 
-        gray = cv2.cvtColor(user_img, cv2.COLOR_BGR2GRAY)
-        faces = face_cascade.detectMultiScale(gray, 1.05, 4, minSize=(60, 60))
-        if not len(faces):
-            (h, w) = user_img.shape[:2]
-            x, y = int(w * 0.25), int(h * 0.15)
-            w, h = int(w * 0.5), int(h * 0.5)
-        else:
-            (x, y, w, h) = sorted(faces, key=lambda f: f[2] * f[3], reverse=True)[0]
-
         style_path = os.path.join(HAIR_STYLE_PATH, style_name)
-        overlay = cv2.imread(style_path, cv2.IMREAD_UNCHANGED)
-        overlay = trim_transparent_borders(overlay)
-        overlay = rotate_image(overlay, estimate_head_tilt(gray, (x, y, w, h)))
-        hair_width = int(w * 1.9)
-        hair_height = int(hair_width * overlay.shape[0] / overlay.shape[1])
-        overlay = cv2.resize(overlay, (hair_width, hair_height))
-        y_offset = y - int(h * 1.35)
-        x_offset = x - int((hair_width - w) / 2)-8
-        blended_img = smooth_alpha_blend(user_img.copy(), overlay, max(x_offset, 0), max(y_offset, 0))
-        _, img_encoded = cv2.imencode(".png", blended_img)
-        return Response(content=img_encoded.tobytes(), media_type="image/png")
+        style = asset_store.get(style_path, trim=True)
+        if style is None:
+            return JSONResponse({"error": f"Unknown hair style: {style_name}"}, status_code=400)
+        png = await worker_pool.offload("hair", render_hair_png, user_img, style, x_nudge=-8)
+        return Response(content=png, media_type="image/png")
     except Exception:
         logging.error("❌ Hair Try-On Error:\n" + traceback.format_exc())
         return JSONResponse({"error": "Unexpected Haar try-on failure."}, status_code=500)
@@ -213,39 +199,24 @@ async def tryon_hair(image: UploadFile, style_name: str = Form(...)):
 # ✨ 2. Gemini-enhanced Try-On (Color Preserved)
 # ======================================================
 @router.post("/hair_gemini")
+@worker_pool.limited("hair")
 async def tryon_hair_gemini(image: UploadFile, style_name: str = Form(...)):
     """Enhanced hair overlay using Gemini AI for realism."""
     try:
         contents = await image.read()
         np_img = np.frombuffer(contents, np.uint8)
-        user_img = cv2.imdecode(np_img, cv2.IMREAD_UNCHANGED)
+        user_img = await worker_pool.offload("hair", cv2.imdecode, np_img, cv2.IMREAD_UNCHANGED)
         if user_img is None:
             return JSONResponse({"error": "Invalid image file."}, status_code=400)
 
-        gray = cv2.cvtColor(user_img, cv2.COLOR_BGR2GRAY)
-        faces = face_cascade.detectMultiScale(gray, 1.05, 4, minSize=(60, 60))
-        if not len(faces):
-            (h, w) = user_img.shape[:2]
-            x, y = int(w * 0.25), int(h * 0.15)
-            w, h = int(w * 0.5), int(h * 0.5)
-        else:
-            (x, y, w, h) = sorted(faces, key=lambda f: f[2] * f[3], reverse=True)[0]
-
         style_path = os.path.join(HAIR_STYLE_PATH, style_name)
-        overlay = cv2.imread(style_path, cv2.IMREAD_UNCHANGED)
-        overlay = trim_transparent_borders(overlay)
-        overlay = rotate_image(overlay, estimate_head_tilt(gray, (x, y, w, h)))
-        hair_width = int(w * 1.9)
-        hair_height = int(hair_width * overlay.shape[0] / overlay.shape[1])
-        overlay = cv2.resize(overlay, (hair_width, hair_height))
-        y_offset = y - int(h * 1.35)
-        x_offset = x - int((hair_width - w) / 2)
-        blended_img = smooth_alpha_blend(user_img.copy(), overlay, max(x_offset, 0), max(y_offset, 0))
-        _, img_encoded = cv2.imencode(".png", blended_img)
-        img_bytes = img_encoded.tobytes()
+        style = asset_store.get(style_path, trim=True)
+        if style is None:
+            return JSONResponse({"error": f"Unknown hair style: {style_name}"}, status_code=400)
+        img_bytes = await worker_pool.offload("hair", render_hair_png, user_img, style)
 
         prompt = f"Enhance hairstyle '{style_name}' realistically. Preserve color, improve edges and lighting."
-        gemini_output = generate_hair_with_gemini(img_bytes, prompt)
+        gemini_output = await worker_pool.offload("hair", generate_hair_with_gemini, img_bytes, prompt)
 
         if not gemini_output or "image_base64" not in gemini_output:
             return Response(content=img_bytes, media_type="image/png")
@@ -264,6 +235,7 @@ async def tryon_hair_gemini(image: UploadFile, style_name: str = Form(...)):
 # 💬 3. Prompt-based Gemini Hair Try-On
 # ======================================================
 @router.post("/hair_gemini_prompt")
+@worker_pool.limited("hair")
 async def tryon_hair_gemini_prompt(image: UploadFile, prompt: str = Form(...)):
     """
     Fully prompt-based Gemini hair transformation + analysis.
@@ -279,7 +251,7 @@ async def tryon_hair_gemini_prompt(image: UploadFile, prompt: str = Form(...)):
     """
     try:
         contents = await image.read()
-        gemini_output = generate_hair_with_gemini(contents, prompt)
+        gemini_output = await worker_pool.offload("hair", generate_hair_with_gemini, contents, prompt)
 
         # Ensure image is returned in Base64
         if "image_base64" not in gemini_output and "image_bytes" in gemini_output:
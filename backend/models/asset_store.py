@@ -0,0 +1,164 @@
+# models/asset_store.py
+# ---------------------------------------------------
+# In-memory store of decoded accessory overlays
+# ---------------------------------------------------
+# Hair styles, moustaches, caps/glasses/hats, jewellery and watches are
+# decoded once, optionally trimmed of transparent borders, premultiplied
+# and kept with a mip pyramid. Entries reload when the file mtime changes.
+import os
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+import cv2
+import numpy as np
+
+# ---------------- Configuration ----------------
+MAX_ASSETS = int(os.getenv("ASSET_STORE_MAX_ASSETS", "128"))
+RESIZE_CACHE_SIZE = int(os.getenv("ASSET_STORE_RESIZE_CACHE", "8"))
+MAX_SIDE = int(os.getenv("ASSET_STORE_MAX_SIDE", "2048"))   # overlays never need more on a face
+MIN_LEVEL_SIDE = 16
+
+
+# ---------------- Helpers ----------------
+def trim_transparent_borders(img: np.ndarray) -> np.ndarray:
+    if img.ndim < 3 or img.shape[2] < 4:
+        return img
+    coords = cv2.findNonZero(img[:, :, 3])
+    if coords is None:
+        return img
+    x, y, w, h = cv2.boundingRect(coords)
+    return img[y:y+h, x:x+w]
+
+
+def premultiply(img: np.ndarray) -> np.ndarray:
+    """Straight BGRA → premultiplied BGRA (BGR images are returned unchanged)."""
+    if img.shape[2] < 4:
+        return img
+    a3 = cv2.cvtColor(cv2.extractChannel(img, 3), cv2.COLOR_GRAY2BGR)
+    color = cv2.multiply(cv2.cvtColor(img, cv2.COLOR_BGRA2BGR), a3, scale=1.0 / 255.0)
+    return np.dstack((color, img[:, :, 3]))
+
+
+def _frozen(img: np.ndarray) -> np.ndarray:
+    img.setflags(write=False)   # shared between requests
+    return img
+
+
+# ---------------- Asset ----------------
+class Asset:
+    """One decoded overlay.
+
+    ``image`` is the straight-alpha original (after optional trimming);
+    ``resized``/``scaled`` return premultiplied BGRA built from the nearest
+    pyramid level, meant for ``compositing.overlay(..., premultiplied=True)``.
+    Returned arrays are shared and read-only.
+    """
+
+    def __init__(self, path: str, image: np.ndarray, mtime: float):
+        if image.ndim == 2:
+            image = cv2.cvtColor(image, cv2.COLOR_GRAY2BGR)
+        self.path = path
+        self.mtime = mtime
+        self.image = _frozen(image)
+        self.height, self.width = image.shape[:2]
+        self.has_alpha = image.shape[2] == 4
+        self.premultiplied = _frozen(premultiply(image))
+        self.pyramid = [self.premultiplied]
+        level = self.premultiplied
+        while min(level.shape[:2]) // 2 >= MIN_LEVEL_SIDE:
+            h, w = level.shape[:2]
+            level = _frozen(cv2.resize(level, (w // 2, h // 2), interpolation=cv2.INTER_AREA))
+            self.pyramid.append(level)
+        self._resized = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def shape(self):
+        return self.image.shape
+
+    def resized(self, width: int, height: int) -> np.ndarray:
+        width, height = max(1, int(width)), max(1, int(height))
+        key = (width, height)
+        with self._lock:
+            out = self._resized.get(key)
+            if out is not None:
+                self._resized.move_to_end(key)
+                return out
+
+        # smallest level that is still at least as large as the target
+        src = self.pyramid[0]
+        for level in self.pyramid[1:]:
+            if level.shape[1] < width or level.shape[0] < height:
+                break
+            src = level
+        if (src.shape[1], src.shape[0]) == key:
+            out = src
+        else:
+            upscale = width > src.shape[1] or height > src.shape[0]
+            interp = cv2.INTER_LINEAR if upscale else cv2.INTER_AREA
+            out = _frozen(cv2.resize(src, key, interpolation=interp))
+
+        with self._lock:
+            self._resized[key] = out
+            while len(self._resized) > RESIZE_CACHE_SIZE:
+                self._resized.popitem(last=False)
+        return out
+
+    def scaled(self, scale: float) -> np.ndarray:
+        return self.resized(self.width * scale, self.height * scale)
+
+
+# ---------------- Store ----------------
+_assets = OrderedDict()   # (abs path, trim) -> Asset
+_lock = threading.Lock()
+
+
+def get(path: Optional[str], trim: bool = False) -> Optional[Asset]:
+    """Return the decoded asset for ``path`` (None if missing or unreadable)."""
+    if not path:
+        return None
+    path = os.path.abspath(path)
+    try:
+        mtime = os.stat(path).st_mtime
+    except OSError:
+        return None
+    key = (path, trim)
+    with _lock:
+        asset = _assets.get(key)
+        if asset is not None and asset.mtime == mtime:
+            _assets.move_to_end(key)
+            return asset
+
+    img = cv2.imread(path, cv2.IMREAD_UNCHANGED)
+    if img is None:
+        return None
+    if trim:
+        img = trim_transparent_borders(img)
+    longest = max(img.shape[:2])
+    if longest > MAX_SIDE:
+        f = MAX_SIDE / longest
+        img = cv2.resize(img, (max(1, int(img.shape[1] * f)), max(1, int(img.shape[0] * f))),
+                         interpolation=cv2.INTER_AREA)
+    asset = Asset(path, np.ascontiguousarray(img), mtime)
+
+    with _lock:
+        _assets[key] = asset
+        _assets.move_to_end(key)
+        while len(_assets) > MAX_ASSETS:
+            _assets.popitem(last=False)
+    return asset
+
+
+def preload(directory: str, trim: bool = False):
+    """Decode every image in ``directory`` ahead of the first request."""
+    if not os.path.isdir(directory):
+        return
+    for name in sorted(os.listdir(directory)):
+        if name.lower().endswith((".png", ".jpg", ".jpeg", ".webp")):
+            get(os.path.join(directory, name), trim=trim)
+
+
+def clear():
+    with _lock:
+        _assets.clear()
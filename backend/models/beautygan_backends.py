@@ -0,0 +1,108 @@
+# models/beautygan_backends.py
+# ---------------------------------------------------
+# Inference runtimes for the BeautyGAN generator
+# ---------------------------------------------------
+# template_makeup talks to the generator through one small interface:
+#
+#   backend.run({"X": A, "Y": B})            -> (N, 256, 256, 3) float32 in [-1, 1]
+#   backend.run({"X": A, "template": T})     (when template_split: T from encode_template)
+#   backend.encode_template(B)               -> template-side activation (TF only)
+#
+# BEAUTYGAN_BACKEND picks the runtime:
+#   tf    the frozen dmt.pb in a tf.compat.v1.Session (default)
+#   onnx  dmt.onnx in ONNX Runtime on the CPU, exported once with
+#         python -m tf2onnx.convert --graphdef dmt.pb --inputs X:0,Y:0 \
+#                --outputs decoder_1/g:0 --output dmt.onnx
+# Thread pools: BEAUTYGAN_INTRA_OP_THREADS / BEAUTYGAN_INTER_OP_THREADS
+# (0 = the runtime's default). Compare runtimes with
+# python -m benchmarks.bench_beautygan_backends.
+import os
+from typing import Dict
+
+import numpy as np
+
+# ---------------- Configuration ----------------
+BASE_DIR = os.path.dirname(os.path.dirname(__file__))   # backend/
+BACKEND = os.getenv("BEAUTYGAN_BACKEND", "tf").lower()
+TF_MODEL_PATH = os.getenv("BEAUTYGAN_TF_PATH", os.path.join(BASE_DIR, "dmt.pb"))
+ONNX_MODEL_PATH = os.getenv("BEAUTYGAN_ONNX_PATH", os.path.join(BASE_DIR, "dmt.onnx"))
+INTRA_OP_THREADS = int(os.getenv("BEAUTYGAN_INTRA_OP_THREADS", "0"))
+INTER_OP_THREADS = int(os.getenv("BEAUTYGAN_INTER_OP_THREADS", "0"))
+# Optional: name of a tensor on the reference (Y) branch that depends only on
+# the template, e.g. its encoder output. When set, it is computed once per
+# template and fed directly, so that half of the generator is skipped (TF only).
+TEMPLATE_TENSOR = os.getenv("BEAUTYGAN_TEMPLATE_TENSOR", "")
+
+
+# ---------------- TensorFlow ----------------
+class TFBackend:
+    """Session over the frozen GraphDef."""
+    name = "tf"
+
+    def __init__(self, path: str = TF_MODEL_PATH, intra_op: int = INTRA_OP_THREADS,
+                 inter_op: int = INTER_OP_THREADS):
+        import tensorflow as tf   # seconds to import; deferred so the API starts without it
+        self.graph = tf.Graph()
+        with self.graph.as_default():
+            gd = tf.compat.v1.GraphDef()
+            with open(path, "rb") as f:
+                gd.ParseFromString(f.read())
+            tf.import_graph_def(gd, name="")
+        self.inputs = {"X": self.graph.get_tensor_by_name("X:0"),
+                       "Y": self.graph.get_tensor_by_name("Y:0")}
+        self.output = self.graph.get_tensor_by_name("decoder_1/g:0")
+        cfg = tf.compat.v1.ConfigProto(intra_op_parallelism_threads=intra_op,
+                                       inter_op_parallelism_threads=inter_op)
+        self.sess = tf.compat.v1.Session(graph=self.graph, config=cfg)
+        self.template_split = False
+        if TEMPLATE_TENSOR:
+            try:
+                self.inputs["template"] = self.graph.get_tensor_by_name(TEMPLATE_TENSOR)
+                self.template_split = True
+            except (KeyError, ValueError) as e:
+                print(f"⚠️ BEAUTYGAN_TEMPLATE_TENSOR ignored: {e}")
+
+    def run(self, feeds: Dict[str, np.ndarray]) -> np.ndarray:
+        return self.sess.run(self.output, feed_dict={self.inputs[k]: v for k, v in feeds.items()})
+
+    def encode_template(self, Y: np.ndarray) -> np.ndarray:
+        return self.sess.run(self.inputs["template"], feed_dict={self.inputs["Y"]: Y})
+
+
+# ---------------- ONNX Runtime ----------------
+class OnnxBackend:
+    """CPU ONNX Runtime session over the tf2onnx export of dmt.pb."""
+    name = "onnx"
+    template_split = False   # the export only exposes X and Y
+
+    def __init__(self, path: str = ONNX_MODEL_PATH, intra_op: int = INTRA_OP_THREADS,
+                 inter_op: int = INTER_OP_THREADS):
+        import onnxruntime as ort
+        opts = ort.SessionOptions()
+        opts.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        opts.intra_op_num_threads = intra_op
+        opts.inter_op_num_threads = inter_op
+        if inter_op > 1:
+            opts.execution_mode = ort.ExecutionMode.ORT_PARALLEL
+        self.sess = ort.InferenceSession(path, sess_options=opts, providers=["CPUExecutionProvider"])
+        # tf2onnx keeps the TF names ("X:0"); accept either form
+        names = [i.name for i in self.sess.get_inputs()]
+        self.inputs = {}
+        for key in ("X", "Y"):
+            match = [n for n in names if n.split(":")[0] == key]
+            if not match:
+                raise ValueError(f"{path} has no input named {key} (inputs: {names})")
+            self.inputs[key] = match[0]
+        self.output = self.sess.get_outputs()[0].name
+
+    def run(self, feeds: Dict[str, np.ndarray]) -> np.ndarray:
+        return self.sess.run([self.output], {self.inputs[k]: v for k, v in feeds.items()})[0]
+
+
+BACKENDS = {"tf": TFBackend, "onnx": OnnxBackend}
+
+
+def load(kind: str = BACKEND, **kwargs):
+    if kind not in BACKENDS:
+        raise ValueError(f"Unknown BEAUTYGAN_BACKEND '{kind}'. Use one of {sorted(BACKENDS)}.")
+    return BACKENDS[kind](**kwargs)
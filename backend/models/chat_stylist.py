@@ -1,13 +1,12 @@
 from typing import List, Dict, Optional
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
-from groq import Groq
 from PIL import Image
-import requests
 from io import BytesIO
 
+from services import api_clients, http_client
+
 router = APIRouter()
-client = Groq()
 
 # -----------------------------
 # Pydantic Models
@@ -46,13 +45,13 @@ def get_or_create_conversation(conversation_id: str) -> Conversation:
 # -----------------------------
 # Image Analysis Function
 # -----------------------------
-def analyze_skin(image_url: str) -> str:
+async def analyze_skin(image_url: str) -> str:
     """
     Analyze the user's skin from the image.
     Returns a text summary for the AI.
     """
     try:
-        response = requests.get(image_url)
+        response = await http_client.get(image_url, follow_redirects=True)
         img = Image.open(BytesIO(response.content)).convert("RGB")
         # --- Placeholder analysis ---
         # Replace this with a real model for skin tone, undertone, spots, etc.
@@ -67,7 +66,7 @@ def analyze_skin(image_url: str) -> str:
 # -----------------------------
 def query_groq_api(conversation: Conversation) -> str:
     try:
-        completion = client.chat.completions.create(
+        completion = api_clients.groq().chat.completions.create(
             model="meta-llama/llama-4-scout-17b-16e-instruct",
             messages=conversation.messages,
             temperature=0.7,
@@ -103,7 +102,7 @@ async def chat_with_groq(input: UserInput):
 
     # If image is provided, analyze skin and include summary
     if input.image_url:
-        skin_info = analyze_skin(input.image_url)
+        skin_info = await analyze_skin(input.image_url)
         message_content += f" [User image analyzed: {skin_info}]"
 
     # Append user's message
@@ -3,14 +3,18 @@ import os
 os.environ["TF_CPP_MIN_LOG_LEVEL"] = "3"  # Suppress TensorFlow logs
 
 import cv2
-import mediapipe as mp
 import numpy as np
 import random
+import threading
+from collections import OrderedDict
+from functools import lru_cache
 from fastapi import APIRouter
 from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from typing import Optional
 
+from models import asset_store, garment_warp, tracking_sessions, video_broadcast
+
 router = APIRouter(prefix="/clothes", tags=["Clothes Try-On"])
 
 # -------------------------------
@@ -23,10 +27,12 @@ class ClothingSelection(BaseModel):
     dress: str = "none"
 
 
-# -------------------------------
-# Global clothing selection state
-# -------------------------------
-current_selection = ClothingSelection()
+# Camera index or stream URL feeding /clothes/video
+CAMERA_SOURCE = video_broadcast.parse_source(os.getenv("CLOTHES_CAMERA_SOURCE", "0"))
+
+# Requests without ?session= share this outfit
+DEFAULT_SESSION = "default"
+MAX_SESSIONS = int(os.getenv("CLOTHES_MAX_SESSIONS", "64"))
 
 # -------------------------------
 # Correct Base Paths
@@ -89,75 +95,8 @@ CLOTHING_DATA = {
 }
 
 # -------------------------------
-# Load Clothing Images
-# -------------------------------
-def load_clothing_images():
-    """
-    Loads top_img, bottom_img, dress_img and sets top_type/bottom_type/dress_type/gender_type
-    Uses placeholders when files missing to avoid crashes.
-    """
-    global top_img, bottom_img, dress_img, top_type, bottom_type, dress_type, gender_type
-    gender_type = current_selection.gender
-    top_type = current_selection.top
-    bottom_type = current_selection.bottom
-    dress_type = current_selection.dress
-
-    def get_image(path_entry: Optional[str]):
-        # if path_entry is list choose at random (for multiple variants)
-        if isinstance(path_entry, list):
-            path_entry_local = random.choice(path_entry)
-        else:
-            path_entry_local = path_entry
-
-        if not path_entry_local:
-            return None
-        if not os.path.exists(path_entry_local):
-            return None
-        img = cv2.imread(path_entry_local, cv2.IMREAD_UNCHANGED)
-        return img
-
-    top_path = CLOTHING_DATA.get(top_type)
-    bottom_path = CLOTHING_DATA.get(bottom_type)
-    dress_path = CLOTHING_DATA.get(dress_type, None)
-
-    top_img = get_image(top_path)
-    bottom_img = get_image(bottom_path)
-    dress_img = get_image(dress_path)
-
-    # Use placeholders if something is missing (avoid crashing)
-    if top_img is not None:
-        print(f"✅ Loaded top: {top_path}")
-    elif top_type != "none":
-        print(f"⚠️ Top cloth not found at {top_path}, using placeholder")
-        top_img = np.zeros((200, 200, 4), dtype=np.uint8)
-
-    if bottom_img is not None:
-        print(f"✅ Loaded bottom: {bottom_path}")
-    elif bottom_type != "none":
-        print(f"⚠️ Bottom cloth not found at {bottom_path}, using placeholder")
-        bottom_img = np.zeros((200, 200, 4), dtype=np.uint8)
-
-    if dress_img is not None:
-        print(f"✅ Loaded dress: {dress_path}")
-    elif dress_type != "none":
-        print(f"⚠️ Dress cloth not found at {dress_path}, using placeholder")
-        dress_img = np.zeros((300, 300, 4), dtype=np.uint8)
-
-
-# Initialize clothing images
-load_clothing_images()
-
-# -------------------------------
-# Mediapipe Pose Setup
+# Pose Landmarks
 # -------------------------------
-mp_pose = mp.solutions.pose
-pose = mp_pose.Pose(
-    static_image_mode=False,
-    model_complexity=1,
-    enable_segmentation=False,
-    min_detection_confidence=0.5
-)
-
 landmark_names = {
     "l_shoulder": 11, "r_shoulder": 12,
     "l_hip": 23, "r_hip": 24,
@@ -166,144 +105,121 @@ landmark_names = {
 }
 
 # -------------------------------
-# Overlay Helper
+# Garment Control Points
 # -------------------------------
-def overlay_transparent(background: np.ndarray, overlay: np.ndarray, x: int, y: int) -> np.ndarray:
-    """
-    Overlays `overlay` (RGBA) onto `background` (BGR) at position (x,y).
-    Returns modified background. If overlay has no alpha channel or
-    sizes mismatch it'll try to handle gracefully.
-    """
-    if overlay is None:
-        return background
-
-    h, w = overlay.shape[:2]
-
-    # bounds checks + cropping the overlay if it goes out of frame
-    if x >= background.shape[1] or y >= background.shape[0]:
-        return background
-
-    if x < 0:
-        overlay = overlay[:, -x:]
-        w = overlay.shape[1]
-        x = 0
-    if y < 0:
-        overlay = overlay[-y:, :]
-        h = overlay.shape[0]
-        y = 0
+# Where pose landmarks sit on the garment image, as (u, v) fractions of its
+# width / height (left = the garment's image-left side). Values reproduce
+# the old resize-and-centre placement for an upright body; garment_warp
+# bends the image between them.
+GARMENT_ANCHORS = {
+    "bottom": {"l_hip": (0.27, 0.0), "r_hip": (0.73, 0.0),
+               "l_knee": (0.29, 0.45), "r_knee": (0.71, 0.45),
+               "l_toe": (0.30, 0.91), "r_toe": (0.70, 0.91)},
+    "top": {"l_shoulder": (0.25, 0.15), "r_shoulder": (0.75, 0.15),
+            "l_hip": (0.32, 0.86), "r_hip": (0.68, 0.86)},
+    "full": {"l_shoulder": (0.375, 0.14), "r_shoulder": (0.625, 0.14),
+             "l_hip": (0.41, 0.47), "r_hip": (0.59, 0.47),
+             "l_toe": (0.42, 1.05), "r_toe": (0.58, 1.05)},
+}
 
-    if x + w > background.shape[1]:
-        w = background.shape[1] - x
-        overlay = overlay[:, :w]
-    if y + h > background.shape[0]:
-        h = background.shape[0] - y
-        overlay = overlay[:h, :]
+# Per-garment annotations (same format) for images that do not fit their category's defaults
+CLOTHING_ANCHORS = {}
 
-    # require alpha channel
-    if overlay.shape[2] < 4:
-        return background
 
-    overlay_img = overlay[:, :, :3]
-    mask = overlay[:, :, 3:] / 255.0
+def garment_category(cloth_type: str) -> Optional[str]:
+    if any(tag in cloth_type for tag in ["pant", "jeans", "pajama", "skirt", "tunic"]):
+        return "bottom"    # Bottom / Pants / Skirts / Jeans
+    if any(tag in cloth_type for tag in ["shirt", "polo", "blouse", "kurta"]):
+        return "top"       # Tops / Shirts / Kurtas / Blouses / Polo
+    if any(tag in cloth_type for tag in ["full_suit", "sundress", "gown"]):
+        return "full"      # Full-body dresses / gowns / suits
+    return None
 
-    roi = background[y:y+h, x:x+w]
-    # if sizes differ unexpectedly, skip to avoid crashing
-    if roi.shape[:2] != overlay_img.shape[:2]:
-        return background
 
-    blended = (1.0 - mask) * roi + mask * overlay_img
-    background[y:y+h, x:x+w] = blended.astype(np.uint8)
-    return background
+@lru_cache(maxsize=None)
+def garment_mesh(cloth_type: str) -> Optional[garment_warp.GarmentMesh]:
+    """Triangulated control-point mesh for a garment (None → not placeable)."""
+    anchors = CLOTHING_ANCHORS.get(cloth_type) or GARMENT_ANCHORS.get(garment_category(cloth_type))
+    if not anchors:
+        return None
+    return garment_warp.GarmentMesh({landmark_names[name]: uv for name, uv in anchors.items()})
 
 
 # -------------------------------
-# Cloth Placement Logic
+# Per-session Outfits
 # -------------------------------
-def place_cloth(frame: np.ndarray, cloth_img: np.ndarray, cloth_type: str, get_point) -> np.ndarray:
-    if cloth_img is None or cloth_type == "none":
-        return frame
-
-    # Bottom / Pants / Skirts / Jeans
-    if any(tag in cloth_type for tag in ["pant", "jeans", "pajama", "skirt", "tunic"]):
-        l_hip, r_hip = get_point("l_hip"), get_point("r_hip")
-        l_toe, r_toe = get_point("l_toe"), get_point("r_toe")
-
-        hip_w = np.linalg.norm(np.array(r_hip) - np.array(l_hip))
-        leg_h = np.linalg.norm(np.array(l_toe) - np.array(l_hip))
-
-        new_w = max(1, int(hip_w * 2.2))
-        new_h = max(1, int(leg_h * 1.1))
-
-        resized = cv2.resize(cloth_img, (new_w, new_h))
-        cx = int((l_hip[0] + r_hip[0]) / 2 - new_w / 2)
-        cy = int(min(l_hip[1], r_hip[1]))
-
-        return overlay_transparent(frame, resized, cx, cy)
+class Outfit:
+    """One session's selection with its garments resolved to shared decoded assets.
 
-    # Tops / Shirts / Kurtas / Blouses / Polo
-    if any(tag in cloth_type for tag in ["shirt", "polo", "blouse", "kurta"]):
-        l_sh, r_sh = get_point("l_shoulder"), get_point("r_shoulder")
-        l_hip, r_hip = get_point("l_hip"), get_point("r_hip")
-
-        shoulder_w = np.linalg.norm(np.array(r_sh) - np.array(l_sh))
-        torso_h = np.linalg.norm(np.array(l_hip) - np.array(l_sh))
+    Garments come from ``asset_store``, so switching outfits only decodes a
+    PNG the first time any session picks it. Each garment gets its own
+    GarmentWarp, which keeps the last warped patch while the body is still.
+    """
 
-        new_w = max(1, int(shoulder_w * 2.0))
-        new_h = max(1, int(torso_h * 1.4))
+    def __init__(self, selection: ClothingSelection):
+        self.selection = selection
+        # drawing order: bottom, top, then dress ON TOP (does NOT remove top/bottom)
+        self.layers = [warp for warp in (self._load("Bottom", selection.bottom),
+                                         self._load("Top", selection.top),
+                                         self._load("Dress", selection.dress)) if warp is not None]
 
-        resized = cv2.resize(cloth_img, (new_w, new_h))
-        cx = int((l_sh[0] + r_sh[0]) / 2 - new_w / 2)
-        cy = int(min(l_sh[1], r_sh[1])) - int(new_h * 0.15)
+    @staticmethod
+    def _load(label: str, cloth_type: str) -> Optional[garment_warp.GarmentWarp]:
+        if cloth_type == "none":
+            return None
+        mesh = garment_mesh(cloth_type)
+        path_entry = CLOTHING_DATA.get(cloth_type)
+        # if path_entry is list choose at random (for multiple variants)
+        path = random.choice(path_entry) if isinstance(path_entry, list) else path_entry
+        asset = asset_store.get(path)
+        if asset is None or not asset.has_alpha:
+            print(f"⚠️ {label} cloth not found at {path}, skipping")
+            return None
+        if mesh is None:
+            return None
+        return garment_warp.GarmentWarp(asset, mesh)
 
-        return overlay_transparent(frame, resized, cx, cy)
 
-    # Full-body dresses / gowns / suits
-    if any(tag in cloth_type for tag in ["full_suit", "sundress", "gown"]):
-        l_sh, r_sh = get_point("l_shoulder"), get_point("r_shoulder")
-        l_toe, r_toe = get_point("l_toe"), get_point("r_toe")
+_outfits = OrderedDict()   # session -> Outfit, least recently used first
+_outfits_lock = threading.Lock()
 
-        shoulder_w = np.linalg.norm(np.array(r_sh) - np.array(l_sh))
-        dress_h = np.linalg.norm(np.array(l_toe) - np.array(l_sh)) * 1.1
-        dress_w = max(1, int(shoulder_w * 4.0))
 
-        resized = cv2.resize(cloth_img, (int(dress_w), int(dress_h)))
-        cx = int((l_sh[0] + r_sh[0]) / 2 - dress_w / 2)
-        cy = int(min(l_sh[1], r_sh[1])) - int(dress_h * 0.14)
+def get_outfit(session: Optional[str] = None) -> Outfit:
+    session = session or DEFAULT_SESSION
+    with _outfits_lock:
+        outfit = _outfits.get(session)
+        if outfit is not None:
+            _outfits.move_to_end(session)
+            return outfit
+    return set_outfit(session, ClothingSelection())
 
-        return overlay_transparent(frame, resized, cx, cy)
 
-    # default fallback: return frame unchanged
-    return frame
+def set_outfit(session: Optional[str], selection: ClothingSelection) -> Outfit:
+    session = session or DEFAULT_SESSION
+    outfit = Outfit(selection)   # asset lookups happen outside the lock
+    with _outfits_lock:
+        _outfits[session] = outfit
+        _outfits.move_to_end(session)
+        while len(_outfits) > MAX_SESSIONS:
+            _outfits.popitem(last=False)
+    return outfit
 
 
 # -------------------------------
 # Overlay Pipeline
 # -------------------------------
-def cloth_overlay(frame):
-    h, w = frame.shape[:2]
-    rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-    results = pose.process(rgb)
-
-    if results.pose_landmarks:
-        lm = results.pose_landmarks.landmark
-
+def cloth_overlay(frame, pts, outfit: Outfit):
+    """Dress one frame (modified in place) with ``outfit`` at pose pixel landmarks ``pts``."""
+    if pts is not None:
         def get_point(name):
             idx = landmark_names[name]
-            return int(lm[idx].x * w), int(lm[idx].y * h)
+            return int(pts[idx][0]), int(pts[idx][1])
 
         orig_frame = frame.copy()
 
-        # ✅ Make bottom ALWAYS visible (if exists)
-        if bottom_type != "none" and bottom_img is not None:
-            frame = place_cloth(frame, bottom_img, bottom_type, get_point)
-
-        # ✅ Make top ALWAYS visible (if exists)
-        if top_type != "none" and top_img is not None:
-            frame = place_cloth(frame, top_img, top_type, get_point)
-
-        # ✅ If dress selected, overlay it ON TOP (does NOT remove top/bottom)
-        if dress_type != "none" and dress_img is not None:
-            frame = place_cloth(frame, dress_img, dress_type, get_point)
+        # ✅ Bottom and top ALWAYS visible (if exist); dress goes ON TOP
+        for warp in outfit.layers:
+            frame = warp.render(frame, pts)
 
         # ✅ Restore neck
         try:
@@ -324,43 +240,49 @@ def cloth_overlay(frame):
 # -------------------------------
 # Video Stream Generator
 # -------------------------------
-def gen_frames():
-    cap = cv2.VideoCapture(0)
-    try:
-        while True:
-            ret, frame = cap.read()
-            if not ret:
-                break
-            frame = cv2.flip(frame, 1)
-            frame = cloth_overlay(frame)
-            _, buffer = cv2.imencode(".jpg", frame)
-            yield (b"--frame\r\n"
-                   b"Content-Type: image/jpeg\r\n\r\n" + buffer.tobytes() + b"\r\n")
-    finally:
-        try:
-            cap.release()
-        except Exception:
-            pass
+def process_camera_frame(frame, broadcaster):
+    """Shared stage: runs once per captured frame, whatever the viewer / session count."""
+    frame = cv2.flip(frame, 1)
+    rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+    # Pose runs every few frames; optical flow carries the landmarks in between
+    pts = tracking_sessions.track(f"clothes-video-{broadcaster.key}", "pose", rgb)
+    return frame, pts
+
+
+def render_outfit(state, session):
+    """Per-session stage: the shared frame dressed in that session's outfit."""
+    frame, pts = state
+    if pts is None:
+        return frame
+    return cloth_overlay(frame.copy(), pts, get_outfit(session))
+
+
+def gen_frames(session: Optional[str] = None):
+    # every viewer reads the same producer; the camera is opened and Pose runs once
+    broadcaster = video_broadcast.get(CAMERA_SOURCE, process_camera_frame, key="clothes",
+                                      render=render_outfit)
+    for jpeg in broadcaster.frames(session or DEFAULT_SESSION):
+        yield (b"--frame\r\n"
+               b"Content-Type: image/jpeg\r\n\r\n" + jpeg + b"\r\n")
 
 
 # -------------------------------
 # API Routes
 # -------------------------------
 @router.post("/update")
-async def update_clothing(selection: ClothingSelection):
-    global current_selection
-    current_selection = selection
-    load_clothing_images()
+def update_clothing(selection: ClothingSelection, session: Optional[str] = None):
+    set_outfit(session, selection)
     # return selection directly (Pydantic dict)
     return {"status": "success", **selection.dict()}
 
 
 @router.get("/health")
-async def health_check():
-    return {"status": "connected", "clothing": current_selection.dict()}
+async def health_check(session: Optional[str] = None):
+    return {"status": "connected", "clothing": get_outfit(session).selection.dict(),
+            "video": video_broadcast.stats()}
 
 
 @router.get("/video")
-def video_feed():
-    return StreamingResponse(gen_frames(), media_type="multipart/x-mixed-replace; boundary=frame")
+def video_feed(session: Optional[str] = None):
+    return StreamingResponse(gen_frames(session), media_type="multipart/x-mixed-replace; boundary=frame")
   
\ No newline at end of file
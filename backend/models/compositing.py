@@ -0,0 +1,175 @@
+# models/compositing.py
+# ---------------------------------------------------
+# Shared alpha-compositing engine for accessory overlays
+# ---------------------------------------------------
+# All try-on modules paste a BGRA accessory onto a BGR photo. This module
+# does it once, in uint8 OpenCV arithmetic on the clipped ROI only
+# (all three channels per call, no float64 temporaries).
+from typing import Optional, Tuple
+
+import cv2
+import numpy as np
+
+
+# ---------------- Helpers ----------------
+def resize(src: np.ndarray, scale: float) -> np.ndarray:
+    """Scale an overlay, using INTER_AREA when shrinking."""
+    if scale == 1.0:
+        return src
+    h, w = src.shape[:2]
+    new_w, new_h = max(1, int(w * scale)), max(1, int(h * scale))
+    interp = cv2.INTER_AREA if scale < 1.0 else cv2.INTER_LINEAR
+    return cv2.resize(src, (new_w, new_h), interpolation=interp)
+
+
+def _as_u8_mask(mask: np.ndarray) -> np.ndarray:
+    """bool / float [0, 1] / uint8 [0, 255] mask → uint8 [0, 255]."""
+    if mask.dtype == np.uint8:
+        return mask
+    if mask.dtype == bool:
+        return mask.astype(np.uint8) * 255
+    return np.clip(mask * 255.0, 0, 255).astype(np.uint8)
+
+
+def _with_alpha(src: np.ndarray) -> np.ndarray:
+    if src.shape[2] == 4:
+        return src
+    alpha = np.full(src.shape[:2], 255, dtype=np.uint8)
+    return np.dstack((src, alpha))
+
+
+def clip_box(dst_shape, x: int, y: int, w: int, h: int) -> Optional[Tuple[int, int, int, int, int, int]]:
+    """Clip a w×h box at (x, y) to the image.
+
+    Returns ``(x1, y1, x2, y2, ox, oy)`` — the destination box and the offset
+    into the overlay — or None when nothing is visible.
+    """
+    H, W = dst_shape[:2]
+    x1, y1 = max(x, 0), max(y, 0)
+    x2, y2 = min(x + w, W), min(y + h, H)
+    if x1 >= x2 or y1 >= y2:
+        return None
+    return x1, y1, x2, y2, x1 - x, y1 - y
+
+
+# ---------------- Core Blend ----------------
+def blend_roi(roi: np.ndarray, color: np.ndarray, alpha: Optional[np.ndarray],
+              premultiplied: bool = False) -> np.ndarray:
+    """Blend ``color`` (h×w×3) over ``roi`` with a uint8 ``alpha`` (h×w).
+
+    ``roi`` may be a view into a larger image; it is written in place.
+    """
+    if alpha is None:
+        roi[..., :3] = color
+        return roi
+    a3 = cv2.cvtColor(alpha, cv2.COLOR_GRAY2BGR)
+    fg = color if premultiplied else cv2.multiply(color, a3, scale=1.0 / 255.0)
+    base = roi if roi.shape[2] == 3 else cv2.cvtColor(roi, cv2.COLOR_BGRA2BGR)
+    bg = cv2.multiply(base, cv2.bitwise_not(a3), scale=1.0 / 255.0)
+    if roi.shape[2] == 3:
+        cv2.add(fg, bg, dst=roi)
+    else:
+        roi[..., :3] = cv2.add(fg, bg)
+    return roi
+
+
+# ---------------- Public API ----------------
+def overlay(dst: np.ndarray, src: np.ndarray, x: int, y: int,
+            occlusion: Optional[np.ndarray] = None, feather: int = 0,
+            premultiplied: bool = False, opacity: float = 1.0) -> np.ndarray:
+    """Paste ``src`` (BGR or BGRA) onto ``dst`` with its top-left at (x, y).
+
+    - Parts falling outside ``dst`` are clipped.
+    - ``occlusion`` is a full-frame mask (uint8, float or bool); where it is
+      set the overlay is hidden, e.g. a hair mask in front of earrings.
+    - ``feather`` Gaussian-blurs the alpha edge with that kernel size.
+    - ``premultiplied`` marks ``src`` colour as already multiplied by alpha.
+
+    ``dst`` is modified in place and returned.
+    """
+    if src is None:
+        return dst
+    h, w = src.shape[:2]
+    box = clip_box(dst.shape, x, y, w, h)
+    if box is None:
+        return dst
+    x1, y1, x2, y2, ox, oy = box
+    crop = src[oy:oy + (y2 - y1), ox:ox + (x2 - x1)]
+
+    # cvtColor / extractChannel split BGRA far faster than numpy channel slicing
+    if crop.shape[2] == 4:
+        color = cv2.cvtColor(crop, cv2.COLOR_BGRA2BGR)
+        alpha = cv2.extractChannel(crop, 3)
+        if feather > 1:
+            k = feather + (1 - feather % 2)
+            soft = cv2.GaussianBlur(alpha, (k, k), 0)
+            if premultiplied:
+                # rescale colour by soft/alpha so it stays premultiplied by the new alpha
+                color = cv2.divide(
+                    cv2.multiply(color, cv2.cvtColor(soft, cv2.COLOR_GRAY2BGR), dtype=cv2.CV_16U),
+                    cv2.cvtColor(alpha, cv2.COLOR_GRAY2BGR).astype(np.uint16), dtype=cv2.CV_8U
+                )
+            alpha = soft
+    else:
+        color, alpha = crop, None
+
+    if occlusion is not None:
+        visible = cv2.bitwise_not(_as_u8_mask(occlusion[y1:y2, x1:x2]))
+        alpha = visible if alpha is None else cv2.multiply(alpha, visible, scale=1.0 / 255.0)
+        if premultiplied:
+            color = cv2.multiply(color, cv2.cvtColor(visible, cv2.COLOR_GRAY2BGR), scale=1.0 / 255.0)
+    if opacity < 1.0:
+        opacity = max(0.0, opacity)
+        alpha = np.full(crop.shape[:2], 255, np.uint8) if alpha is None else alpha
+        alpha = cv2.convertScaleAbs(alpha, alpha=opacity)
+        if premultiplied:
+            color = cv2.convertScaleAbs(color, alpha=opacity)
+
+    blend_roi(dst[y1:y2, x1:x2], color, alpha, premultiplied)
+    return dst
+
+
+def warp(dst: np.ndarray, src: np.ndarray, M: np.ndarray, **kwargs) -> np.ndarray:
+    """Paste ``src`` through the 2×3 affine ``M`` (overlay → image pixels).
+
+    Only the clipped bounding box of the transformed overlay is rendered.
+    Extra keyword arguments are passed to :func:`overlay`.
+    """
+    if src is None:
+        return dst
+    h, w = src.shape[:2]
+    M = np.asarray(M, dtype=np.float64)
+    corners = np.array([[0, 0, 1], [w, 0, 1], [0, h, 1], [w, h, 1]], dtype=np.float64) @ M.T
+    bx1, by1 = np.floor(corners.min(axis=0)).astype(int)
+    bx2, by2 = np.ceil(corners.max(axis=0)).astype(int)
+    box = clip_box(dst.shape, bx1, by1, bx2 - bx1, by2 - by1)
+    if box is None:
+        return dst
+    x1, y1, x2, y2, _, _ = box
+
+    T = M.copy()
+    T[:, 2] -= (x1, y1)
+    warped = cv2.warpAffine(
+        _with_alpha(src), T, (x2 - x1, y2 - y1),
+        flags=cv2.INTER_LINEAR, borderMode=cv2.BORDER_CONSTANT, borderValue=(0, 0, 0, 0)
+    )
+    return overlay(dst, warped, x1, y1, **kwargs)
+
+
+def place(dst: np.ndarray, src: np.ndarray, center: Tuple[int, int],
+          scale: float = 1.0, angle: float = 0.0, **kwargs) -> np.ndarray:
+    """Scale, rotate (degrees, counter-clockwise) and centre ``src`` on ``center``."""
+    if src is None:
+        return dst
+    if scale < 1.0:
+        src, scale = resize(src, scale), 1.0   # area-filter the shrink first
+    cx, cy = center
+    h, w = src.shape[:2]
+    if abs(angle) <= 1e-2:
+        src = resize(src, scale)
+        h, w = src.shape[:2]
+        return overlay(dst, src, int(cx - w // 2), int(cy - h // 2), **kwargs)
+
+    M = cv2.getRotationMatrix2D((w / 2, h / 2), angle, scale)
+    M[:, 2] += (cx - w / 2, cy - h / 2)
+    return warp(dst, src, M, **kwargs)
@@ -0,0 +1,154 @@
+# models/detector_pool.py
+# ---------------------------------------------------
+# Process-wide pool of pre-warmed MediaPipe detectors
+# ---------------------------------------------------
+import os
+import queue
+import threading
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, Optional
+
+import mediapipe as mp
+
+# ---------------- Configuration ----------------
+POOL_SIZE = int(os.getenv("DETECTOR_POOL_SIZE", "2"))
+CHECKOUT_TIMEOUT = float(os.getenv("DETECTOR_CHECKOUT_TIMEOUT", "30"))
+WARM_KINDS = [k.strip() for k in os.getenv(
+    "DETECTOR_WARM_KINDS", "face_mesh_static,hands_static,selfie_segmentation"
+).split(",") if k.strip()]
+
+# ---------------- Detector Factories ----------------
+# The *_stream kinds and pose run in tracking mode (static_image_mode=False):
+# each graph carries state from frame to frame, so they are built per client
+# by tracking_sessions and never pooled.
+FACTORIES: Dict[str, Callable] = {
+    "face_mesh_static": lambda: mp.solutions.face_mesh.FaceMesh(
+        static_image_mode=True, max_num_faces=1,
+        refine_landmarks=True, min_detection_confidence=0.5
+    ),
+    "face_mesh_stream": lambda: mp.solutions.face_mesh.FaceMesh(
+        static_image_mode=False, max_num_faces=1, refine_landmarks=True,
+        min_detection_confidence=0.5, min_tracking_confidence=0.5
+    ),
+    "pose": lambda: mp.solutions.pose.Pose(
+        static_image_mode=False, model_complexity=1,
+        enable_segmentation=False, min_detection_confidence=0.5
+    ),
+    "hands_static": lambda: mp.solutions.hands.Hands(
+        static_image_mode=True, max_num_hands=1,
+        min_detection_confidence=0.7, min_tracking_confidence=0.5
+    ),
+    "hands_stream": lambda: mp.solutions.hands.Hands(
+        static_image_mode=False, max_num_hands=1, min_detection_confidence=0.6
+    ),
+    "selfie_segmentation": lambda: mp.solutions.selfie_segmentation.SelfieSegmentation(
+        model_selection=1
+    ),
+}
+TRACKING_KINDS = {"face_mesh_stream", "hands_stream", "pose"}
+
+
+# ---------------- Pool ----------------
+class DetectorPool:
+    """Bounded, thread-safe pool of one detector kind.
+
+    Instances are created lazily up to ``size`` and handed out with
+    ``checkout``/``checkin``; callers block when every instance is busy.
+    """
+
+    def __init__(self, kind: str, factory: Callable, size: int = POOL_SIZE):
+        self.kind = kind
+        self.size = max(1, size)
+        self._factory = factory
+        self._idle = queue.LifoQueue()
+        self._created = 0
+        self._lock = threading.Lock()
+
+    def _try_create(self):
+        with self._lock:
+            if self._created >= self.size:
+                return None
+            self._created += 1
+        try:
+            return self._factory()
+        except Exception:
+            with self._lock:
+                self._created -= 1
+            raise
+
+    def warm(self, count: Optional[int] = None):
+        """Build detectors up front so the first requests skip graph construction."""
+        target = self.size if count is None else min(count, self.size)
+        while self._created < target:
+            det = self._try_create()
+            if det is None:
+                break
+            self._idle.put(det)
+
+    def checkout(self, timeout: Optional[float] = CHECKOUT_TIMEOUT):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        det = self._try_create()
+        if det is not None:
+            return det
+        try:
+            return self._idle.get(timeout=timeout)
+        except queue.Empty:
+            raise TimeoutError(f"No '{self.kind}' detector available after {timeout}s")
+
+    def checkin(self, det):
+        if det is not None:
+            self._idle.put(det)
+
+    @contextmanager
+    def acquire(self, timeout: Optional[float] = CHECKOUT_TIMEOUT):
+        det = self.checkout(timeout)
+        try:
+            yield det
+        finally:
+            self.checkin(det)
+
+    def stats(self) -> dict:
+        return {"size": self.size, "created": self._created, "idle": self._idle.qsize()}
+
+
+_pools: Dict[str, DetectorPool] = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(kind: str) -> DetectorPool:
+    pool = _pools.get(kind)
+    if pool is not None:
+        return pool
+    if kind not in FACTORIES:
+        raise ValueError(f"Unknown detector kind '{kind}'. Use one of {sorted(FACTORIES)}.")
+    if kind in TRACKING_KINDS:
+        raise ValueError(f"'{kind}' keeps per-stream tracking state and cannot be pooled; "
+                         f"use tracking_sessions.track().")
+    with _pools_lock:
+        if kind not in _pools:
+            _pools[kind] = DetectorPool(kind, FACTORIES[kind])
+        return _pools[kind]
+
+
+# ---------------- Public API ----------------
+def acquire(kind: str, timeout: Optional[float] = CHECKOUT_TIMEOUT):
+    """Context manager lending a detector: ``with acquire("hands_static") as hands: ...``"""
+    return get_pool(kind).acquire(timeout)
+
+
+def process(kind: str, rgb):
+    """Run one RGB image through a pooled detector and return the MediaPipe result."""
+    with acquire(kind) as det:
+        return det.process(rgb)
+
+
+def warm_up(kinds: Optional[Iterable[str]] = None):
+    for kind in (WARM_KINDS if kinds is None else kinds):
+        get_pool(kind).warm()
+
+
+def stats() -> dict:
+    return {kind: pool.stats() for kind, pool in _pools.items()}
@@ -0,0 +1,105 @@
+# models/flow_tracker.py
+# ---------------------------------------------------
+# Optical-flow landmark propagation between detections
+# ---------------------------------------------------
+# FaceMesh / Hands / Pose on every frame caps a core at ~15 FPS. Between
+# full detections the last landmarks are carried forward with sparse
+# pyramidal Lucas-Kanade flow (a few ms per frame). The detection interval
+# adapts to measured motion, and tracking is abandoned (so the caller runs
+# full detection) when the forward-backward check fails for too many points.
+# Only an evenly spaced subset of a dense mesh is tracked; the remaining
+# points follow a similarity transform fitted to the tracked ones.
+import os
+from typing import Optional
+
+import cv2
+import numpy as np
+
+# ---------------- Configuration ----------------
+MAX_INTERVAL = int(os.getenv("TRACKING_DETECT_EVERY", "4"))        # 1 = detect every frame
+FAST_MOTION = float(os.getenv("TRACKING_FAST_MOTION_PX", "8"))    # px/frame → detect more often
+SLOW_MOTION = float(os.getenv("TRACKING_SLOW_MOTION_PX", "2"))    # px/frame → detect less often
+MAX_FB_ERROR = float(os.getenv("TRACKING_MAX_FB_ERROR_PX", "1.5"))
+MIN_GOOD_RATIO = float(os.getenv("TRACKING_MIN_GOOD_RATIO", "0.7"))
+MAX_FLOW_POINTS = int(os.getenv("TRACKING_MAX_FLOW_POINTS", "48"))   # FaceMesh has 478
+
+LK_PARAMS = dict(
+    winSize=(15, 15), maxLevel=2,
+    criteria=(cv2.TERM_CRITERIA_EPS | cv2.TERM_CRITERIA_COUNT, 20, 0.03),
+)
+
+
+# ---------------- Tracker ----------------
+class FlowTracker:
+    """Decides when to run full detection and propagates landmarks in between."""
+
+    def __init__(self, max_interval: int = MAX_INTERVAL):
+        self.max_interval = max(1, max_interval)
+        self.interval = 1
+        self.detections = 0
+        self.propagations = 0
+        self.failures = 0
+        self.reset()
+
+    def reset(self):
+        self._gray = None
+        self._pts = None
+        self._sample = None
+        self._since = 0
+
+    def due(self) -> bool:
+        """True when the caller should run full detection on this frame."""
+        return self._pts is None or self._since + 1 >= self.interval
+
+    def _adapt(self, motion: float):
+        if motion > FAST_MOTION:
+            self.interval = max(1, self.interval // 2)
+        elif motion < SLOW_MOTION:
+            self.interval = min(self.max_interval, self.interval + 1)
+
+    def detected(self, gray: np.ndarray, pts: np.ndarray):
+        """Record a full detection (pixel landmarks N×2) as the new tracking anchor."""
+        pts = np.asarray(pts, dtype=np.float32).reshape(-1, 1, 2)
+        if self._pts is not None and self._pts.shape == pts.shape:
+            # drift between the propagated and the detected positions: large drift → detect sooner
+            self._adapt(float(np.median(np.linalg.norm((pts - self._pts).reshape(-1, 2), axis=1))))
+        self._gray, self._pts, self._since = gray, pts, 0
+        self._sample = np.unique(np.linspace(0, len(pts) - 1, min(len(pts), MAX_FLOW_POINTS)).astype(int))
+        self.detections += 1
+
+    def propagate(self, gray: np.ndarray) -> Optional[np.ndarray]:
+        """Landmarks moved into ``gray`` (float32 N×2), or None when tracking is unreliable."""
+        if self._pts is None or self._gray is None or self._gray.shape != gray.shape:
+            return None
+        h, w = gray.shape[:2]
+        prev = self._pts[self._sample]
+        nxt, st, _ = cv2.calcOpticalFlowPyrLK(self._gray, gray, prev, None, **LK_PARAMS)
+        back, st_back, _ = cv2.calcOpticalFlowPyrLK(gray, self._gray, nxt, None, **LK_PARAMS)
+
+        p, n = prev.reshape(-1, 2), nxt.reshape(-1, 2)
+        inside = (p[:, 0] >= 0) & (p[:, 0] < w) & (p[:, 1] >= 0) & (p[:, 1] < h)
+        fb_error = np.linalg.norm(p - back.reshape(-1, 2), axis=1)
+        good = inside & (st.ravel() == 1) & (st_back.ravel() == 1) & (fb_error < MAX_FB_ERROR)
+        M = None
+        if inside.sum() >= 3 and good.sum() >= MIN_GOOD_RATIO * inside.sum():
+            M, _ = cv2.estimateAffinePartial2D(p[good], n[good], method=cv2.RANSAC,
+                                               ransacReprojThreshold=2.0)
+        if M is None:
+            self.failures += 1
+            self.interval = 1
+            self.reset()
+            return None
+
+        # untracked / failed points follow the fitted similarity; tracked ones keep their own flow
+        all_prev = self._pts.reshape(-1, 2)
+        out = (all_prev @ M[:, :2].T + M[:, 2]).astype(np.float32)
+        out[self._sample[good]] = n[good]
+        self._adapt(float(np.median(np.linalg.norm(n[good] - p[good], axis=1))))
+        self._gray, self._pts = gray, out.reshape(-1, 1, 2)
+        self._since += 1
+        self.propagations += 1
+        return out
+
+    def stats(self) -> dict:
+        return {"interval": self.interval, "detections": self.detections,
+                "propagations": self.propagations, "failures": self.failures}
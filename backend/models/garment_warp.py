@@ -0,0 +1,155 @@
+# models/garment_warp.py
+# ---------------------------------------------------
+# Pose-driven piecewise-affine garment warping
+# ---------------------------------------------------
+# A garment is annotated with control points: positions in the garment
+# image (fractions of width / height) that should land on given pose
+# landmarks. The control points plus the image border form a triangle mesh,
+# triangulated once per annotation. Each frame the control points follow the
+# landmarks, the border follows a similarity fitted to them, and every
+# triangle is mapped with its own affine transform, so the garment bends and
+# rotates with the body instead of being stretched axis-aligned. When the
+# left/right landmarks appear swapped (mirrored camera, person turned) the
+# annotation is mirrored to match.
+#
+# The warp is built as cv2.remap maps over the garment's bounding box only,
+# from the pyramid level closest to the on-screen size, and the warped patch
+# is reused until a landmark moves by more than WARP_REBUILD_PX.
+import os
+from functools import lru_cache
+from typing import Dict, Tuple
+
+import cv2
+import numpy as np
+
+from models import asset_store, compositing
+
+# ---------------- Configuration ----------------
+REBUILD_PX = float(os.getenv("WARP_REBUILD_PX", "1.5"))   # landmark motion that forces a new warp
+
+# Border points in (u, v) image fractions: corners + edge midpoints
+BORDER_UV = [(0, 0), (0.5, 0), (1, 0), (1, 0.5), (1, 1), (0.5, 1), (0, 1), (0, 0.5)]
+
+
+# ---------------- Mesh ----------------
+@lru_cache(maxsize=64)
+def _triangulate(uv: Tuple[Tuple[float, float], ...]) -> np.ndarray:
+    """Delaunay triangles (T×3 vertex indices) over normalised mesh points."""
+    pts = np.array(uv, dtype=np.float32) * 1000.0
+    x0, y0 = np.floor(pts.min(axis=0)) - 1
+    x1, y1 = np.ceil(pts.max(axis=0)) + 1
+    subdiv = cv2.Subdiv2D((int(x0), int(y0), int(x1 - x0) + 1, int(y1 - y0) + 1))
+    subdiv.insert([(float(x), float(y)) for x, y in pts])
+
+    index = {(round(x), round(y)): i for i, (x, y) in enumerate(pts)}
+    triangles = []
+    for t in subdiv.getTriangleList():
+        corners = [index.get((round(t[k]), round(t[k + 1]))) for k in (0, 2, 4)]
+        if None not in corners:   # skip triangles touching Subdiv2D's virtual outer vertices
+            triangles.append(corners)
+    return np.array(triangles, dtype=np.int32)
+
+
+class GarmentMesh:
+    """Control points (pose landmark index → garment (u, v)) plus their triangulation."""
+
+    def __init__(self, anchors: Dict[int, Tuple[float, float]]):
+        if len(anchors) < 2:
+            raise ValueError("A garment needs at least two control points")
+        self.landmarks = np.array(list(anchors), dtype=np.int32)
+        anchor_uv = [tuple(map(float, anchors[i])) for i in self.landmarks]
+        self.uv = np.array(anchor_uv + BORDER_UV, dtype=np.float32)
+        self.triangles = _triangulate(tuple(map(tuple, self.uv)))
+
+    @property
+    def n_anchors(self) -> int:
+        return len(self.landmarks)
+
+    def mirrored(self) -> "GarmentMesh":
+        """Same annotation with u → 1 - u, for bodies seen left/right swapped."""
+        anchors = {int(i): (1.0 - u, v) for i, (u, v) in zip(self.landmarks, self.uv[:self.n_anchors])}
+        return GarmentMesh(anchors)
+
+
+# ---------------- Warp ----------------
+class GarmentWarp:
+    """Warps one garment asset onto a body; caches the last warp for still poses."""
+
+    def __init__(self, asset: asset_store.Asset, mesh: GarmentMesh):
+        self.asset = asset
+        self.meshes = {False: mesh, True: mesh.mirrored()}
+        self.builds = 0
+        self.reuses = 0
+        self._key = None     # (frame shape, control points) the cached patch was built for
+        self._patch = None   # (premultiplied BGRA patch, x, y) or None when off-screen
+
+    def _build(self, frame_shape, dst_anchors: np.ndarray):
+        asset = self.asset
+        size = np.array([asset.width, asset.height], dtype=np.float32)
+        mesh = self.meshes[False]
+        A, _ = cv2.estimateAffine2D(mesh.uv[:mesh.n_anchors] * size, dst_anchors, method=cv2.LMEDS)
+        if A is not None and np.linalg.det(A[:, :2]) < 0:
+            mesh = self.meshes[True]   # landmarks are left/right swapped relative to the annotation
+        src = mesh.uv * size
+        M, _ = cv2.estimateAffinePartial2D(src[:mesh.n_anchors], dst_anchors, method=cv2.LMEDS)
+        if M is None:
+            return None
+        border = src[mesh.n_anchors:] @ M[:, :2].T + M[:, 2]
+        dst = np.vstack([dst_anchors, border]).astype(np.float32)
+
+        # render only the garment's bounding box, clipped to the frame
+        H, W = frame_shape[:2]
+        x0, y0 = np.maximum(np.floor(dst.min(axis=0)).astype(int), 0)
+        x1, y1 = np.minimum(np.ceil(dst.max(axis=0)).astype(int) + 1, (W, H))
+        if x0 >= x1 or y0 >= y1:
+            return None
+
+        # sample from the pyramid level nearest the on-screen scale
+        scale = float(np.sqrt(abs(np.linalg.det(M[:, :2]))))
+        level = asset.pyramid[0]
+        for candidate in asset.pyramid[1:]:
+            if candidate.shape[1] < asset.width * scale:
+                break
+            level = candidate
+        src = (src * (np.array([level.shape[1], level.shape[0]], dtype=np.float32) / size)).astype(np.float32)
+
+        # per-pixel triangle labels, then each triangle's inverse affine
+        local = (dst - (x0, y0)).astype(np.float32)
+        labels = np.full((y1 - y0, x1 - x0), -1, dtype=np.int32)
+        coeffs = np.zeros((len(mesh.triangles), 2, 3), dtype=np.float32)
+        for t, tri in enumerate(mesh.triangles):
+            d = local[tri]
+            area = (d[1, 0] - d[0, 0]) * (d[2, 1] - d[0, 1]) - (d[2, 0] - d[0, 0]) * (d[1, 1] - d[0, 1])
+            if abs(area) < 1.0:
+                continue   # collapsed triangle
+            coeffs[t] = cv2.getAffineTransform(d, src[tri])
+            cv2.fillConvexPoly(labels, np.rint(d).astype(np.int32), t)
+
+        ys, xs = np.mgrid[0:labels.shape[0], 0:labels.shape[1]].astype(np.float32)
+        c = coeffs[np.maximum(labels, 0)]
+        map_x = c[..., 0, 0] * xs + c[..., 0, 1] * ys + c[..., 0, 2]
+        map_y = c[..., 1, 0] * xs + c[..., 1, 1] * ys + c[..., 1, 2]
+        map_x[labels < 0] = -1   # outside the mesh → transparent border
+        map_y[labels < 0] = -1
+        map1, map2 = cv2.convertMaps(map_x, map_y, cv2.CV_16SC2)
+        patch = cv2.remap(level, map1, map2, cv2.INTER_LINEAR,
+                          borderMode=cv2.BORDER_CONSTANT, borderValue=0)
+        return patch, int(x0), int(y0)
+
+    def render(self, frame: np.ndarray, pts: np.ndarray) -> np.ndarray:
+        """Composite the garment onto ``frame`` (in place) at pose pixel landmarks ``pts``."""
+        dst_anchors = np.asarray(pts, dtype=np.float32)[self.meshes[False].landmarks, :2]
+        if (self._key is not None and self._key[0] == frame.shape
+                and np.abs(dst_anchors - self._key[1]).max() <= REBUILD_PX):
+            self.reuses += 1
+        else:
+            self._patch = self._build(frame.shape, dst_anchors)
+            self._key = (frame.shape, dst_anchors)
+            self.builds += 1
+        if self._patch is None:
+            return frame
+        patch, x, y = self._patch
+        return compositing.overlay(frame, patch, x, y, premultiplied=True)
+
+    def stats(self) -> dict:
+        return {"builds": self.builds, "reuses": self.reuses}
@@ -6,13 +6,15 @@ import random
 import math
 import io
 import base64
-import requests
 from typing import Optional
 from fastapi import APIRouter, UploadFile, File, Form
 from fastapi.responses import JSONResponse, FileResponse
 from PIL import Image
 from dotenv import load_dotenv
 
+from models import asset_store, compositing, detector_pool, landmark_cache
+from services import api_clients, worker_pool
+
 # Load .env if exists
 load_dotenv()
 
@@ -42,39 +44,31 @@ async def _file_to_bgr(upload: UploadFile) -> Optional[np.ndarray]:
         content = await upload.read()
         if not content:
             return None
-        return cv2.imdecode(np.frombuffer(content, np.uint8), cv2.IMREAD_COLOR)
+        return await worker_pool.offload("jewelry", cv2.imdecode, np.frombuffer(content, np.uint8), cv2.IMREAD_COLOR)
     except:
         return None
 
-def _read_image(path: str) -> Optional[np.ndarray]:
-    return cv2.imread(path, cv2.IMREAD_UNCHANGED) if os.path.isfile(path) else None
+def _read_image(path: str) -> Optional[asset_store.Asset]:
+    return asset_store.get(path) if os.path.isfile(path) else None
 
 def _safe_detect_landmarks(bgr) -> Optional[tuple]:
     try:
-        import mediapipe as mp
-        mp_face_mesh = mp.solutions.face_mesh
-        with mp_face_mesh.FaceMesh(static_image_mode=True, refine_landmarks=True) as fm:
-            rgb = cv2.cvtColor(bgr, cv2.COLOR_BGR2RGB)
-            res = fm.process(rgb)
-        return (res.multi_face_landmarks[0], bgr.shape[:2]) if res.multi_face_landmarks else None
+        landmarks = landmark_cache.get_face_landmarks(bgr)
+        return (landmarks, bgr.shape[:2]) if landmarks is not None else None
     except:
         return None
 
 def _pt(lm, shape_hw, idx):
     h, w = shape_hw
-    p = lm.landmark[idx]
-    return int(p.x * w), int(p.y * h)
+    return int(lm[idx, 0] * w), int(lm[idx, 1] * h)
 
 def _dist(p1, p2): return math.hypot(p1[0] - p2[0], p1[1] - p2[1])
 def _angle_deg(p1, p2): return math.degrees(math.atan2(p2[1]-p1[1], p2[0]-p1[0]))
 
 def _get_hair_mask(bgr):
     try:
-        import mediapipe as mp
-        mp_selfie = mp.solutions.selfie_segmentation
-        with mp_selfie.SelfieSegmentation(model_selection=1) as seg:
-            rgb = cv2.cvtColor(bgr, cv2.COLOR_BGR2RGB)
-            res = seg.process(rgb)
+        rgb = cv2.cvtColor(bgr, cv2.COLOR_BGR2RGB)
+        res = detector_pool.process("selfie_segmentation", rgb)
         return (res.segmentation_mask > 0.5).astype(np.float32) if res.segmentation_mask is not None else None
     except:
         return None
@@ -83,42 +77,9 @@ def _alpha_overlay(base, overlay, center, scale=1.0, angle=0.0, behind_hair=Fals
     try:
         if overlay is None:
             return base
-
-        h, w = overlay.shape[:2]
-        new_w, new_h = max(1, int(w * scale)), max(1, int(h * scale))
-        overlay = cv2.resize(overlay, (new_w, new_h), cv2.INTER_AREA)
-
-        if abs(angle) > 1e-2:
-            M = cv2.getRotationMatrix2D((new_w / 2, new_h / 2), angle, 1.0)
-            overlay = cv2.warpAffine(
-                overlay, M, (new_w, new_h),
-                flags=cv2.INTER_LINEAR, borderMode=cv2.BORDER_CONSTANT, borderValue=(0, 0, 0, 0)
-            )
-
-        cx, cy = center
-        x1, y1, x2, y2 = cx - new_w // 2, cy - new_h // 2, cx + new_w // 2, cy + new_h // 2
-        H, W = base.shape[:2]
-        if x1 >= W or y1 >= H or x2 <= 0 or y2 <= 0:
-            return base
-
-        x1c, y1c, x2c, y2c = max(0, x1), max(0, y1), min(W, x2), min(H, y2)
-        overlay_crop = overlay[(y1c - y1):(y2c - y1), (x1c - x1):(x2c - x1)]
-
-        if overlay_crop.shape[2] == 3:
-            alpha = np.ones((*overlay_crop.shape[:2], 1), dtype=np.float32)
-            rgb = overlay_crop.astype(np.float32)
-        else:
-            alpha = overlay_crop[:, :, 3:4].astype(np.float32) / 255.0
-            rgb = overlay_crop[:, :, :3].astype(np.float32)
-
-        roi = base[y1c:y2c, x1c:x2c].astype(np.float32)
-        if behind_hair and hair_mask is not None:
-            mask_crop = hair_mask[y1c:y2c, x1c:x2c][..., None].astype(np.float32)
-            alpha *= (1 - mask_crop)
-
-        blended = alpha * rgb + (1 - alpha) * roi
-        base[y1c:y2c, x1c:x2c] = blended.astype(np.uint8)
-        return base
+        occlusion = hair_mask if behind_hair else None
+        return compositing.place(base, overlay.scaled(scale), center, 1.0, angle,
+                                 occlusion=occlusion, premultiplied=True)
     except:
         return base
 
@@ -163,13 +124,13 @@ def _place_item(base, item, overlay_path=None):
         nose_base = _pt(landmarks, shape_hw, 2)
         angle = _angle_deg(nose_tip, nose_base) * 0.6
         center = (nose_tip[0] + int(0.13 * face_w), nose_tip[1] - int(0.06 * face_w))
-        scale = max(0.100 * face_w / overlay.shape[1], 0.09)
+        scale = max(0.100 * face_w / overlay.width, 0.09)
         return _alpha_overlay(base, overlay, center, scale, angle), warning
 
     if item_l in ("earrings", "earring"):
         if face_w < 60:
             return base, "Ears not visible, skipping earrings"
-        scale = max(0.28 * face_w / overlay.shape[1], 0.14)
+        scale = max(0.28 * face_w / overlay.width, 0.14)
         left_ear = (left_face[0] + int(0.01 * face_w), left_face[1] + int(0.13 * face_w))
         right_ear = (right_face[0] - int(0.01 * face_w), right_face[1] + int(0.13 * face_w))
         hair_mask = _get_hair_mask(base)
@@ -182,7 +143,7 @@ def _place_item(base, item, overlay_path=None):
         inner_right = _pt(landmarks, shape_hw, 334)
         center = ((inner_left[0] + inner_right[0]) // 2 + 3,
                   (inner_left[1] + inner_right[1]) // 2 - int(0.01 * face_w))
-        scale = max(0.09 * face_w / overlay.shape[1], 0.100)
+        scale = max(0.09 * face_w / overlay.width, 0.100)
         return _alpha_overlay(base, overlay, center, scale), warning
 
     if item_l == "tikka":
@@ -190,13 +151,13 @@ def _place_item(base, item, overlay_path=None):
         inner_right = _pt(landmarks, shape_hw, 334)
         center = ((inner_left[0] + inner_right[0]) // 2 + 10,
                   min(inner_left[1], inner_right[1]) - int(0.40 * face_w))
-        scale = max(0.50 * face_w / overlay.shape[1], 0.100)
+        scale = max(0.50 * face_w / overlay.width, 0.100)
         return _alpha_overlay(base, overlay, center, scale), warning
 
     if item_l == "necklace":
         chin = _pt(landmarks, shape_hw, 152)
         center = (chin[0], chin[1] + int(0.28 * face_w))
-        scale = max(0.85 * face_w / overlay.shape[1], 0.28)
+        scale = max(0.85 * face_w / overlay.width, 0.28)
         return _alpha_overlay(base, overlay, center, scale), warning
 
     return base, warning
@@ -204,10 +165,11 @@ def _place_item(base, item, overlay_path=None):
 # ------------------- Endpoints -------------------
 
 @router.post("/recommend-jewelry/")
+@worker_pool.limited("jewelry")
 async def recommend_jewelry(file: UploadFile = File(...)):
     try:
         bgr = await _file_to_bgr(file)
-        face_detected = bool(bgr is not None and _safe_detect_landmarks(bgr) is not None)
+        face_detected = bool(bgr is not None and await worker_pool.offload("jewelry", _safe_detect_landmarks, bgr) is not None)
         return {
             "metals": random.sample(["Yellow Gold", "Rose Gold", "Silver", "White Gold"], 2),
             "gemstones": random.sample(["Emerald", "Ruby", "Pearl", "Sapphire", "Amethyst"], 2),
@@ -237,17 +199,29 @@ async def list_jewelry_images(item: str):
     })
     return {"images": list(files)}
 
+def _write_temp_png(img) -> str:
+    fd, tmp = tempfile.mkstemp(suffix=".png")
+    os.close(fd)
+    cv2.imwrite(tmp, img)
+    return tmp
+
+def _place_items(base, selected_overlays: dict):
+    out = base.copy()
+    for key, overlay_url in selected_overlays.items():
+        overlay_path = _resolve_overlay_path(overlay_url, key)
+        out, _ = _place_item(out, key, overlay_path)
+    return out
+
 @router.post("/tryon-jewelry/")
+@worker_pool.limited("jewelry")
 async def tryon_jewelry(file: UploadFile = File(...), item: str = Form(...), overlay_url: str = Form(None)):
     try:
         bgr = await _file_to_bgr(file)
         if bgr is None:
             return JSONResponse({"error": "Invalid image"}, status_code=400)
         overlay_path = _resolve_overlay_path(overlay_url, item)
-        out, warn = _place_item(bgr, item, overlay_path)
-        fd, tmp = tempfile.mkstemp(suffix=".png")
-        os.close(fd)
-        cv2.imwrite(tmp, out)
+        out, warn = await worker_pool.offload("jewelry", _place_item, bgr, item, overlay_path)
+        tmp = await worker_pool.offload("jewelry", _write_temp_png, out)
         headers = {"Cache-Control": "no-store"}
         if warn: headers["X-Warning"] = warn
         return FileResponse(tmp, media_type="image/png", filename=f"tryon_{item}.png", headers=headers)
@@ -255,53 +229,45 @@ async def tryon_jewelry(file: UploadFile = File(...), item: str = Form(...), ove
         return JSONResponse(status_code=500, content={"error": "Try-on failed"})
 
 @router.post("/apply-all-jewelry/")
+@worker_pool.limited("jewelry")
 async def apply_all_jewelry(file: UploadFile = File(...), items: str = Form(...)):
     try:
         import json
         bgr = await _file_to_bgr(file)
         selected_overlays = json.loads(items) if items else {}
-        out = bgr.copy()
-        for key, overlay_url in selected_overlays.items():
-            overlay_path = _resolve_overlay_path(overlay_url, key)
-            out, _ = _place_item(out, key, overlay_path)
-        fd, tmp = tempfile.mkstemp(suffix=".png")
-        os.close(fd)
-        cv2.imwrite(tmp, out)
+        out = await worker_pool.offload("jewelry", _place_items, bgr, selected_overlays)
+        tmp = await worker_pool.offload("jewelry", _write_temp_png, out)
         return FileResponse(tmp, media_type="image/png", filename="tryon_selected.png")
     except Exception as e:
         return JSONResponse(status_code=500, content={"error": str(e)})
 
 # ------------------- Gemini Prompt Endpoint -------------------
 # ------------------- Gemini Prompt Endpoint -------------------
-from google import genai
-from google.genai import types
 import logging
 
-# Initialize Gemini client
-client = genai.Client(api_key=os.environ.get("GEMINI_API_KEY"))
 logging.basicConfig(level=logging.INFO)
 
+def _generate_with_prompt(prompt: str, image_bytes: bytes):
+    """Blocking Gemini image generation; run through worker_pool.offload."""
+    from google.genai import types   # deferred with the client (see services/api_clients.py)
+    return api_clients.gemini().models.generate_content(
+        model="gemini-2.0-flash-exp-image-generation",
+        contents=[prompt, Image.open(io.BytesIO(image_bytes))],
+        config=types.GenerateContentConfig(
+            response_modalities=["TEXT", "IMAGE"],
+            temperature=0.2,
+            top_p=0.5
+        )
+    )
+
 @router.post("/prompt-jewelry-tryon/")
 async def prompt_jewelry_tryon(file: UploadFile = File(...), prompt: str = Form(...)):
     try:
         image_bytes = await file.read()
         Image.open(io.BytesIO(image_bytes))  # Validate image
 
-        # Build Gemini contents
-        contents = [
-            prompt,
-            Image.open(io.BytesIO(image_bytes))
-        ]
-
-        response = client.models.generate_content(
-            model="gemini-2.0-flash-exp-image-generation",
-            contents=contents,
-            config=types.GenerateContentConfig(
-                response_modalities=["TEXT", "IMAGE"],
-                temperature=0.2,
-                top_p=0.5
-            )
-        )
+        # the SDK call is synchronous: keep the Gemini round trip off the event loop
+        response = await worker_pool.offload("jewelry", _generate_with_prompt, prompt, image_bytes)
 
         result_text = ""
         result_image = None
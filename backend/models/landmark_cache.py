@@ -0,0 +1,136 @@
+# models/landmark_cache.py
+# ---------------------------------------------------
+# Content-hash keyed FaceMesh landmark cache
+# ---------------------------------------------------
+# The frontend sends the same photo to several endpoints in a row
+# (skin analysis, makeup, jewellery, caps/glasses). Landmarks are cached
+# by a BLAKE2 digest of the decoded pixels so each upload is analysed once.
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+import cv2
+import numpy as np
+
+from models import detector_pool
+
+# ---------------- Configuration ----------------
+MAX_ENTRIES = int(os.getenv("LANDMARK_CACHE_ENTRIES", "256"))
+TTL_SECONDS = float(os.getenv("LANDMARK_CACHE_TTL", "600"))
+MAX_BYTES = int(os.getenv("LANDMARK_CACHE_MAX_BYTES", str(8 * 1024 * 1024)))
+
+NUM_LANDMARKS = 478   # FaceMesh with refine_landmarks=True
+_ENTRY_OVERHEAD = 256  # key, timestamps and dict slot, roughly
+
+
+# ---------------- Helpers ----------------
+def image_key(img: np.ndarray) -> str:
+    """BLAKE2 digest of the decoded pixels (plus shape, so crops never collide)."""
+    h = hashlib.blake2b(digest_size=16)
+    h.update(repr((img.shape, img.dtype.str)).encode())
+    h.update(np.ascontiguousarray(img).data)
+    return h.hexdigest()
+
+
+def to_array(face_landmarks) -> np.ndarray:
+    """MediaPipe NormalizedLandmarkList → float32 array of shape (N, 3)."""
+    return np.array([(p.x, p.y, p.z) for p in face_landmarks.landmark], dtype=np.float32)
+
+
+def to_pixels(landmarks: np.ndarray, shape) -> np.ndarray:
+    """Normalised (N, 3) landmarks → int32 (N, 2) pixel coordinates."""
+    h, w = shape[:2]
+    return (landmarks[:, :2] * np.array([w, h], dtype=np.float32)).astype(np.int32)
+
+
+# ---------------- Cache ----------------
+class LandmarkCache:
+    """Thread-safe LRU with per-entry TTL and a total memory cap.
+
+    Misses that found no face are cached too (as ``None``) so a bad upload
+    is not re-analysed by every endpoint.
+    """
+
+    def __init__(self, max_entries=MAX_ENTRIES, ttl=TTL_SECONDS, max_bytes=MAX_BYTES):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._data = OrderedDict()   # key -> (expires_at, landmarks or None)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _size(value) -> int:
+        return _ENTRY_OVERHEAD + (value.nbytes if value is not None else 0)
+
+    def _pop(self, key):
+        _, value = self._data.pop(key)
+        self._bytes -= self._size(value)
+
+    def get(self, key):
+        """Return ``(found, landmarks)``."""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return False, None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                self._pop(key)
+                self.misses += 1
+                return False, None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return True, value
+
+    def put(self, key, value: Optional[np.ndarray]):
+        with self._lock:
+            if key in self._data:
+                self._pop(key)
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._bytes += self._size(value)
+            while self._data and (len(self._data) > self.max_entries or self._bytes > self.max_bytes):
+                self._pop(next(iter(self._data)))
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._bytes = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"entries": len(self._data), "bytes": self._bytes,
+                    "hits": self.hits, "misses": self.misses}
+
+
+_cache = LandmarkCache()
+
+
+# ---------------- Public API ----------------
+def get_face_landmarks(img_bgr: np.ndarray) -> Optional[np.ndarray]:
+    """Static-image FaceMesh landmarks as a read-only float32 (478, 3) array, or None."""
+    key = image_key(img_bgr)
+    found, landmarks = _cache.get(key)
+    if found:
+        return landmarks
+
+    rgb = cv2.cvtColor(img_bgr, cv2.COLOR_BGR2RGB)
+    res = detector_pool.process("face_mesh_static", rgb)
+    landmarks = to_array(res.multi_face_landmarks[0]) if res.multi_face_landmarks else None
+    if landmarks is not None:
+        landmarks.setflags(write=False)   # shared between callers
+    _cache.put(key, landmarks)
+    return landmarks
+
+
+def stats() -> dict:
+    return _cache.stats()
+
+
+def clear():
+    _cache.clear()
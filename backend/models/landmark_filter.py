@@ -0,0 +1,86 @@
+# models/landmark_filter.py
+# ---------------------------------------------------
+# One-Euro temporal smoothing for realtime placement landmarks
+# ---------------------------------------------------
+# Raw per-frame landmarks jitter by a few pixels, which makes caps, glasses
+# and watches shake. The One-Euro filter (Casiez et al., CHI 2012) is a
+# low-pass filter whose cutoff rises with speed: strong smoothing while the
+# head/hand is still, little lag when it moves. Only the key points used
+# for placement are filtered.
+import math
+import os
+import time
+from typing import Optional
+
+import numpy as np
+
+# ---------------- Configuration ----------------
+MIN_CUTOFF = float(os.getenv("LANDMARK_FILTER_MIN_CUTOFF", "1.0"))   # Hz
+BETA = float(os.getenv("LANDMARK_FILTER_BETA", "0.007"))              # cutoff gain per px/s
+D_CUTOFF = float(os.getenv("LANDMARK_FILTER_D_CUTOFF", "1.0"))        # Hz, for the speed estimate
+RESET_AFTER = float(os.getenv("LANDMARK_FILTER_RESET_AFTER", "0.5"))  # s without data → restart
+
+# Landmarks the try-on modules actually place accessories with
+KEY_POINTS = {
+    "face": [10, 33, 234, 263, 454],    # forehead, eye corners, face sides
+    "hands": [0, 5, 9, 13, 17],         # wrist + finger MCP joints
+    "pose": [11, 12, 23, 24],           # shoulders + hips
+}
+
+
+# ---------------- Filter ----------------
+def _alpha(cutoff, dt: float):
+    tau = 1.0 / (2.0 * math.pi * cutoff)
+    return 1.0 / (1.0 + tau / dt)
+
+
+class OneEuroFilter:
+    """Vectorised One-Euro filter over an array of coordinates."""
+
+    def __init__(self, min_cutoff: float = MIN_CUTOFF, beta: float = BETA, d_cutoff: float = D_CUTOFF):
+        self.min_cutoff = min_cutoff
+        self.beta = beta
+        self.d_cutoff = d_cutoff
+        self.reset()
+
+    def reset(self):
+        self._x = None
+        self._dx = None
+        self._t = None
+
+    def __call__(self, x, t: float) -> np.ndarray:
+        x = np.asarray(x, dtype=np.float64)
+        if self._x is None or self._x.shape != x.shape or t - self._t > RESET_AFTER:
+            self._x, self._dx, self._t = x.copy(), np.zeros_like(x), t
+            return self._x.copy()
+
+        dt = max(t - self._t, 1e-6)
+        a_d = _alpha(self.d_cutoff, dt)
+        self._dx = a_d * (x - self._x) / dt + (1.0 - a_d) * self._dx
+        a = _alpha(self.min_cutoff + self.beta * np.abs(self._dx), dt)
+        self._x = a * x + (1.0 - a) * self._x
+        self._t = t
+        return self._x.copy()
+
+
+# ---------------- Key-point Smoother ----------------
+class LandmarkSmoother:
+    """Smooths the placement key points of one detector group ("face", "hands", "pose")."""
+
+    def __init__(self, group: str, **filter_kwargs):
+        if group not in KEY_POINTS:
+            raise ValueError(f"Unknown landmark group '{group}'. Use one of {sorted(KEY_POINTS)}.")
+        self.group = group
+        self.indices = KEY_POINTS[group]
+        self.filter = OneEuroFilter(**filter_kwargs)
+
+    def __call__(self, pts: np.ndarray, t: Optional[float] = None) -> np.ndarray:
+        """Copy of ``pts`` (N×2 pixels) with the key points replaced by their filtered values."""
+        t = time.monotonic() if t is None else t
+        smoothed = self.filter(pts[self.indices, :2], t)
+        out = np.array(pts, copy=True)
+        out[self.indices, :2] = np.rint(smoothed) if np.issubdtype(out.dtype, np.integer) else smoothed
+        return out
+
+    def reset(self):
+        self.filter.reset()
@@ -1,19 +1,16 @@
+import os
+import threading
 import cv2
 import numpy as np
-import mediapipe as mp
-from typing import Dict, Tuple, List
-
-# ---------------- FaceMesh ----------------
-_mp_face_mesh = None
-def get_face_mesh(static_image_mode: bool = True):
-    global _mp_face_mesh
-    if _mp_face_mesh is None:
-        _mp_face_mesh = mp.solutions.face_mesh.FaceMesh(
-            static_image_mode=static_image_mode,
-            max_num_faces=1,
-            refine_landmarks=True
-        )
-    return _mp_face_mesh
+from collections import OrderedDict
+from functools import lru_cache, wraps
+from typing import Dict, Tuple, List, NamedTuple, Optional
+
+from models import compositing, detector_pool, landmark_cache
+
+LUT_CACHE_SIZE = int(os.getenv("MAKEUP_LUT_CACHE", "256"))   # (mode, colour) tables kept
+MASK_CACHE_SIZE = int(os.getenv("MAKEUP_MASK_CACHE", "128"))  # feathered masks kept (cropped)
+MASK_QUANT_PX = max(1, int(os.getenv("MAKEUP_MASK_QUANT_PX", "1")))   # landmark grid for cache keys
 
 # ---------------- Landmark groups ----------------
 FACE_OVAL = [10,338,297,332,284,251,389,356,454,323,361,288,397,365,379,378,400,377,152,
@@ -34,22 +31,46 @@ def hex_to_bgr(hex_color: str) -> Tuple[int,int,int]:
     return (b,g,r)
 
 def detect_landmarks_bgr(img_bgr: np.ndarray, is_stream=False):
-    fm = get_face_mesh(static_image_mode=not is_stream)
+    """FaceMesh landmarks as a float32 (478, 3) array, or None if no face.
+
+    ``is_stream`` frames skip the landmark cache (they never repeat); detection
+    stays on the pooled static graph, since a tracking graph shared between
+    callers would mix their frames. Per-client tracking is ``tracking_sessions``.
+    """
+    if not is_stream:
+        return landmark_cache.get_face_landmarks(img_bgr)
     img_rgb = cv2.cvtColor(img_bgr, cv2.COLOR_BGR2RGB)
-    res = fm.process(img_rgb)
+    res = detector_pool.process("face_mesh_static", img_rgb)
     if not res.multi_face_landmarks:
         return None
-    return res.multi_face_landmarks[0]
+    return landmark_cache.to_array(res.multi_face_landmarks[0])
 
 def landmark_dict(landmarks, shape) -> Dict[int,Tuple[int,int]]:
-    h,w = shape[:2]
-    return {i:(int(lm.x*w), int(lm.y*h)) for i,lm in enumerate(landmarks.landmark)}
+    pts = landmark_cache.to_pixels(landmarks, shape)
+    return {i:(int(x), int(y)) for i,(x,y) in enumerate(pts)}
+
+def mask_bbox(mask, pad: int = 0) -> Optional[Tuple[slice,slice]]:
+    """(rows, cols) slices around the non-zero part of ``mask`` grown by ``pad``; None if empty."""
+    if mask.ndim==3:
+        mask=cv2.cvtColor(mask,cv2.COLOR_BGR2GRAY)
+    x,y,w,h=cv2.boundingRect(mask)   # image form: one pass, no point list
+    if w==0 or h==0:
+        return None
+    H,W=mask.shape[:2]
+    return slice(max(y-pad,0),min(y+h+pad,H)), slice(max(x-pad,0),min(x+w+pad,W))
 
 def feather(mask,k,sigma):
     if mask.ndim==3:
         mask=cv2.cvtColor(mask,cv2.COLOR_BGR2GRAY)
     k = k + (1 - k % 2)
-    return cv2.GaussianBlur(mask,(k,k),sigma)
+    # blur only the mask's box plus the kernel reach; one extra pixel keeps the
+    # reflected crop border at zero, so the result equals a full-frame blur
+    box=mask_bbox(mask,pad=k//2+1)
+    if box is None:
+        return mask
+    out=np.zeros_like(mask)
+    out[box]=cv2.GaussianBlur(mask[box],(k,k),sigma)
+    return out
 
 def poly_mask(shape_hw, pts):
     m = np.zeros(shape_hw,dtype=np.uint8)
@@ -63,49 +84,150 @@ def _polyline_mask(shape_hw, pts, thickness):
         cv2.polylines(m,[np.array(pts,np.int32)],False,255,thickness,cv2.LINE_AA)
     return m
 
-def _alpha(mask: np.ndarray, alpha: float) -> np.ndarray:
+def _alpha_u8(mask: np.ndarray, alpha: float) -> np.ndarray:
+    """mask × alpha as uint8 0..255 (alpha is clamped to [0, 1])."""
     if mask.ndim==3:
         mask=cv2.cvtColor(mask,cv2.COLOR_BGR2GRAY)
-    a=(mask.astype(np.float32)/255.0)*float(alpha)
-    return a[...,None]
+    return cv2.convertScaleAbs(mask,alpha=min(max(float(alpha),0.0),1.0))
+
+# ---------------- ROI Masks ----------------
+# Feature masks never exist at frame size: each one is its non-zero crop plus
+# the crop's position, built in a box around its landmarks and blended
+# straight into that box of the canvas, so the cost follows the feature size.
+class RoiMask(NamedTuple):
+    """A mask as its tight non-zero crop (read-only uint8) and the crop's top-left in the frame."""
+    crop: np.ndarray
+    y: int
+    x: int
+
+    @property
+    def empty(self) -> bool:
+        return self.crop.size==0
+
+    @property
+    def box(self) -> Tuple[slice,slice]:
+        h,w=self.crop.shape[:2]
+        return slice(self.y,self.y+h), slice(self.x,self.x+w)
+
+    def full(self, shape) -> np.ndarray:
+        """Frame-sized copy (for debugging / comparisons; the pipeline never needs it)."""
+        m=np.zeros(shape[:2],np.uint8)
+        if not self.empty:
+            m[self.box]=self.crop
+        return m
+
+EMPTY_MASK=RoiMask(np.zeros((0,0),np.uint8),0,0)
+
+def to_roi(mask: np.ndarray, y: int = 0, x: int = 0) -> RoiMask:
+    """Tight RoiMask of a local ``mask`` whose top-left sits at (y, x) in the frame."""
+    bx,by,w,h=cv2.boundingRect(mask)
+    if w==0 or h==0:
+        return EMPTY_MASK
+    crop=mask[by:by+h,bx:bx+w]
+    crop.setflags(write=False)   # may be shared through the mask cache
+    return RoiMask(crop,y+by,x+bx)
+
+def roi_max(*masks: RoiMask) -> RoiMask:
+    """Pixel-wise max of RoiMasks over the union of their boxes."""
+    masks=[m for m in masks if not m.empty]
+    if len(masks)<=1:
+        return masks[0] if masks else EMPTY_MASK
+    y0=min(m.y for m in masks); x0=min(m.x for m in masks)
+    y1=max(m.y+m.crop.shape[0] for m in masks); x1=max(m.x+m.crop.shape[1] for m in masks)
+    out=np.zeros((y1-y0,x1-x0),np.uint8)
+    for m in masks:
+        h,w=m.crop.shape
+        dst=out[m.y-y0:m.y-y0+h,m.x-x0:m.x-x0+w]
+        cv2.max(dst,m.crop,dst=dst)
+    out.setflags(write=False)
+    return RoiMask(out,y0,x0)
 
 # ---------------- Blend Modes ----------------
+# Each mode blends ``color_bgr`` into ``base`` in place through a same-sized
+# ``mask``; ``blend_into`` hands them the canvas view under a RoiMask.
+def blend_into(canvas,blend,color_bgr,mask: RoiMask,alpha):
+    """Run ``blend`` on the box of ``mask`` inside ``canvas`` (in place)."""
+    if not mask.empty:
+        blend(canvas[mask.box],color_bgr,mask.crop,alpha)
+    return canvas
+
+# The colour is constant per call, so each mode is a per-channel 256-entry
+# table: cv2.LUT + an integer alpha lerp, no float planes.
+@lru_cache(maxsize=LUT_CACHE_SIZE)
+def blend_lut(mode: str, color: Tuple[int,int,int]) -> np.ndarray:
+    """(1, 256, 3) uint8 table mapping base values to the ``mode`` blend with ``color``."""
+    b=(np.arange(256,dtype=np.float32)/255.0)[:,None]
+    c=np.array(color,np.float32)[None,:]/255.0
+    if mode=="multiply":
+        out=np.rint(b*c*255.0)
+    elif mode=="softlight":
+        out=(2*b*c+(b**2)*(1-2*c))*255.0
+    elif mode=="hsv_tint":
+        # ``color`` is the target HSV; H is replaced, S pulled towards it, V lifted slightly
+        H,S,_=color
+        out=np.empty((256,3),np.float32)
+        out[:,0]=H
+        out[:,1]=np.arange(256)*0.40+max(S,120)*0.60
+        out[:,2]=np.arange(256)*0.90+22
+    else:
+        raise ValueError(f"Unknown blend mode '{mode}'")
+    lut=np.clip(out,0,255).astype(np.uint8).reshape(1,256,3)
+    lut.setflags(write=False)   # shared between requests
+    return lut
+
+@lru_cache(maxsize=8)
+def value_scale_lut(factor: float) -> np.ndarray:
+    """HSV table leaving H, S alone and scaling V by ``factor``."""
+    ramp=np.arange(256,dtype=np.float32)
+    lut=np.stack([ramp,ramp,np.clip(ramp*factor,0,255)],axis=1).astype(np.uint8).reshape(1,256,3)
+    lut.setflags(write=False)
+    return lut
+
+def _lerp(base,top,mask,alpha):
+    return compositing.blend_roi(base,top,_alpha_u8(mask,alpha))
+
 def blend_normal(base,color_bgr,mask,alpha):
-    color=np.full_like(base,color_bgr)
-    a=_alpha(mask,alpha)
-    out=base.astype(np.float32)*(1-a)+color.astype(np.float32)*a
-    return np.clip(out,0,255).astype(np.uint8)
+    return _lerp(base,np.full_like(base,color_bgr),mask,alpha)
 
 def blend_multiply(base,color_bgr,mask,alpha):
-    color=np.full_like(base,color_bgr)
-    mul=(base.astype(np.float32)/255.0)*(color.astype(np.float32)/255.0)*255.0
-    a=_alpha(mask,alpha)
-    out=base.astype(np.float32)*(1-a)+mul*a
-    return np.clip(out,0,255).astype(np.uint8)
+    return _lerp(base,cv2.LUT(base,blend_lut("multiply",tuple(color_bgr))),mask,alpha)
 
 def blend_softlight(base,color_bgr,mask,alpha):
-    base_f=base.astype(np.float32)/255.0
-    color_f=np.full_like(base_f,np.array(color_bgr,np.float32)/255.0)
-    A=2*base_f*color_f+(base_f**2)*(1-2*color_f)
-    soft=np.clip(A*255.0,0,255).astype(np.uint8)
-    a=_alpha(mask,alpha)
-    out=base.astype(np.float32)*(1-a)+soft.astype(np.float32)*a
-    return np.clip(out,0,255).astype(np.uint8)
+    return _lerp(base,cv2.LUT(base,blend_lut("softlight",tuple(color_bgr))),mask,alpha)
 
 def tint_hsv_preserve_value(base,target_bgr,mask,alpha):
-    base_hsv=cv2.cvtColor(base,cv2.COLOR_BGR2HSV).astype(np.float32)
-    tgt_hsv=cv2.cvtColor(np.uint8([[target_bgr]]),cv2.COLOR_BGR2HSV)[0,0].astype(np.float32)
-    H,S,_=tgt_hsv
-    tint=base_hsv.copy()
-    tint[...,0]=H
-    tint[...,1]=np.clip(tint[...,1]*0.40+max(S,120)*0.60,0,255)
-    tint[...,2]=np.clip(tint[...,2]*0.90+22,0,255)
-    tint_bgr=cv2.cvtColor(tint.astype(np.uint8),cv2.COLOR_HSV2BGR)
-    a=_alpha(mask,alpha)
-    out=base.astype(np.float32)*(1-a)+tint_bgr.astype(np.float32)*a
-    return np.clip(out,0,255).astype(np.uint8)
+    tgt_hsv=tuple(int(v) for v in cv2.cvtColor(np.uint8([[target_bgr]]),cv2.COLOR_BGR2HSV)[0,0])
+    tint_hsv=cv2.LUT(cv2.cvtColor(base,cv2.COLOR_BGR2HSV),blend_lut("hsv_tint",tgt_hsv))
+    return _lerp(base,cv2.cvtColor(tint_hsv,cv2.COLOR_HSV2BGR),mask,alpha)
 
 # ---------------- Masks ----------------
+def local_mask(groups, margin):
+    """Build the mask inside the box of its landmark ``groups`` (+``margin`` px) and return a RoiMask.
+
+    ``margin`` (px, or a function of the builder's extra arguments) must cover
+    the builder's morphology and feather reach; the result then equals
+    drawing on the full frame.
+    """
+    ids=sorted({i for g in groups for i in g})
+    def decorate(fn):
+        @wraps(fn)
+        def wrapper(shape,lmd,*args,**kwargs):
+            pts=[lmd[i] for i in ids if i in lmd]
+            if len(pts)<2:
+                return EMPTY_MASK
+            pad=margin(*args,**kwargs) if callable(margin) else margin
+            x,y,w,h=cv2.boundingRect(np.array(pts,np.int32))
+            H,W=shape[:2]
+            x0,y0=max(x-pad,0),max(y-pad,0)
+            x1,y1=min(x+w+pad,W),min(y+h+pad,H)
+            if x0>=x1 or y0>=y1:
+                return EMPTY_MASK
+            local={i:(px-x0,py-y0) for i,(px,py) in lmd.items()}   # nested builders need every point
+            return to_roi(fn((y1-y0,x1-x0),local,*args,**kwargs),y0,x0)
+        return wrapper
+    return decorate
+
+@local_mask([LIPS_OUTER,LIPS_INNER],margin=16)   # close 7 + dilate 7 + feather 11
 def lips_mask(shape,lmd):
     outer=[lmd[i] for i in LIPS_OUTER if i in lmd]
     inner=[lmd[i] for i in LIPS_INNER if i in lmd]
@@ -117,6 +239,7 @@ def lips_mask(shape,lmd):
     m=cv2.dilate(m,k,iterations=1)
     return feather(m,11,5.0)
 
+@local_mask([CHEEKS],margin=lambda radius=30: radius+18)   # circle + feather 33
 def cheeks_mask(shape,lmd,radius=30):
     m=np.zeros(shape[:2],dtype=np.uint8)
     for i in CHEEKS:
@@ -124,6 +247,7 @@ def cheeks_mask(shape,lmd,radius=30):
             cv2.circle(m,lmd[i],radius,255,cv2.FILLED)
     return feather(m,33,18.0)
 
+@local_mask([EYESHADOW_LEFT,EYESHADOW_RIGHT],margin=12)   # dilate 9 + feather 11
 def eyeshadow_mask(shape,lmd,left=True):
     seq=EYESHADOW_LEFT if left else EYESHADOW_RIGHT
     pts=[lmd[i] for i in seq if i in lmd]
@@ -132,6 +256,7 @@ def eyeshadow_mask(shape,lmd,left=True):
     m=cv2.dilate(m,k,iterations=1)
     return feather(m,11,4.0)
 
+@local_mask([KOHL_LEFT,KOHL_RIGHT],margin=20)   # shift 2 + wing 6 + line width + feather 3
 def kohl_mask(shape,lmd,left=True,base_thickness=2,intensity=1.0):
     seq=KOHL_LEFT if left else KOHL_RIGHT
     pts=[lmd[i] for i in seq if i in lmd]
@@ -158,6 +283,7 @@ def _upper_eye_region(shape,lmd):
     m=cv2.dilate(m,k,iterations=1)
     return feather(m,5,2.0)
 
+@local_mask([KOHL_LEFT,KOHL_RIGHT,EYESHADOW_LEFT,EYESHADOW_RIGHT],margin=12)   # eye region ⊇ lashes
 def mascara_mask(shape,lmd,intensity=1.0):
     mL=_polyline_mask(shape[:2],[lmd[i] for i in KOHL_LEFT if i in lmd],2)
     mR=_polyline_mask(shape[:2],[lmd[i] for i in KOHL_RIGHT if i in lmd],2)
@@ -169,56 +295,130 @@ def mascara_mask(shape,lmd,intensity=1.0):
     m=cv2.bitwise_and(dilated,eye_region)
     return feather(m,5,1.5)
 
-def face_oval_mask(shape,lmd):
+def face_oval_mask(shape,lmd,masks=None):
     pts=[lmd[i] for i in FACE_OVAL if i in lmd]
-    m=poly_mask(shape[:2],pts)
-    eyeL=eyeshadow_mask(shape,lmd,True)
-    eyeR=eyeshadow_mask(shape,lmd,False)
-    lip=lips_mask(shape,lmd)
-    m=cv2.subtract(m,cv2.max(cv2.max(eyeL,eyeR),lip))
-    return feather(m,51,22.0)
+    if len(pts)<3:
+        return EMPTY_MASK
+    # built locally like ``local_mask`` (26 px = feather 51 reach), but the
+    # eye / lip holes below are frame-positioned RoiMasks
+    x,y,w,h=cv2.boundingRect(np.array(pts,np.int32))
+    H,W=shape[:2]
+    x0,y0=max(x-26,0),max(y-26,0)
+    x1,y1=min(x+w+26,W),min(y+h+26,H)
+    if x0>=x1 or y0>=y1:
+        return EMPTY_MASK
+    m=poly_mask((y1-y0,x1-x0),[(px-x0,py-y0) for px,py in pts])
+    # eye / lip holes are shared with the eyeshadow and lip features
+    # (through the caller's FeatureMasks, else the shared cache)
+    sub=masks or (lambda builder,*args: cached_mask(builder,shape,lmd,*args))
+    holes=roi_max(sub(eyeshadow_mask,True),sub(eyeshadow_mask,False),sub(lips_mask))
+    if not holes.empty:
+        hy0,hx0=max(holes.y,y0),max(holes.x,x0)
+        hy1,hx1=min(holes.y+holes.crop.shape[0],y1),min(holes.x+holes.crop.shape[1],x1)
+        if hy0<hy1 and hx0<hx1:
+            dst=m[hy0-y0:hy1-y0,hx0-x0:hx1-x0]
+            cv2.subtract(dst,holes.crop[hy0-holes.y:hy1-holes.y,hx0-holes.x:hx1-holes.x],dst=dst)
+    return to_roi(feather(m,51,22.0),y0,x0)
 
-# ---------------- Public API ----------------
-def apply_makeup_bgr(img_bgr: np.ndarray, feature: str, color_hex: str = "#ff1744",
-                     is_stream: bool = False, intensity: float = 1.0) -> np.ndarray:
-    lms=detect_landmarks_bgr(img_bgr,is_stream=is_stream)
-    if lms is None: raise ValueError("No face landmarks detected.")
-    lmd=landmark_dict(lms,img_bgr.shape)
-    color_bgr=hex_to_bgr(color_hex)
+# ---------------- Mask Cache ----------------
+# Re-rendering the same photo with another colour / intensity reuses its
+# masks. Keys are (builder, args, image size, quantised landmarks the builder
+# reads); values are the builders' RoiMasks (read-only crops).
+MASK_LANDMARKS = {
+    "lips_mask": LIPS_OUTER+LIPS_INNER,
+    "cheeks_mask": CHEEKS,
+    "eyeshadow_mask": EYESHADOW_LEFT+EYESHADOW_RIGHT,
+    "kohl_mask": KOHL_LEFT+KOHL_RIGHT,
+    "mascara_mask": KOHL_LEFT+KOHL_RIGHT+EYESHADOW_LEFT+EYESHADOW_RIGHT,
+    "face_oval_mask": FACE_OVAL+EYESHADOW_LEFT+EYESHADOW_RIGHT+LIPS_OUTER+LIPS_INNER,
+}
+
+_mask_cache=OrderedDict()   # key -> RoiMask, least recently used first
+_mask_lock=threading.Lock()
+
+def _mask_key(builder,shape,lmd,args,kwargs):
+    ids=MASK_LANDMARKS.get(builder.__name__) or sorted(lmd)
+    q=MASK_QUANT_PX
+    pts=tuple((lmd[i][0]//q,lmd[i][1]//q) if i in lmd else None for i in ids)
+    options=tuple(sorted((k,v) for k,v in kwargs.items() if k!="masks"))
+    return (builder.__name__,args,options,tuple(shape[:2]),pts)
+
+def cached_mask(builder,shape,lmd,*args,**kwargs) -> RoiMask:
+    """``builder(shape, lmd, *args, **kwargs)`` through the shared mask cache."""
+    key=_mask_key(builder,shape,lmd,args,kwargs)
+    with _mask_lock:
+        mask=_mask_cache.get(key)
+        if mask is not None:
+            _mask_cache.move_to_end(key)
+            return mask
+    mask=builder(shape,lmd,*args,**kwargs)
+    with _mask_lock:
+        _mask_cache[key]=mask
+        while len(_mask_cache)>MASK_CACHE_SIZE:
+            _mask_cache.popitem(last=False)
+    return mask
+
+def clear_mask_cache():
+    with _mask_lock:
+        _mask_cache.clear()
 
+# ---------------- Feature Rendering ----------------
+FEATURES = ("lipstick","lips","blush","eyeshadow","kohl","mascara","foundation")
+
+class FeatureMasks:
+    """Masks for one face, each built at most once (e.g. lips + lipstick share one).
+
+    Misses go through ``cached_mask``, so another request on the same photo reuses them too
+    (``shared=False`` skips it, e.g. for video where landmarks change every frame).
+    """
+    def __init__(self,shape,lmd,shared=True):
+        self.shape=shape
+        self.lmd=lmd
+        self.shared=shared
+        self._built={}
+
+    def __call__(self,builder,*args,**kwargs) -> RoiMask:
+        key=(builder.__name__,args,tuple(sorted(kwargs.items())))
+        m=self._built.get(key)
+        if m is None:
+            if builder is face_oval_mask:
+                kwargs=dict(kwargs,masks=self)
+            if self.shared:
+                m=cached_mask(builder,self.shape,self.lmd,*args,**kwargs)
+            else:
+                m=builder(self.shape,self.lmd,*args,**kwargs)
+            self._built[key]=m
+        return m
+
+def render_feature(canvas: np.ndarray, masks: FeatureMasks, feature: str,
+                   color_bgr: Tuple[int,int,int], intensity: float = 1.0) -> np.ndarray:
+    """Composite one feature onto ``canvas`` in place (unknown features are ignored)."""
     if feature=="lipstick":
         # Use full lips mask for both upper and lower lips
-        m = lips_mask(img_bgr.shape,lmd)
-        img_mul = blend_multiply(img_bgr,color_bgr,m,alpha=1.0*intensity)  # darker
-        img_final = blend_softlight(img_mul,color_bgr,m,alpha=0.15*intensity)
-        return img_final
+        m=masks(lips_mask)
+        blend_into(canvas,blend_multiply,color_bgr,m,1.0*intensity)  # darker
+        return blend_into(canvas,blend_softlight,color_bgr,m,0.15*intensity)
 
     if feature=="lips":
-        m=lips_mask(img_bgr.shape,lmd)
-        return tint_hsv_preserve_value(img_bgr,color_bgr,m,alpha=0.80*intensity)
+        return blend_into(canvas,tint_hsv_preserve_value,color_bgr,masks(lips_mask),0.80*intensity)
 
     if feature=="blush":
-        m=cheeks_mask(img_bgr.shape,lmd,30)
-        return blend_softlight(img_bgr,color_bgr,m,alpha=0.50*intensity)
+        return blend_into(canvas,blend_softlight,color_bgr,masks(cheeks_mask,30),0.50*intensity)
 
     if feature=="eyeshadow":
-        mL=eyeshadow_mask(img_bgr.shape,lmd,True)
-        mR=eyeshadow_mask(img_bgr.shape,lmd,False)
-        m=cv2.max(mL,mR)
-        return blend_softlight(img_bgr,color_bgr,m,alpha=0.60*intensity)
+        m=roi_max(masks(eyeshadow_mask,True),masks(eyeshadow_mask,False))
+        return blend_into(canvas,blend_softlight,color_bgr,m,0.60*intensity)
 
     if feature=="kohl":
-        mL=kohl_mask(img_bgr.shape,lmd,True,base_thickness=2,intensity=intensity)
-        mR=kohl_mask(img_bgr.shape,lmd,False,base_thickness=2,intensity=intensity)
-        m=cv2.max(mL,mR)
-        return blend_normal(img_bgr,color_bgr,m,alpha=0.9*intensity)
+        mL=masks(kohl_mask,True,base_thickness=2,intensity=intensity)
+        mR=masks(kohl_mask,False,base_thickness=2,intensity=intensity)
+        return blend_into(canvas,blend_normal,color_bgr,roi_max(mL,mR),0.9*intensity)
 
     if feature=="mascara":
-        m=mascara_mask(img_bgr.shape,lmd,intensity)
-        return blend_multiply(img_bgr,color_bgr,m,alpha=0.90*intensity)
+        return blend_into(canvas,blend_multiply,color_bgr,masks(mascara_mask,intensity),0.90*intensity)
 
     if feature=="foundation":
-        m=face_oval_mask(img_bgr.shape,lmd)
+        m=masks(face_oval_mask)
         hsv_color = cv2.cvtColor(np.uint8([[color_bgr]]), cv2.COLOR_BGR2HSV)[0,0]
         v = hsv_color[2]
         if v > 180:
@@ -227,9 +427,63 @@ def apply_makeup_bgr(img_bgr: np.ndarray, feature: str, color_hex: str = "#ff174
             alpha = 0.38 * intensity; brighten = 1.02
         else:
             alpha = 0.55 * intensity; brighten = 0.90
-        blended = blend_softlight(img_bgr,color_bgr,m,alpha=alpha)
-        hsv = cv2.cvtColor(blended,cv2.COLOR_BGR2HSV).astype(np.float32)
-        hsv[...,2] = np.clip(hsv[...,2]*brighten,0,255)
-        return cv2.cvtColor(hsv.astype(np.uint8),cv2.COLOR_HSV2BGR)
+        blend_into(canvas,blend_softlight,color_bgr,m,alpha)
+        # the brighten / darken pass is global by design: it is the one whole-frame step
+        hsv = cv2.LUT(cv2.cvtColor(canvas,cv2.COLOR_BGR2HSV),value_scale_lut(brighten))
+        cv2.cvtColor(hsv,cv2.COLOR_HSV2BGR,dst=canvas)
+        return canvas
+
+    return canvas
+
+# ---------------- Public API ----------------
+def apply_makeup_bgr(img_bgr: np.ndarray, feature: str, color_hex: str = "#ff1744",
+                     is_stream: bool = False, intensity: float = 1.0) -> np.ndarray:
+    lms=detect_landmarks_bgr(img_bgr,is_stream=is_stream)
+    if lms is None: raise ValueError("No face landmarks detected.")
+    lmd=landmark_dict(lms,img_bgr.shape)
+    return apply_makeup_landmarks(img_bgr,lmd,feature,color_hex,intensity)
 
-    return img_bgr
+def apply_makeup_landmarks(img_bgr: np.ndarray, lmd: Dict[int,Tuple[int,int]], feature: str,
+                           color_hex: str = "#ff1744", intensity: float = 1.0,
+                           inplace: bool = False) -> np.ndarray:
+    """Render one feature given pixel landmarks (``landmark_dict``), without running FaceMesh.
+
+    ``inplace=True`` draws on ``img_bgr`` itself (no frame copy) for callers that own the frame.
+    """
+    canvas=img_bgr if inplace else img_bgr.copy()
+    return render_feature(canvas,FeatureMasks(img_bgr.shape,lmd),feature,hex_to_bgr(color_hex),intensity)
+
+def parse_layers(layers: List[dict]) -> List[Tuple[str,Tuple[int,int,int],float]]:
+    """Validate ``[{"feature", "color", "intensity"}, ...]`` into (feature, bgr, intensity) tuples."""
+    if not isinstance(layers,list) or not layers:
+        raise ValueError("layers must be a non-empty list of {feature, color, intensity}.")
+    parsed=[]
+    for layer in layers:
+        feature=layer.get("feature") if isinstance(layer,dict) else None
+        if feature not in FEATURES:
+            raise ValueError(f"Unknown makeup feature '{feature}'. Use one of {list(FEATURES)}.")
+        color=layer.get("color","#ff1744")
+        intensity=layer.get("intensity",1.0)
+        if not isinstance(color,str):
+            raise ValueError(f"Layer color must be a hex string, got {color!r}.")
+        if isinstance(intensity,bool) or not isinstance(intensity,(int,float,str)):
+            raise ValueError(f"Layer intensity must be a number, got {intensity!r}.")
+        parsed.append((feature,hex_to_bgr(color),float(intensity)))
+    return parsed
+
+def apply_look_landmarks(img_bgr: np.ndarray, lmd: Dict[int,Tuple[int,int]], layers: List[dict],
+                         cache_masks: bool = True, inplace: bool = False) -> np.ndarray:
+    """Composite an ordered list of layers onto one copy of the image (or ``img_bgr`` itself
+    with ``inplace=True``), sharing masks between them."""
+    canvas=img_bgr if inplace else img_bgr.copy()
+    masks=FeatureMasks(img_bgr.shape,lmd,shared=cache_masks)
+    for feature,color_bgr,intensity in parse_layers(layers):
+        render_feature(canvas,masks,feature,color_bgr,intensity)
+    return canvas
+
+def apply_look_bgr(img_bgr: np.ndarray, layers: List[dict], is_stream: bool = False) -> np.ndarray:
+    """Full look (e.g. foundation → blush → eyeshadow → kohl → mascara → lipstick) with one FaceMesh run."""
+    parse_layers(layers)   # fail before detection
+    lms=detect_landmarks_bgr(img_bgr,is_stream=is_stream)
+    if lms is None: raise ValueError("No face landmarks detected.")
+    return apply_look_landmarks(img_bgr,landmark_dict(lms,img_bgr.shape),layers)
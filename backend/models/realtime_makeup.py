@@ -0,0 +1,100 @@
+# models/realtime_makeup.py
+# ---------------------------------------------------
+# Live makeup over WebSocket
+# ---------------------------------------------------
+#   ws://host/ws/makeup?layers=<url-encoded json>[&session=<id>][&fps=30]
+#
+# Client → server
+#   binary  one JPEG frame
+#   text    JSON control message, e.g.
+#           {"layers": [{"feature": "lipstick", "color": "#CF2F3A", "intensity": 0.85}]}
+# Server → client
+#   binary  the processed JPEG frame
+#   text    JSON metadata, e.g. {"type": "meta", "frame": 12, "detected": true, "ms": 11.2, ...}
+#
+# Uses the per-client streaming FaceMesh (tracking + optical flow between
+# detections) instead of the static one photo uploads go through, and
+# the ROI / LUT makeup engine. The look can be changed mid-stream.
+import json
+import os
+import time
+
+import cv2
+import numpy as np
+from fastapi import APIRouter, WebSocket
+
+from models import mediapipe_makeup, tracking_sessions
+from models.realtime_ws import JPEG_QUALITY, serve_frames
+
+router = APIRouter()
+
+TARGET_FPS = float(os.getenv("REALTIME_MAKEUP_FPS", "30"))   # a full look costs ~15 ms at 640×480
+
+
+# ---------------- Connection State ----------------
+class MakeupStream:
+    """Per-connection look and tracking session."""
+
+    def __init__(self, session: str, layers=None):
+        self.session = session
+        self.layers = []
+        self.frames = 0
+        if layers:
+            self.set_layers(layers)
+
+    def set_layers(self, layers):
+        mediapipe_makeup.parse_layers(layers)   # raises ValueError, keeping the old look
+        self.layers = layers
+
+
+def render(state: MakeupStream, jpeg: bytes):
+    """Decode, track, apply the current look and re-encode one frame."""
+    started = time.perf_counter()
+    frame = cv2.imdecode(np.frombuffer(jpeg, np.uint8), cv2.IMREAD_COLOR)
+    if frame is None:
+        return None, {"type": "error", "error": "Invalid frame"}
+
+    state.frames += 1
+    pts = tracking_sessions.track(state.session, "face_mesh_stream", cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+    layers = state.layers   # snapshot: a control message may swap it meanwhile
+    if pts is not None and layers:
+        lmd = {i: (int(x), int(y)) for i, (x, y) in enumerate(pts)}
+        # landmarks move every frame, so the shared mask cache would only churn;
+        # the decoded frame is ours, so draw on it directly
+        frame = mediapipe_makeup.apply_look_landmarks(frame, lmd, layers, cache_masks=False, inplace=True)
+
+    _, buffer = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, JPEG_QUALITY])
+    meta = {"type": "meta", "frame": state.frames, "detected": pts is not None,
+            "layers": len(layers), "ms": round((time.perf_counter() - started) * 1000, 1)}
+    return buffer.tobytes(), meta
+
+
+# ---------------- WebSocket Route ----------------
+@router.websocket("/ws/makeup")
+async def makeup_stream(websocket: WebSocket):
+    session = websocket.query_params.get("session")
+    state = MakeupStream(session or f"ws-makeup-{id(websocket)}")
+    try:
+        layers = websocket.query_params.get("layers")
+        if layers:
+            state.set_layers(json.loads(layers))
+    except ValueError as e:
+        await websocket.close(code=1008, reason=f"Invalid layers: {e}")
+        return
+
+    await websocket.accept()
+    fps = websocket.query_params.get("fps")
+
+    def on_control(control):
+        if isinstance(control, dict) and "layers" in control:
+            try:
+                state.set_layers(control["layers"])
+            except ValueError as e:
+                return str(e)
+
+    try:
+        await serve_frames(websocket, f"ws/makeup/{id(websocket)}", lambda jpeg: render(state, jpeg),
+                           on_control, float(fps) if fps else TARGET_FPS, label="/ws/makeup")
+    finally:
+        if not session:
+            tracking_sessions.drop(state.session, "face_mesh_stream")
@@ -1,3 +1,8 @@
+# models/realtime_skin_analysis.py
+# ---------------------------------------------------
+# Desktop (Tk) webcam skin-tone analyser
+# Run from backend/:  python -m models.realtime_skin_analysis
+# ---------------------------------------------------
 import cv2
 import mediapipe as mp
 import numpy as np
@@ -6,13 +11,14 @@ import os
 import base64
 import json
 import random
-import requests
 from groq import Groq
 from dotenv import load_dotenv
 import threading
 import tkinter as tk
 from PIL import Image, ImageTk
 
+from services import http_client
+
 # ------------------- Load API Key -------------------
 load_dotenv()
 GROQ_API_KEY = os.getenv("GROQ_API_KEY")
@@ -203,7 +209,7 @@ Return ONLY JSON:
 }}
 """
 
-        url = f"https://generativelanguage.googleapis.com/v1beta/models/gemini-2.0-flash:generateContent?key={GEMINI_API_KEY}"
+        url = "https://generativelanguage.googleapis.com/v1beta/models/gemini-2.0-flash:generateContent"
 
         payload = {
             "contents": [{
@@ -215,7 +221,7 @@ Return ONLY JSON:
             }]
         }
 
-        resp = requests.post(url, json=payload)
+        resp = http_client.sync_client().post(url, json=payload, params={"key": GEMINI_API_KEY})
         resp.raise_for_status()
 
         data = resp.json()
@@ -1,16 +1,16 @@
 from fastapi import APIRouter, UploadFile, File, Form
 from fastapi.responses import JSONResponse
 import cv2, numpy as np, os, base64, time, traceback
-import mediapipe as mp
+
+from models import asset_store, compositing, detector_pool, landmark_cache, tracking_sessions
+from services import frame_slot, worker_pool
 
 UPLOAD_FOLDER = "uploads"
 
 router = APIRouter(prefix="/process-realtime-wrist", tags=["RealTime Wrist Try-On"])
 
-mp_hands = mp.solutions.hands
-
 # ---- Core Processor ----
-def overlay_watch(frame, watch_img, wrist_x, wrist_y):
+def overlay_watch(frame, watch_img, wrist_x, wrist_y, premultiplied=False):
     h, w = frame.shape[:2]
     watch_h, watch_w = watch_img.shape[:2]
 
@@ -20,64 +20,75 @@ def overlay_watch(frame, watch_img, wrist_x, wrist_y):
     top_left_x = max(0, min(top_left_x, w - watch_w))
     top_left_y = max(0, min(top_left_y, h - watch_h))
 
-    if watch_img.shape[2] == 4:
-        alpha = watch_img[:, :, 3] / 255.0
-        rgb = watch_img[:, :, :3]
+    return compositing.overlay(frame, watch_img, top_left_x, top_left_y, premultiplied=premultiplied)
+
+def draw_watch(frame, hand_pts, watch_img):
+    """Overlay ``watch_img`` (an Asset) on the wrist of pixel hand landmarks ``hand_pts`` (None: no hand)."""
+    if hand_pts is None:
+        return frame
+    h, w = frame.shape[:2]
+    x, y = int(hand_pts[0][0]), int(hand_pts[0][1])
+
+    # Resize watch relative to frame size
+    resized_watch = watch_img.resized(w // 4, w // 4)
+    return overlay_watch(frame, resized_watch, x, y, premultiplied=True)
+
+def render_frame(frame_bytes, watch_img, session=None):
+    """Decode one JPEG frame, draw the watch on the detected wrist, return a data URL.
+
+    ``session`` selects the client's own tracking Hands detector; without one
+    the frame goes through a pooled static detector.
+    """
+    np_frame = np.frombuffer(frame_bytes, np.uint8)
+    frame = cv2.imdecode(np_frame, cv2.IMREAD_COLOR)
+
+    if frame is None:
+        return {"error": "Invalid video frame received"}
+
+    rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+
+    if session:
+        hand_pts = tracking_sessions.track(session, "hands_stream", rgb)   # smoothed wrist/MCP points
     else:
-        alpha = np.ones((watch_h, watch_w), dtype=np.float32)
-        rgb = watch_img
+        results = detector_pool.process("hands_static", rgb)
+        hand_pts = (landmark_cache.to_pixels(landmark_cache.to_array(results.multi_hand_landmarks[0]), frame.shape)
+                    if results.multi_hand_landmarks else None)
+    frame = draw_watch(frame, hand_pts, watch_img)
 
-    region = frame[top_left_y:top_left_y+watch_h, top_left_x:top_left_x+watch_w]
-    for c in range(3):
-        region[:, :, c] = (alpha * rgb[:, :, c] + (1 - alpha) * region[:, :, c])
+    # Encode result to Base64
+    _, buffer = cv2.imencode(".jpg", frame)
+    frame_base64 = base64.b64encode(buffer).decode("utf-8")
 
-    frame[top_left_y:top_left_y+watch_h, top_left_x:top_left_x+watch_h] = region
-    return frame
+    return {"frame": f"data:image/jpeg;base64,{frame_base64}"}
 
 # ---- API Endpoint for Real-Time Frames ----
 @router.post("/")
+@worker_pool.limited("realtime")
 async def process_frame(
     file: UploadFile = File(...),
-    filename: str = Form(...)
+    filename: str = Form(...),
+    session: str = Form(None)
 ):
     try:
         # Load watch from uploads folder
         watch_path = os.path.join(UPLOAD_FOLDER, os.path.basename(filename))
-        watch_img = cv2.imread(watch_path, cv2.IMREAD_UNCHANGED)
+        watch_img = asset_store.get(watch_path)
 
         if watch_img is None:
             return {"error": f"Watch image not found: {filename}"}
 
-        # Decode incoming frame
         frame_bytes = await file.read()
-        np_frame = np.frombuffer(frame_bytes, np.uint8)
-        frame = cv2.imdecode(np_frame, cv2.IMREAD_COLOR)
-
-        if frame is None:
-            return {"error": "Invalid video frame received"}
-
-        rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-
-        with mp_hands.Hands(static_image_mode=False,
-                            max_num_hands=1,
-                            min_detection_confidence=0.6) as hands:
-
-            results = hands.process(rgb)
-            if results.multi_hand_landmarks:
-                for lm in results.multi_hand_landmarks:
-                    h, w = frame.shape[:2]
-                    x = int(lm.landmark[0].x * w)
-                    y = int(lm.landmark[0].y * h)
-
-                    # Resize watch relative to frame size
-                    resized_watch = cv2.resize(watch_img, (w // 4, w // 4))
-                    frame = overlay_watch(frame, resized_watch, x, y)
-
-        # Encode result to Base64
-        _, buffer = cv2.imencode(".jpg", frame)
-        frame_base64 = base64.b64encode(buffer).decode("utf-8")
-
-        return {"frame": f"data:image/jpeg;base64,{frame_base64}"}
+        if not session:
+            # no per-client id (clients behind one NAT share an address): no slot or tracker
+            return await worker_pool.offload("realtime", render_frame, frame_bytes, watch_img)
+        slot = frame_slot.get_slot(f"process-realtime-wrist/{session}")
+        async with slot.claim() as fresh:
+            if not fresh:
+                # a newer frame from this client is already waiting
+                return {"dropped": True, "stats": slot.stats()}
+            result = await worker_pool.offload("realtime", render_frame, frame_bytes, watch_img, session)
+        result["stats"] = slot.stats()
+        return result
 
     except Exception as e:
         print("❌ Error:", traceback.format_exc())
@@ -0,0 +1,163 @@
+# models/realtime_ws.py
+# ---------------------------------------------------
+# Binary WebSocket protocol for realtime accessory try-on
+# ---------------------------------------------------
+# Replaces per-frame multipart POSTs answered with base64 data URIs.
+#
+#   ws://host/ws/tryon/{accessory}?filename=cap_2.png[&session=<id>][&fps=15]
+#   accessory: cap | hat | glasses | watch
+#
+# Client → server
+#   binary  one JPEG frame
+#   text    JSON control message, e.g. {"filename": "glasses_3.png"}
+# Server → client
+#   binary  the processed JPEG frame
+#   text    JSON metadata for that frame, e.g.
+#           {"type": "meta", "frame": 12, "detected": true, "overlay": "...", "ms": 9.4,
+#            "received": 14, "processed": 12, "dropped": 2, "target_fps": 15}
+#
+# Frames that arrive while one is being processed replace each other
+# (latest wins); ``?fps=`` overrides the target rate.
+import asyncio
+import json
+import os
+import time
+import traceback
+
+import cv2
+import numpy as np
+from fastapi import APIRouter, WebSocket, WebSocketDisconnect
+
+from models import asset_store, tracking_sessions
+from models import realtime_cap_glasses, realtime_wristTryOn
+from services import frame_slot, worker_pool
+
+router = APIRouter()
+
+JPEG_QUALITY = int(os.getenv("REALTIME_JPEG_QUALITY", "80"))
+FACE_ACCESSORIES = {"cap", "hat", "glasses"}
+HAND_ACCESSORIES = {"watch"}
+
+
+# ---------------- Connection State ----------------
+class StreamState:
+    """Per-connection selection and tracking session, carried between frames.
+
+    Detection goes through ``tracking_sessions`` so MediaPipe tracks instead
+    of re-detecting; ``?session=`` lets a reconnecting client keep its tracker.
+    """
+
+    def __init__(self, accessory: str, filename: str = None, session: str = None):
+        self.accessory = accessory
+        self.filename = filename
+        self.kind = "hands_stream" if accessory in HAND_ACCESSORIES else "face_mesh_stream"
+        self.session = session
+        self.frames = 0
+
+    def track(self, rgb):
+        """Smoothed pixel landmarks of the tracked face / hand, or None."""
+        return tracking_sessions.track(self.session, self.kind, rgb)
+
+
+def render(state: StreamState, jpeg: bytes):
+    """Decode, detect, overlay and re-encode one frame. Returns ``(jpeg bytes or None, meta)``."""
+    started = time.perf_counter()
+    frame = cv2.imdecode(np.frombuffer(jpeg, np.uint8), cv2.IMREAD_COLOR)
+    if frame is None:
+        return None, {"type": "error", "error": "Invalid frame"}
+
+    state.frames += 1
+    pts = state.track(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+    meta = {"type": "meta", "frame": state.frames, "detected": pts is not None, "overlay": None}
+
+    if state.accessory in HAND_ACCESSORIES:
+        watch_path = os.path.join(realtime_wristTryOn.UPLOAD_FOLDER, os.path.basename(state.filename or "watch1.png"))
+        watch_img = asset_store.get(watch_path)
+        if watch_img is None:
+            return None, {"type": "error", "error": f"Watch image not found: {state.filename}"}
+        meta["overlay"] = watch_path
+        frame = realtime_wristTryOn.draw_watch(frame, pts, watch_img)
+    elif pts is not None:
+        frame, meta["overlay"] = realtime_cap_glasses.render_accessory(frame, pts, state.accessory, state.filename)
+
+    _, buffer = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, JPEG_QUALITY])
+    meta["ms"] = round((time.perf_counter() - started) * 1000, 1)
+    return buffer.tobytes(), meta
+
+
+# ---------------- Stream Loop ----------------
+async def serve_frames(websocket: WebSocket, slot_key: str, render_frame, on_control, fps=None, label="/ws/tryon"):
+    """Run the latest-frame-wins loop for an accepted socket until the client leaves.
+
+    ``render_frame(jpeg) -> (jpeg or None, meta)`` runs on the realtime lane;
+    ``on_control(dict)`` handles text messages and may return an error string.
+    """
+    slot = frame_slot.get_slot(slot_key, fps)
+
+    async def receive_frames():
+        # only the newest frame is kept; the worker below drains the slot
+        try:
+            while True:
+                message = await websocket.receive()
+                if message["type"] == "websocket.disconnect":
+                    break
+                if message.get("text") is not None:
+                    try:
+                        error = on_control(json.loads(message["text"]))
+                    except Exception as e:   # a bad message must not end the receive loop
+                        error = f"Invalid control message: {e}"
+                    if error:
+                        await websocket.send_json({"type": "error", "error": error})
+                elif message.get("bytes"):
+                    slot.put(message["bytes"])
+        except WebSocketDisconnect:
+            pass
+        finally:
+            slot.close()
+
+    receiver = asyncio.create_task(receive_frames())
+    try:
+        while True:
+            jpeg = await slot.get()
+            if jpeg is None:
+                break
+            out, meta = await worker_pool.offload("realtime", render_frame, jpeg)
+            slot.done()
+            meta.update(slot.stats())
+            if out is not None:
+                await websocket.send_bytes(out)
+            await websocket.send_json(meta)
+    except WebSocketDisconnect:
+        pass
+    except Exception:
+        print(f"❌ Error in {label}:\n", traceback.format_exc())
+        await websocket.close(code=1011)
+    finally:
+        receiver.cancel()
+        frame_slot.release(slot_key)
+
+
+# ---------------- WebSocket Route ----------------
+@router.websocket("/ws/tryon/{accessory}")
+async def tryon_stream(websocket: WebSocket, accessory: str):
+    accessory = accessory.lower()
+    if accessory not in FACE_ACCESSORIES | HAND_ACCESSORIES:
+        await websocket.close(code=1008, reason=f"Unknown accessory '{accessory}'")
+        return
+
+    await websocket.accept()
+    session = websocket.query_params.get("session")
+    state = StreamState(accessory, websocket.query_params.get("filename"), session or f"ws-{id(websocket)}")
+    fps = websocket.query_params.get("fps")
+
+    def on_control(control):
+        if isinstance(control, dict) and "filename" in control:
+            state.filename = control["filename"]
+
+    try:
+        await serve_frames(websocket, f"ws/tryon/{accessory}/{id(websocket)}",
+                           lambda jpeg: render(state, jpeg), on_control, float(fps) if fps else None)
+    finally:
+        if not session:
+            # anonymous connections cannot come back; named ones idle out
+            tracking_sessions.drop(state.session, state.kind)
@@ -1,28 +1,21 @@
 import cv2
-import mediapipe as mp
 import numpy as np
 import random
-import tempfile
 import os
 import base64
 import json
 import re
-import requests
 
-from groq import Groq
 from dotenv import load_dotenv
-from google import genai
-from google.genai import types
+
+from models import landmark_cache
+from services import api_clients, http_client, worker_pool
 
 # Load .env keys
 load_dotenv()
 GROQ_API_KEY = os.getenv("GROQ_API_KEY")
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
 
-grok_client = Groq(api_key=GROQ_API_KEY) if GROQ_API_KEY else None
-gemini_client = genai.Client(api_key=GEMINI_API_KEY) if GEMINI_API_KEY else None
-
-mp_face_mesh = mp.solutions.face_mesh
 SKIN_POINTS = [33, 133, 362, 263, 1, 13]  # forehead, cheeks, chin
 
 
@@ -61,28 +54,30 @@ def safe_json_extract(text):
 
 # ---------- (1) MediaPipe ----------
 def analyze_with_mediapipe(image_file):
-    with tempfile.NamedTemporaryFile(delete=False, suffix=".jpg") as tmp:
-        tmp.write(image_file.read())
-        tmp_path = tmp.name
-
-    image = cv2.imread(tmp_path)
+    image = cv2.imdecode(np.frombuffer(image_file.read(), np.uint8), cv2.IMREAD_COLOR)
     if image is None:
         return {"error": "Invalid image"}
+    return analyze_frame(image)
 
-    rgb_image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
-    face_mesh = mp_face_mesh.FaceMesh(static_image_mode=True, max_num_faces=1)
-    results = face_mesh.process(rgb_image)
 
-    if not results.multi_face_landmarks:
-        return {"error": "No face detected"}
+def analyze_frame(image, pts=None):
+    """Skin tone + ratings for one decoded BGR image (or webcam frame).
+
+    ``pts`` (pixel FaceMesh landmarks, N×2) may be passed in by callers that
+    already track the face; otherwise static FaceMesh runs through the landmark cache.
+    """
+    rgb_image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+    if pts is None:
+        landmarks = landmark_cache.get_face_landmarks(image)
+        if landmarks is None:
+            return {"error": "No face detected"}
+        pts = landmark_cache.to_pixels(landmarks, image.shape)
 
     h, w, _ = image.shape
     skin_colors = []
-    for face_landmarks in results.multi_face_landmarks:
-        for idx in SKIN_POINTS:
-            x, y = int(face_landmarks.landmark[idx].x * w), int(face_landmarks.landmark[idx].y * h)
-            if 0 <= x < w and 0 <= y < h:
-                skin_colors.append(rgb_image[y, x])
+    for x, y in pts[SKIN_POINTS]:
+        if 0 <= x < w and 0 <= y < h:
+            skin_colors.append(rgb_image[y, x])
 
     if not skin_colors:
         return {"error": "Could not sample skin"}
@@ -119,7 +114,7 @@ def analyze_with_groq(image_file):
         img_bytes = image_file.read()
         img_b64 = base64.b64encode(img_bytes).decode("utf-8")
 
-        client = Groq(api_key=GROQ_API_KEY)
+        client = api_clients.groq()
 
         messages = [
             {
@@ -158,7 +153,7 @@ def analyze_with_groq(image_file):
 
 
 # ---------- (3) Gemini Vision ----------
-def analyze_with_gemini(image_file):
+async def analyze_with_gemini(image_file):
     try:
         img_bytes = image_file.read()
         img_b64 = base64.b64encode(img_bytes).decode("utf-8")
@@ -175,7 +170,7 @@ def analyze_with_gemini(image_file):
             "}"
         )
 
-        API_URL = f"https://generativelanguage.googleapis.com/v1beta/models/gemini-2.0-flash:generateContent?key={GEMINI_API_KEY}"
+        API_URL = "https://generativelanguage.googleapis.com/v1beta/models/gemini-2.0-flash:generateContent"
 
         payload = {
             "contents": [{
@@ -187,7 +182,7 @@ def analyze_with_gemini(image_file):
             }]
         }
 
-        resp = requests.post(API_URL, json=payload)
+        resp = await http_client.post_json(API_URL, payload, params={"key": GEMINI_API_KEY})
         resp.raise_for_status()
 
         data = resp.json()
@@ -200,14 +195,15 @@ def analyze_with_gemini(image_file):
 
 
 # ---------- Main Switch ----------
-def detect_tone(image_file, method="mediapipe"):
+async def detect_tone(image_file, method="mediapipe"):
     try:
+        # FaceMesh and the Groq SDK block; only the Gemini REST call is async
         if method == "mediapipe":
-            return analyze_with_mediapipe(image_file)
+            return await worker_pool.offload("skin", analyze_with_mediapipe, image_file)
         elif method == "groq":
-            return analyze_with_groq(image_file)
+            return await worker_pool.offload("skin", analyze_with_groq, image_file)
         elif method == "gemini":
-            return analyze_with_gemini(image_file)
+            return await analyze_with_gemini(image_file)
         else:
             return {"error": "Invalid method. Use 'mediapipe', 'groq', or 'gemini'."}
     except Exception as e:
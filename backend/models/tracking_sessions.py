@@ -0,0 +1,156 @@
+# models/tracking_sessions.py
+# ---------------------------------------------------
+# Per-client streaming detectors for realtime try-on
+# ---------------------------------------------------
+# Pooled detectors are shared between clients, so they cannot keep
+# tracking state. A TrackingSession owns one streaming-mode detector
+# (static_image_mode=False) for a single client: the first frame runs full
+# detection, later frames take MediaPipe's cheaper tracking path.
+# Sessions are keyed by (session id, detector kind) and evicted when idle.
+# Each session also carries a One-Euro smoother for its placement key points
+# and a FlowTracker, so full detection only runs every few frames.
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+import cv2
+import numpy as np
+
+from models import detector_pool, flow_tracker, landmark_cache, landmark_filter
+
+# ---------------- Configuration ----------------
+IDLE_SECONDS = float(os.getenv("TRACKING_SESSION_IDLE", "30"))
+MAX_SESSIONS = int(os.getenv("TRACKING_MAX_SESSIONS", "32"))
+
+# detector kind -> landmark_filter key-point group
+STREAM_KINDS = {"face_mesh_stream": "face", "hands_stream": "hands", "pose": "pose"}
+
+
+# ---------------- Session ----------------
+class TrackingSession:
+    """One client's streaming detector; frames are processed one at a time."""
+
+    def __init__(self, key: str, kind: str):
+        self.key = key
+        self.kind = kind
+        self.frames = 0
+        self.created = self.last_used = time.monotonic()
+        self.smoother = landmark_filter.LandmarkSmoother(STREAM_KINDS[kind])
+        self.flow = flow_tracker.FlowTracker()
+        self._detector = detector_pool.FACTORIES[kind]()
+        self._lock = threading.Lock()
+
+    @property
+    def closed(self) -> bool:
+        return self._detector is None
+
+    def close(self):
+        with self._lock:
+            if self._detector is not None:
+                self._detector.close()
+                self._detector = None
+
+    def track(self, rgb):
+        """Smoothed int32 (N, 2) pixel landmarks, None if nothing is found, ``EVICTED`` if closed.
+
+        Between detections the landmarks are propagated with optical flow;
+        a failed propagation falls through to full detection.
+        """
+        with self._lock:
+            if self._detector is None:
+                return EVICTED
+            self.last_used = time.monotonic()
+            gray = cv2.cvtColor(rgb, cv2.COLOR_RGB2GRAY)
+            if not self.flow.due():
+                pts = self.flow.propagate(gray)
+                if pts is not None:
+                    return np.rint(self.smoother(pts)).astype(np.int32)
+
+            self.frames += 1
+            landmarks = _first_landmarks(self.kind, self._detector.process(rgb))
+            if landmarks is None:
+                self.flow.reset()
+                self.smoother.reset()
+                return None
+            pts = landmark_cache.to_pixels(landmark_cache.to_array(landmarks), rgb.shape)
+            self.flow.detected(gray, pts)
+            return self.smoother(pts)
+
+    def stats(self) -> dict:
+        return {"kind": self.kind, "frames": self.frames,
+                "idle_seconds": round(time.monotonic() - self.last_used, 1), **self.flow.stats()}
+
+
+EVICTED = object()
+
+
+def _first_landmarks(kind: str, result):
+    if kind == "pose":
+        return result.pose_landmarks
+    found = result.multi_face_landmarks if kind == "face_mesh_stream" else result.multi_hand_landmarks
+    return found[0] if found else None
+
+
+# ---------------- Registry ----------------
+_sessions = OrderedDict()   # (key, kind) -> TrackingSession, least recently used first
+_lock = threading.Lock()
+
+
+def get(key: str, kind: str = "face_mesh_stream") -> TrackingSession:
+    if kind not in STREAM_KINDS:
+        raise ValueError(f"'{kind}' is not a streaming detector. Use one of {sorted(STREAM_KINDS)}.")
+    evict_idle()
+    with _lock:
+        session = _sessions.get((key, kind))
+        if session is not None and not session.closed:
+            _sessions.move_to_end((key, kind))
+            return session
+
+    fresh = TrackingSession(key, kind)   # graph construction happens outside the lock
+    overflow = []
+    with _lock:
+        session = _sessions.get((key, kind))
+        if session is None or session.closed:
+            session = fresh
+            while len(_sessions) >= MAX_SESSIONS:
+                overflow.append(_sessions.popitem(last=False)[1])
+            _sessions[(key, kind)] = session
+        else:
+            overflow.append(fresh)   # another request created it first
+    for old in overflow:
+        old.close()
+    return session
+
+
+def track(key: str, kind: str, rgb) -> Optional[np.ndarray]:
+    """Smoothed int32 (N, 2) pixel landmarks of the first face / hand / body, or None."""
+    while True:
+        pts = get(key, kind).track(rgb)
+        if pts is not EVICTED:
+            return pts
+
+
+def drop(key: str, kind: Optional[str] = None):
+    """Close a client's sessions (all kinds unless ``kind`` is given)."""
+    with _lock:
+        doomed = [k for k in _sessions if k[0] == key and (kind is None or k[1] == kind)]
+        sessions = [_sessions.pop(k) for k in doomed]
+    for session in sessions:
+        session.close()
+
+
+def evict_idle(max_idle: float = IDLE_SECONDS) -> int:
+    cutoff = time.monotonic() - max_idle
+    with _lock:
+        doomed = [k for k, s in _sessions.items() if s.last_used < cutoff]
+        sessions = [_sessions.pop(k) for k in doomed]
+    for session in sessions:
+        session.close()
+    return len(sessions)
+
+
+def stats() -> dict:
+    with _lock:
+        return {f"{key}:{kind}": s.stats() for (key, kind), s in _sessions.items()}
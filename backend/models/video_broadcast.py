@@ -0,0 +1,169 @@
+# models/video_broadcast.py
+# ---------------------------------------------------
+# One capture + processing pipeline per video source, many viewers
+# ---------------------------------------------------
+# A producer thread owns the cv2.VideoCapture, runs the per-frame
+# processing once, JPEG-encodes the result and publishes it into a small
+# ring buffer. Each HTTP subscriber just waits for the next sequence number
+# and reads the newest frame, so N viewers cost one pipeline, not N.
+# The producer starts with the first subscriber and stops shortly after
+# the last one leaves.
+# With a ``render`` callback the shared stage (``process``) runs once and
+# each subscribed channel (e.g. one per user session) gets its own rendering
+# of that result in its own ring; viewers of the same channel share it.
+import os
+import threading
+import traceback
+import time
+from collections import deque
+from typing import Callable, Dict, Iterator, Optional, Union
+
+import cv2
+
+# ---------------- Configuration ----------------
+RING_SIZE = int(os.getenv("VIDEO_RING_SIZE", "4"))
+JPEG_QUALITY = int(os.getenv("VIDEO_JPEG_QUALITY", "80"))
+IDLE_STOP_SECONDS = float(os.getenv("VIDEO_IDLE_STOP", "5"))
+READ_TIMEOUT = float(os.getenv("VIDEO_READ_TIMEOUT", "5"))
+
+
+def parse_source(value: str) -> Union[int, str]:
+    """"0" → camera index 0; anything else (file path, RTSP URL) is passed through."""
+    return int(value) if value.isdigit() else value
+
+
+# ---------------- Broadcaster ----------------
+class FrameBroadcaster:
+    """Single producer thread publishing encoded frames to any number of subscribers."""
+
+    def __init__(self, source, process: Callable, key: Optional[str] = None,
+                 render: Optional[Callable] = None):
+        self.source = source
+        self.key = key or str(source)
+        self.process = process          # process(frame_bgr, broadcaster) -> frame_bgr (or shared state)
+        self.render = render            # render(state, channel) -> frame_bgr, once per watched channel
+        self.rings = {}                 # channel -> deque of (seq, jpeg bytes)
+        self.seq = 0
+        self.subscribers = {}           # channel -> viewer count
+        self.frames_captured = 0
+        self.running = False
+        self._cond = threading.Condition()
+        self._thread = None
+        self._last_viewer = time.monotonic()
+
+    # ---- producer ----
+    def _run(self, previous: Optional[threading.Thread]):
+        if previous is not None:
+            previous.join()   # let the old producer release the device first
+        cap = cv2.VideoCapture(self.source)
+        try:
+            while True:
+                with self._cond:
+                    if not self.subscribers and time.monotonic() - self._last_viewer > IDLE_STOP_SECONDS:
+                        self.running = False
+                        break
+                    channels = list(self.subscribers) or [None]
+                ret, frame = cap.read()
+                if not ret:
+                    break
+                self.frames_captured += 1
+                try:
+                    state = self.process(frame, self)
+                except Exception:
+                    traceback.print_exc()   # keep streaming the raw frame
+                    state = frame
+                encoded = {}
+                for channel in channels:
+                    out = state
+                    if self.render is not None:
+                        try:
+                            out = self.render(state, channel)
+                        except Exception:
+                            traceback.print_exc()
+                            out = frame
+                    ok, buffer = cv2.imencode(".jpg", out, [cv2.IMWRITE_JPEG_QUALITY, JPEG_QUALITY])
+                    if ok:
+                        encoded[channel] = buffer.tobytes()
+                with self._cond:
+                    self.seq += 1
+                    for channel, jpeg in encoded.items():
+                        if channel not in self.subscribers:
+                            continue   # last viewer left while rendering
+                        self.rings.setdefault(channel, deque(maxlen=RING_SIZE)).append((self.seq, jpeg))
+                    self._cond.notify_all()
+        finally:
+            cap.release()
+            with self._cond:
+                if self._thread is threading.current_thread():
+                    self.running = False
+                self._cond.notify_all()
+
+    def _ensure_running(self):
+        # caller holds self._cond
+        if not self.running:
+            self.running = True
+            self.rings.clear()
+            self._thread = threading.Thread(target=self._run, args=(self._thread,),
+                                            name=f"video-{self.key}", daemon=True)
+            self._thread.start()
+
+    # ---- subscribers ----
+    def latest(self, channel: Optional[str] = None):
+        with self._cond:
+            ring = self.rings.get(channel)
+            return ring[-1] if ring else None
+
+    def frames(self, channel: Optional[str] = None) -> Iterator[bytes]:
+        """Yield the newest JPEG of ``channel`` each time one is published (stale ones are skipped)."""
+        with self._cond:
+            self.subscribers[channel] = self.subscribers.get(channel, 0) + 1
+            self._ensure_running()
+        last = 0
+
+        def fresh():
+            ring = self.rings.get(channel)
+            return bool(ring) and ring[-1][0] > last
+
+        try:
+            while True:
+                with self._cond:
+                    if not self._cond.wait_for(lambda: fresh() or not self.running, READ_TIMEOUT):
+                        return   # source stalled
+                    if not fresh():
+                        return   # producer stopped (camera closed or failed)
+                    last, jpeg = self.rings[channel][-1]
+                yield jpeg
+        finally:
+            with self._cond:
+                self.subscribers[channel] -= 1
+                if not self.subscribers[channel]:
+                    del self.subscribers[channel]
+                    self.rings.pop(channel, None)
+                self._last_viewer = time.monotonic()
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {"source": str(self.source), "running": self.running,
+                    "subscribers": sum(self.subscribers.values()), "channels": len(self.subscribers),
+                    "frames_captured": self.frames_captured, "frames_published": self.seq}
+
+
+# ---------------- Registry ----------------
+_broadcasters: Dict[str, FrameBroadcaster] = {}
+_lock = threading.Lock()
+
+
+def get(source, process: Callable, key: Optional[str] = None,
+        render: Optional[Callable] = None) -> FrameBroadcaster:
+    """Shared broadcaster for ``key`` (defaults to the source)."""
+    key = key or str(source)
+    with _lock:
+        broadcaster = _broadcasters.get(key)
+        if broadcaster is None:
+            broadcaster = _broadcasters[key] = FrameBroadcaster(source, process, key, render)
+        return broadcaster
+
+
+def stats() -> dict:
+    with _lock:
+        return {key: b.stats() for key, b in _broadcasters.items()}
@@ -9,6 +9,8 @@ from fastapi.staticfiles import StaticFiles
 from werkzeug.utils import secure_filename
 from fastapi.middleware.cors import CORSMiddleware
 
+from models import asset_store, compositing, detector_pool
+
 # ---------------- FastAPI app ----------------
 app = FastAPI()
 
@@ -37,25 +39,14 @@ mp_drawing = mp.solutions.drawing_utils
 # ---------------- Virtual Watch Try-On Class ----------------
 class VirtualWatchTryOn:
     def __init__(self, wrist_image, watch_image):
+        """``watch_image`` is a cached ``asset_store.Asset``."""
         self.wrist_image = wrist_image
-        self.watch_image = watch_image
         self.height, self.width = self.wrist_image.shape[:2]
 
         # Resize watch image dynamically (about 1/3 of wrist image size)
-        self.watch_image = cv2.resize(
-            self.watch_image,
-            (self.width // 3, self.height // 3)
-        )
+        self.watch_image = watch_image.resized(self.width // 3, self.height // 3)
         self.watch_height, self.watch_width = self.watch_image.shape[:2]
 
-        # Initialize MediaPipe Hands
-        self.hands = mp_hands.Hands(
-            static_image_mode=True,
-            max_num_hands=1,
-            min_detection_confidence=0.7,
-            min_tracking_confidence=0.5
-        )
-
     def estimate_wrist_pose(self, hand_landmarks, image_shape):
         """Estimate wrist landmark pixel position."""
         wrist = hand_landmarks.landmark[0]
@@ -88,7 +79,7 @@ class VirtualWatchTryOn:
     def process_image(self):
         """Run Mediapipe hand detection and overlay watch."""
         rgb_frame = cv2.cvtColor(self.wrist_image, cv2.COLOR_BGR2RGB)
-        results = self.hands.process(rgb_frame)
+        results = detector_pool.process("hands_static", rgb_frame)
 
         if results.multi_hand_landmarks:
             for hand_landmarks in results.multi_hand_landmarks:
@@ -118,19 +109,7 @@ class VirtualWatchTryOn:
         top_left_x = max(0, min(top_left_x, self.width - self.watch_width))
         top_left_y = max(0, min(top_left_y, self.height - self.watch_height))
 
-        # Handle transparency (PNG with alpha)
-        if self.watch_image.shape[2] == 4:
-            alpha = self.watch_image[:, :, 3] / 255.0
-            watch_rgb = self.watch_image[:, :, :3]
-        else:
-            alpha = np.ones((self.watch_height, self.watch_width), dtype=np.float32)
-            watch_rgb = self.watch_image
-
-        for c in range(3):
-            image[top_left_y:top_left_y+self.watch_height, top_left_x:top_left_x+self.watch_width, c] = (
-                alpha * watch_rgb[:, :, c]
-                + (1 - alpha) * image[top_left_y:top_left_y+self.watch_height, top_left_x:top_left_x+self.watch_width, c]
-            )
+        compositing.overlay(image, self.watch_image, top_left_x, top_left_y, premultiplied=True)
 
 
 # ---------------- Routes ----------------
@@ -173,7 +152,7 @@ async def wrist_tryon(
             )
 
         # Load watch image with alpha if available
-        watch_img = cv2.imread(watch_path, cv2.IMREAD_UNCHANGED)
+        watch_img = asset_store.get(watch_path)
         if watch_img is None:
             return JSONResponse(
                 {"error": f"Failed to load watch image {watch_filename}"}, 
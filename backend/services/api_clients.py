@@ -0,0 +1,46 @@
+# services/api_clients.py
+# ---------------------------------------------------
+# Shared Gemini / Groq SDK clients, built on first use
+# ---------------------------------------------------
+# Constructing the clients (and importing their SDKs) used to happen at
+# import time in every module that called them, and a missing API key
+# aborted the whole API. They are registered with the model registry
+# instead: one client per process, created by the startup warm-up or by
+# the first request; a missing key only fails the endpoints that need it.
+import os
+
+from dotenv import load_dotenv
+
+from services import model_registry
+
+load_dotenv()
+
+
+def _gemini():
+    from google import genai
+    api_key = os.getenv("GEMINI_API_KEY")
+    if not api_key:
+        raise ValueError("Missing GEMINI_API_KEY in .env file")
+    return genai.Client(api_key=api_key)
+
+
+def _groq():
+    from groq import Groq
+    api_key = os.getenv("GROQ_API_KEY")
+    if not api_key:
+        raise ValueError("Missing GROQ_API_KEY in .env file")
+    return Groq(api_key=api_key)
+
+
+model_registry.register("gemini", _gemini)
+model_registry.register("groq", _groq)
+
+
+def gemini():
+    """Shared ``google.genai.Client``; RuntimeError when it cannot be created."""
+    return model_registry.get("gemini")
+
+
+def groq():
+    """Shared ``groq.Groq`` client; RuntimeError when it cannot be created."""
+    return model_registry.get("groq")
@@ -0,0 +1,128 @@
+# services/frame_slot.py
+# ---------------------------------------------------
+# Latest-frame-wins backpressure for realtime endpoints
+# ---------------------------------------------------
+# A slow link must not queue up seconds of stale webcam frames. Each
+# session owns one FrameSlot holding at most one pending frame: a newer
+# frame replaces an unprocessed one (counted as dropped), and frames are
+# handed out no faster than the target FPS.
+#
+# WebSockets:   receiver task -> slot.put(frame); worker -> await slot.get()
+# HTTP polling: async with slot.claim() as fresh: (fresh is False for stale requests)
+import asyncio
+import os
+import time
+from contextlib import asynccontextmanager
+from typing import Dict, Optional
+
+# ---------------- Configuration ----------------
+TARGET_FPS = float(os.getenv("REALTIME_TARGET_FPS", "15"))
+IDLE_SECONDS = float(os.getenv("REALTIME_SESSION_IDLE", "60"))
+
+
+# ---------------- Slot ----------------
+class FrameSlot:
+    """Single-frame mailbox with FPS pacing and received/processed/dropped counters."""
+
+    def __init__(self, key: str, target_fps: float = TARGET_FPS):
+        self.key = key
+        self.target_fps = target_fps
+        self.received = 0
+        self.processed = 0
+        self.dropped = 0
+        self.last_seen = time.monotonic()
+        self._frame = None
+        self._ready = asyncio.Event()
+        self._lock = asyncio.Lock()
+        self._seq = 0
+        self._next_due = 0.0
+        self._closed = False
+
+    @property
+    def interval(self) -> float:
+        return 1.0 / self.target_fps if self.target_fps > 0 else 0.0
+
+    async def _pace(self):
+        delay = self._next_due - time.monotonic()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        self._next_due = time.monotonic() + self.interval
+
+    # ---- push side (WebSocket receiver) ----
+    def put(self, frame):
+        self.received += 1
+        self.last_seen = time.monotonic()
+        if self._frame is not None:
+            self.dropped += 1
+        self._frame = frame
+        self._ready.set()
+
+    async def get(self):
+        """Newest pending frame, waiting for one if needed; None once the slot is closed."""
+        await self._pace()
+        await self._ready.wait()
+        if self._closed:
+            return None
+        frame, self._frame = self._frame, None
+        self._ready.clear()
+        return frame
+
+    def done(self):
+        self.processed += 1
+
+    def close(self):
+        if self._frame is not None:
+            self.dropped += 1
+            self._frame = None
+        self._closed = True
+        self._ready.set()
+
+    # ---- pull side (HTTP polling) ----
+    @asynccontextmanager
+    async def claim(self):
+        """Serialise a session's requests; yields False when a newer frame arrived meanwhile."""
+        self.received += 1
+        self.last_seen = time.monotonic()
+        self._seq += 1
+        seq = self._seq
+        async with self._lock:
+            await self._pace()
+            if seq != self._seq:
+                self.dropped += 1
+                yield False
+                return
+            yield True
+            self.processed += 1
+
+    def stats(self) -> dict:
+        return {"received": self.received, "processed": self.processed, "dropped": self.dropped,
+                "target_fps": self.target_fps}
+
+
+# ---------------- Registry ----------------
+_slots: Dict[str, FrameSlot] = {}
+
+
+def _evict_idle():
+    cutoff = time.monotonic() - IDLE_SECONDS
+    for key in [k for k, s in _slots.items() if s.last_seen < cutoff and not s._lock.locked()]:
+        del _slots[key]
+
+
+def get_slot(key: str, target_fps: Optional[float] = None) -> FrameSlot:
+    """Slot for ``key``, created on first use; idle slots are evicted as a side effect."""
+    _evict_idle()
+    slot = _slots.get(key)
+    if slot is None:
+        slot = _slots[key] = FrameSlot(key, TARGET_FPS if target_fps is None else target_fps)
+    return slot
+
+
+def release(key: str):
+    slot = _slots.pop(key, None)
+    if slot is not None:
+        slot.close()
+
+
+def stats() -> dict:
+    return {key: slot.stats() for key, slot in _slots.items()}
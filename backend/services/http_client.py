@@ -0,0 +1,130 @@
+# services/http_client.py
+# ---------------------------------------------------
+# Shared, pooled HTTP client for remote vision / LLM APIs
+# ---------------------------------------------------
+# Gemini REST calls used to go through ``requests.post`` inside async
+# handlers: a new TCP + TLS handshake per call, no timeout, and the event
+# loop blocked for the whole round trip. Every remote call now goes through
+# one process-wide ``httpx.AsyncClient`` (keep-alive pool, HTTP/2 when the
+# ``h2`` package is installed, configurable timeouts) and a per-upstream
+# semaphore, so a slow upstream cannot take every connection. Only the hosts
+# in HTTP_UPSTREAM_HOSTS get their own limit; every other URL (e.g. image
+# links supplied by users) shares one "other" bucket, so the table of limits
+# stays fixed however many hosts are requested.
+#
+#   resp = await http_client.post_json(url, payload, params={"key": KEY})
+#
+# Code outside the event loop (the Tk desktop analyser) uses ``sync_client()``,
+# which shares the same limits and timeouts.
+import asyncio
+import os
+import threading
+from typing import Dict, Optional
+from urllib.parse import urlsplit
+
+import httpx
+
+# ---------------- Configuration ----------------
+CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "5"))
+READ_TIMEOUT = float(os.getenv("HTTP_READ_TIMEOUT", "60"))      # image generation is slow
+POOL_TIMEOUT = float(os.getenv("HTTP_POOL_TIMEOUT", "10"))
+MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "32"))
+MAX_KEEPALIVE = int(os.getenv("HTTP_MAX_KEEPALIVE", "16"))
+KEEPALIVE_EXPIRY = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "60"))
+UPSTREAM_CONCURRENCY = int(os.getenv("HTTP_UPSTREAM_CONCURRENCY", "8"))   # in-flight requests per upstream
+UPSTREAM_HOSTS = {h.strip().lower() for h in os.getenv(
+    "HTTP_UPSTREAM_HOSTS", "generativelanguage.googleapis.com"
+).split(",") if h.strip()}
+OTHER_UPSTREAM = "other"
+HTTP2 = os.getenv("HTTP_HTTP2", "1") != "0"
+
+try:
+    import h2  # noqa: F401  (httpx needs it for HTTP/2)
+    _HTTP2_AVAILABLE = True
+except ImportError:
+    _HTTP2_AVAILABLE = False
+
+
+def _options() -> dict:
+    return {
+        "http2": HTTP2 and _HTTP2_AVAILABLE,
+        "timeout": httpx.Timeout(READ_TIMEOUT, connect=CONNECT_TIMEOUT, pool=POOL_TIMEOUT),
+        "limits": httpx.Limits(max_connections=MAX_CONNECTIONS, max_keepalive_connections=MAX_KEEPALIVE,
+                               keepalive_expiry=KEEPALIVE_EXPIRY),
+    }
+
+
+# ---------------- Clients ----------------
+_client: Optional[httpx.AsyncClient] = None
+_sync_client: Optional[httpx.Client] = None
+_upstreams: Dict[str, asyncio.Semaphore] = {}
+_counts: Dict[str, Dict[str, int]] = {}
+_lock = threading.Lock()
+
+
+def client() -> httpx.AsyncClient:
+    """The process-wide async client (created on first use, inside the running loop)."""
+    global _client
+    if _client is None or _client.is_closed:
+        _client = httpx.AsyncClient(**_options())
+    return _client
+
+
+def sync_client() -> httpx.Client:
+    """Pooled blocking client for code that does not run on the event loop."""
+    global _sync_client
+    with _lock:
+        if _sync_client is None or _sync_client.is_closed:
+            _sync_client = httpx.Client(**_options())
+        return _sync_client
+
+
+def _upstream(url: str) -> str:
+    """Bucket for ``url``: its host if configured, else the shared "other" bucket."""
+    host = (urlsplit(url).hostname or "").lower()
+    bucket = host if host in UPSTREAM_HOSTS else OTHER_UPSTREAM
+    if bucket not in _upstreams:
+        _upstreams[bucket] = asyncio.Semaphore(UPSTREAM_CONCURRENCY)
+        _counts[bucket] = {"requests": 0, "errors": 0, "in_flight": 0}
+    return bucket
+
+
+# ---------------- Public API ----------------
+async def request(method: str, url: str, **kwargs) -> httpx.Response:
+    """``client().request`` bounded by the upstream's concurrency limit."""
+    bucket = _upstream(url)
+    counts = _counts[bucket]
+    async with _upstreams[bucket]:
+        counts["requests"] += 1
+        counts["in_flight"] += 1
+        try:
+            return await client().request(method, url, **kwargs)
+        except httpx.HTTPError:
+            counts["errors"] += 1
+            raise
+        finally:
+            counts["in_flight"] -= 1
+
+
+async def post_json(url: str, payload: dict, **kwargs) -> httpx.Response:
+    return await request("POST", url, json=payload, **kwargs)
+
+
+async def get(url: str, **kwargs) -> httpx.Response:
+    return await request("GET", url, **kwargs)
+
+
+async def aclose():
+    global _client, _sync_client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+    with _lock:
+        if _sync_client is not None:
+            _sync_client.close()
+            _sync_client = None
+
+
+def stats() -> dict:
+    return {"http2": HTTP2 and _HTTP2_AVAILABLE, "upstream_concurrency": UPSTREAM_CONCURRENCY,
+            "upstreams": {bucket: dict(c) for bucket, c in _counts.items()}}
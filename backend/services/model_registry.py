@@ -0,0 +1,119 @@
+# services/model_registry.py
+# ---------------------------------------------------
+# Lazily loaded, background-warmed heavy resources
+# ---------------------------------------------------
+# TensorFlow graphs, MediaPipe pools, API clients and decoded assets are
+# declared here with a loader instead of being built at import time, so
+# the API starts accepting requests immediately. Each resource loads on
+# first use (``get(name)``) or earlier, when the startup warm-up task gets
+# to it; concurrent first users wait for the same load.
+#
+#   register("beautygan", _load_beautygan, lane="template")
+#   sess = get("beautygan").sess
+#
+# Warm-up loads one resource at a time per worker lane (lanes in parallel),
+# in registration order; MODEL_WARM_SKIP="a,b" leaves resources to be
+# loaded on first use only.
+import asyncio
+import os
+import threading
+import time
+import traceback
+from typing import Callable, Dict, Optional
+
+from services import worker_pool
+
+# ---------------- Configuration ----------------
+WARM_SKIP = {n.strip() for n in os.getenv("MODEL_WARM_SKIP", "").split(",") if n.strip()}
+
+
+# ---------------- Entries ----------------
+class Model:
+    """One named resource: its loader, the loaded value or the load error."""
+
+    def __init__(self, name: str, loader: Callable, warm: bool = True, lane: str = "realtime"):
+        self.name = name
+        self.loader = loader
+        self.warm = warm and name not in WARM_SKIP
+        self.lane = lane           # worker_pool lane the warm-up runs on
+        self.state = "cold"        # cold → loading → ready | failed
+        self.value = None
+        self.error = None
+        self.seconds = None
+        self._lock = threading.Lock()
+
+    def load(self):
+        with self._lock:   # later callers wait for the first load
+            if self.state == "cold":
+                self.state = "loading"
+                started = time.perf_counter()
+                try:
+                    self.value = self.loader()
+                    self.state = "ready"
+                except Exception as e:
+                    traceback.print_exc()
+                    self.error = e
+                    self.state = "failed"
+                self.seconds = time.perf_counter() - started
+        if self.state == "failed":
+            raise RuntimeError(f"{self.name} failed to load: {self.error}")
+        return self.value
+
+    def stats(self) -> dict:
+        out = {"state": self.state, "warm": self.warm}
+        if self.seconds is not None:
+            out["seconds"] = round(self.seconds, 3)
+        if self.error is not None:
+            out["error"] = str(self.error)
+        return out
+
+
+_models: Dict[str, Model] = {}
+_lock = threading.Lock()
+
+
+# ---------------- Public API ----------------
+def register(name: str, loader: Callable, warm: bool = True, lane: str = "realtime") -> Model:
+    """Declare a resource (idempotent: the first registration of a name wins)."""
+    with _lock:
+        if name not in _models:
+            _models[name] = Model(name, loader, warm, lane)
+        return _models[name]
+
+
+def get(name: str):
+    """The loaded resource, loading it now if needed; RuntimeError if loading failed."""
+    return _models[name].load()
+
+
+def peek(name: str) -> Optional[Model]:
+    return _models.get(name)
+
+
+async def _warm_lane(models):
+    for model in models:
+        try:
+            await worker_pool.offload(model.lane, model.load)
+        except RuntimeError:
+            pass   # recorded on the entry, reported by /ready
+
+
+async def warm_up():
+    """Load every warm resource in the background (run as a startup task)."""
+    lanes = {}
+    with _lock:
+        for model in _models.values():
+            if model.warm and model.state == "cold":
+                lanes.setdefault(model.lane, []).append(model)
+    await asyncio.gather(*(_warm_lane(models) for models in lanes.values()))
+
+
+def ready() -> bool:
+    """True once every warm resource has been attempted (failures included)."""
+    return all(m.state in ("ready", "failed") for m in _models.values() if m.warm)
+
+
+def stats() -> dict:
+    with _lock:
+        models = list(_models.values())
+    return {m.name: m.stats() for m in models}
@@ -0,0 +1,156 @@
+# services/worker_pool.py
+# ---------------------------------------------------
+# Bounded execution layer for CPU-bound try-on work
+# ---------------------------------------------------
+# MediaPipe, OpenCV and TensorFlow calls are synchronous; running them
+# inside ``async def`` handlers stalls every websocket and MJPEG stream.
+# Handlers are wrapped with ``@limited(lane)`` (per-endpoint concurrency
+# limit + 503 load shedding) and push the heavy part through
+# ``await offload(lane, fn, *args)``.
+#
+# Each lane reads its limits from the environment, e.g.
+#   LANE_TEMPLATE_CONCURRENCY=1  LANE_TEMPLATE_QUEUE=8
+# All lanes share one thread pool: the offloaded calls (detector pools,
+# cached TF sessions, closures over request state) cannot be pickled into
+# worker processes, and OpenCV / TF / MediaPipe release the GIL anyway.
+import asyncio
+import contextlib
+import functools
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from fastapi import HTTPException
+
+# ---------------- Configuration ----------------
+THREAD_WORKERS = int(os.getenv("WORKER_THREADS", str(min(8, (os.cpu_count() or 1) + 2))))
+RETRY_AFTER_SECONDS = int(os.getenv("WORKER_RETRY_AFTER", "1"))
+
+# lane -> (max concurrent, max waiting)
+LANE_DEFAULTS = {
+    "skin":       (4, 16),
+    "makeup":     (4, 16),
+    "template":   (4, 8),    # concurrent calls are batched in template_makeup
+    "jewelry":    (4, 16),
+    "capglasses": (4, 16),
+    "wrist":      (4, 16),
+    "hair":       (4, 16),
+    "moustache":  (4, 16),
+    "realtime":   (4, 4),    # stale frames are worthless, shed early
+}
+DEFAULT_LANE = (4, 16)
+
+_thread_pool = None
+_pool_lock = threading.Lock()
+
+
+def _executor():
+    global _thread_pool
+    with _pool_lock:
+        if _thread_pool is None:
+            _thread_pool = ThreadPoolExecutor(max_workers=THREAD_WORKERS, thread_name_prefix="tryon")
+        return _thread_pool
+
+
+# ---------------- Lanes ----------------
+class Lane:
+    """Concurrency limit, wait queue and counters for one endpoint group."""
+
+    def __init__(self, name: str, concurrency: int, max_queue: int):
+        self.name = name
+        self.concurrency = max(1, concurrency)
+        self.max_queue = max(0, max_queue)
+        self._sem = asyncio.Semaphore(self.concurrency)
+        self.waiting = 0
+        self.running = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.busy_seconds = 0.0
+
+    @contextlib.asynccontextmanager
+    async def admit(self):
+        """Hold one of the lane's slots for the body, or raise 503 when the queue is full."""
+        if self._sem.locked() and self.waiting >= self.max_queue:
+            self.rejected += 1
+            raise HTTPException(
+                status_code=503,
+                detail=f"Server busy ({self.name}); please retry.",
+                headers={"Retry-After": str(RETRY_AFTER_SECONDS)},
+            )
+        self.waiting += 1
+        try:
+            await self._sem.acquire()
+        finally:
+            self.waiting -= 1
+        self.running += 1
+        started = time.perf_counter()   # per call: up to ``concurrency`` bodies overlap
+        try:
+            yield self
+            self.completed += 1
+        except BaseException:
+            self.failed += 1
+            raise
+        finally:
+            self.busy_seconds += time.perf_counter() - started
+            self.running -= 1
+            self._sem.release()
+
+    def stats(self) -> dict:
+        return {
+            "concurrency": self.concurrency, "max_queue": self.max_queue,
+            "running": self.running, "waiting": self.waiting, "completed": self.completed,
+            "failed": self.failed, "rejected": self.rejected,
+            "busy_seconds": round(self.busy_seconds, 3),
+        }
+
+
+_lanes = {}
+
+
+def lane(name: str) -> Lane:
+    if name not in _lanes:
+        conc, queue = LANE_DEFAULTS.get(name, DEFAULT_LANE)
+        env = f"LANE_{name.upper()}_"
+        _lanes[name] = Lane(
+            name,
+            int(os.getenv(env + "CONCURRENCY", conc)),
+            int(os.getenv(env + "QUEUE", queue)),
+        )
+    return _lanes[name]
+
+
+# ---------------- Public API ----------------
+def limited(lane_name: str):
+    """Decorator for async handlers: admit through ``lane_name`` or answer 503."""
+    def decorator(handler):
+        @functools.wraps(handler)
+        async def wrapper(*args, **kwargs):
+            async with lane(lane_name).admit():
+                return await handler(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+async def offload(lane_name: str, fn, *args, **kwargs):
+    """Run ``fn(*args, **kwargs)`` on the worker threads without blocking the event loop."""
+    loop = asyncio.get_running_loop()
+    lane(lane_name)   # registered for stats even when only offloaded to
+    call = functools.partial(fn, *args, **kwargs)
+    return await loop.run_in_executor(_executor(), call)
+
+
+def stats() -> dict:
+    return {
+        "thread_workers": THREAD_WORKERS,
+        "lanes": {name: ln.stats() for name, ln in _lanes.items()},
+    }
+
+
+def shutdown():
+    global _thread_pool
+    with _pool_lock:
+        if _thread_pool is not None:
+            _thread_pool.shutdown(wait=False, cancel_futures=True)
+        _thread_pool = None
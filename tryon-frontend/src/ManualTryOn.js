@@ -99,20 +99,31 @@ const ManualTryOn = ({ uploadedImage }) => {
     }
   };
 
+  const applyLook = async (queue) => {
+    // One request: the backend detects the face once and layers everything in order
+    const file = await fetchUrlAsFile(uploadedImage, "current.jpg");
+    const layers = queue.map((cat) => ({
+      feature: mapCategoryForApi(cat),
+      color: selected[cat].hex,
+      intensity: intensity[cat] / 100,
+    }));
+    const fd = new FormData();
+    fd.append("file", file);
+    fd.append("layers", JSON.stringify(layers));
+    const res = await fetch(`${API_BASE}/manual-makeup/look`, { method: "POST", body: fd });
+    const data = await res.json();
+    if (!res.ok) throw new Error(data?.error || "Failed applying look");
+    return `${API_BASE}${data.output_path}?t=${Date.now()}`;
+  };
+
   const handleApplyAll = async () => {
     try {
       if (!uploadedImage) return alert("Upload an image first.");
       const queue = APPLY_ORDER.filter((cat) => selected[cat]);
       if (queue.length === 0) return alert("Pick at least one color.");
       setLoading(true);
-      let current = uploadedImage;
-      for (let i = 0; i < queue.length; i++) {
-        const cat = queue[i];
-        const col = selected[cat];
-        setProgressText(`Applying ${CATEGORY_LABELS[cat]} (${col.name})… ${i + 1}/${queue.length}`);
-        current = await applySingle(cat, col);
-      }
-      setResultImage(current);
+      setProgressText(`Applying ${queue.map((cat) => CATEGORY_LABELS[cat]).join(" + ")}…`);
+      setResultImage(await applyLook(queue));
       setProgressText("All selected makeup applied.");
     } catch (e) {
       alert(`❌ ${e.message}`);
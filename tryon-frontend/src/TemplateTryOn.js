@@ -26,8 +26,7 @@ const TemplateTryOn = ({ uploadedImage }) => {
       const resp = await fetch(uploadedImage);
       const blob = await resp.blob();
       formData.append("file", blob, "face.png");
-      formData.append("occasion", occasion);
-      formData.append("sample", sample);
+      formData.append("template_id", `${occasion}/${sample}`);
 
       const res = await fetch("http://127.0.0.1:8000/apply-template/", {
         method: "POST",
@@ -104,7 +103,10 @@ const TemplateTryOn = ({ uploadedImage }) => {
                   alt={`sample-${idx}`}
                   className="template-thumb"
                   onClick={() =>
-                    applyTemplate(selectedOccasion, `sample${idx + 1}.png`)
+                    applyTemplate(
+                      selectedOccasion,
+                      decodeURIComponent(sampleUrl.split("/").pop())
+                    )
                   }
                 />
                 <p className="template-label">Sample {idx + 1}</p>
@@ -13,6 +13,8 @@ function App() {
   const [selectedDress, setSelectedDress] = useState("none");
   const [selectedCategory, setSelectedCategory] = useState("All");
   const [isConnected, setIsConnected] = useState(false);
+  // Each tab gets its own outfit on the shared camera stream
+  const [session] = useState(() => Math.random().toString(36).slice(2));
 
   useEffect(() => {
     const checkConnection = async () => {
@@ -63,6 +65,7 @@ function App() {
             <div className="video-inner rounded-xl overflow-hidden">
               <VideoFeed
                 isConnected={isConnected}
+                session={session}
                 selectedTop={selectedTop}
                 selectedBottom={selectedBottom}
                 selectedDress={selectedDress}
@@ -84,6 +87,7 @@ function App() {
             onTopChange={setSelectedTop}
             onBottomChange={setSelectedBottom}
             onDressChange={setSelectedDress}
+            session={session}
             onCategoryChange={setSelectedCategory}
           />
         </div>
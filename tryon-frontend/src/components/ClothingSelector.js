@@ -68,6 +68,7 @@ const ClothingSelector = ({
   onTopChange,
   onBottomChange,
   onDressChange,
+  session,
 }) => {
   const [currentGender, setCurrentGender] = useState("male");
   const [kidsSubGender, setKidsSubGender] = useState("girl");
@@ -132,7 +133,7 @@ const ClothingSelector = ({
     setStatus({ message: "Updating outfit...", type: "loading" });
   
     try {
-      const res = await fetch(`${API_BASE}/clothes/update`, {
+      const res = await fetch(`${API_BASE}/clothes/update?session=${encodeURIComponent(session)}`, {
         method: "POST",
         headers: { "Content-Type": "application/json" },
         body: JSON.stringify(clothingData),
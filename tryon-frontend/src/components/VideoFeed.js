@@ -7,7 +7,8 @@ export default function VideoFeed({
   selectedBottom,
   selectedDress,
   selectedCategory,
-  isConnected
+  isConnected,
+  session
 }) {
   const [isVisible, setIsVisible] = useState(true)
 
@@ -50,7 +51,7 @@ export default function VideoFeed({
           </h3>
           <div className="rounded-2xl overflow-hidden shadow-lg border border-gray-700 bg-black mt-4">
             <img
-              src="http://127.0.0.1:8000/clothes/video"
+              src={`http://127.0.0.1:8000/clothes/video?session=${encodeURIComponent(session)}`}
               alt="Live Camera Stream"
               className="w-[800px] h-[500px] object-cover"
               onError={() => console.error("⚠️ Video feed not found")}
@@ -45,40 +45,50 @@ export default function RealtimeCapGlasses({ goBackHome }) {
     initCamera();
   }, []);
 
-  // Fetch processed frame periodically
+  // Stream frames over a binary WebSocket (JPEG in, JPEG out)
   useEffect(() => {
     if (!selectedItem) return;
 
-    const interval = setInterval(async () => {
+    const ws = new WebSocket(
+      `ws://localhost:8000/ws/tryon/${selectedItem.type}?filename=${encodeURIComponent(selectedItem.filename)}`
+    );
+    ws.binaryType = "blob";
+    let waiting = false; // one frame in flight at a time
+    let lastUrl = null;
+
+    ws.onmessage = (event) => {
+      if (typeof event.data === "string") {
+        const meta = JSON.parse(event.data);
+        if (meta.type === "error") console.error("Overlay error:", meta.error);
+        waiting = false; // metadata closes every frame
+        return;
+      }
+      const url = URL.createObjectURL(event.data);
+      if (lastUrl) URL.revokeObjectURL(lastUrl);
+      lastUrl = url;
+      setFrameSrc(url); // ✅ trigger smooth transition
+    };
+    ws.onerror = (err) => console.error("Overlay error:", err);
+
+    const interval = setInterval(() => {
       const video = videoRef.current;
       const canvas = canvasRef.current;
-      const ctx = canvas.getContext("2d");
+      if (!video || !canvas || waiting || ws.readyState !== WebSocket.OPEN) return;
 
+      const ctx = canvas.getContext("2d");
       ctx.drawImage(video, 0, 0, canvas.width, canvas.height);
-      const frameDataUrl = canvas.toDataURL("image/jpeg");
-      const blob = await (await fetch(frameDataUrl)).blob();
-
-      const formData = new FormData();
-      formData.append("file", blob, "frame.jpg");
-      formData.append("accessory", selectedItem.type);
-      formData.append("filename", selectedItem.filename);
-
-      try {
-        const res = await fetch("http://localhost:8000/process-capglasses/", {
-          method: "POST",
-          body: formData,
-        });
-
-        const data = await res.json();
-        if (data.frame) {
-          setFrameSrc(data.frame); // ✅ trigger smooth transition
-        }
-      } catch (err) {
-        console.error("Overlay error:", err);
-      }
-    }, 400);
-
-    return () => clearInterval(interval);
+      waiting = true;
+      canvas.toBlob((blob) => {
+        if (blob && ws.readyState === WebSocket.OPEN) ws.send(blob);
+        else waiting = false;
+      }, "image/jpeg", 0.8);
+    }, 100);
+
+    return () => {
+      clearInterval(interval);
+      ws.close();
+      if (lastUrl) URL.revokeObjectURL(lastUrl);
+    };
   }, [selectedItem]);
 
   const resetSelection = () => {
@@ -49,41 +49,52 @@ export default function RealTimeWristTryOn() {
     };
   }, []);
 
-  // 🔹 Send webcam frames to backend when a watch is selected
+  // 🔹 Stream webcam frames over a binary WebSocket when a watch is selected
   useEffect(() => {
     if (!selectedWatch) return;
 
-    const interval = setInterval(async () => {
-      try {
-        const video = videoRef.current;
-        const canvas = canvasRef.current;
-        if (!video || !canvas) return;
-
-        const ctx = canvas.getContext("2d");
-        canvas.width = video.videoWidth;
-        canvas.height = video.videoHeight;
-        ctx.drawImage(video, 0, 0, canvas.width, canvas.height);
-
-        const blob = await new Promise(resolve => canvas.toBlob(resolve, "image/jpeg"));
-        const formData = new FormData();
-        formData.append("file", blob, "frame.jpg");
-        formData.append("filename", selectedWatch); // ✅ Send selected watch name
-
-        const res = await fetch(`${BACKEND_URL}/process-realtime-wrist/`, {
-          method: "POST",
-          body: formData,
-        });
-
-        const data = await res.json();
-        if (data.frame) {
-          setProcessedFrame(data.frame);
-        }
-      } catch (error) {
-        console.error("Error sending frame:", error);
+    const ws = new WebSocket(
+      `${BACKEND_URL.replace(/^http/, "ws")}/ws/tryon/watch?filename=${encodeURIComponent(selectedWatch)}`
+    );
+    ws.binaryType = "blob";
+    let waiting = false; // one frame in flight at a time
+    let lastUrl = null;
+
+    ws.onmessage = (event) => {
+      if (typeof event.data === "string") {
+        const meta = JSON.parse(event.data);
+        if (meta.type === "error") console.error("Error processing frame:", meta.error);
+        waiting = false; // metadata closes every frame
+        return;
       }
-    }, 700); // smoother refresh
+      const url = URL.createObjectURL(event.data);
+      if (lastUrl) URL.revokeObjectURL(lastUrl);
+      lastUrl = url;
+      setProcessedFrame(url);
+    };
+    ws.onerror = (error) => console.error("Error sending frame:", error);
+
+    const interval = setInterval(() => {
+      const video = videoRef.current;
+      const canvas = canvasRef.current;
+      if (!video || !canvas || !video.videoWidth || waiting || ws.readyState !== WebSocket.OPEN) return;
+
+      const ctx = canvas.getContext("2d");
+      canvas.width = video.videoWidth;
+      canvas.height = video.videoHeight;
+      ctx.drawImage(video, 0, 0, canvas.width, canvas.height);
+      waiting = true;
+      canvas.toBlob((blob) => {
+        if (blob && ws.readyState === WebSocket.OPEN) ws.send(blob);
+        else waiting = false;
+      }, "image/jpeg", 0.8);
+    }, 100);
 
-    return () => clearInterval(interval);
+    return () => {
+      clearInterval(interval);
+      ws.close();
+      if (lastUrl) URL.revokeObjectURL(lastUrl);
+    };
   }, [selectedWatch]);
 
   const handleWatchSelect = (watch) => {